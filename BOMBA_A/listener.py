@@ -1,354 +1,80 @@
-import psycopg2
-import select
+import asyncio
 import json
-import requests
 import os
+import sys
 import threading
 from http.server import HTTPServer, BaseHTTPRequestHandler
 from dotenv import load_dotenv
 from datetime import datetime
 
-# Cargar variables de entorno desde .env
-load_dotenv()
-# Configuración de la base de datos usando variables de entorno
-DB_CONFIG = {
-    'dbname': os.environ.get('DB_NAME'),
-    'user': os.environ.get('DB_USER'),
-    'password': os.environ.get('DB_PASSWORD'),
-    'host': os.environ.get('DB_HOST'),
-    'port': int(os.environ.get('DB_PORT'))
-}
+# Permite importar el paquete compartido 'comun' al ejecutar desde la carpeta de la bomba
+RAIZ_REPO = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if RAIZ_REPO not in sys.path:
+    sys.path.append(RAIZ_REPO)
 
-# URLs base del backend desde variables de entorno
-# Si BASE_URL no termina en /sensores, se agrega automaticamente
-BASE_URL = os.environ.get('BASE_URL', '').rstrip('/')
-if not BASE_URL.endswith('/sensores'):
-    BASE_URL = f"{BASE_URL}/sensores"
-PREDICCION_URL = f"{BASE_URL}/predecir-bomba"
+from comun import logs
+from comun.asincrono import ejecutar_asincrono
+from comun.despacho import modo_asincrono
+from comun.metricas import REGISTRO, TIPO_CONTENIDO
+from comun.motor import MotorListener
+from perfil_bomba_a import crear_perfil
 
-# API Key para autenticacion con el backend principal
-API_KEY = os.environ.get('API_KEY', 'gm-internal-service-key-2025')
-HEADERS = {
-    'Content-Type': 'application/json',
-    'X-API-Key': API_KEY
-}
+log = logs.obtener('bomba-a')
 
-# Mapeo de nombre de canal a campo del modelo para bomba A (actualizado 2026-02-25)
-# NOTA: Algunos canales son compartidos con Bomba B (tablas _b) porque
-# gm_influx inserta datos en esas tablas para ambas bombas.
-CANAL_TO_CAMPO = {
-    # Canales principales (tablas exclusivas Bomba A)
-    'canal_sensores_corriente': 'corriente_motor',
-    'canal_mw_brutos_gas': 'mw_brutos_gas',
-    'canal_temperatura_ambiental': 'temp_ambiental',
-    'canal_temperatura_descanso_interno_bomba_1a': 'temp_bomba',
-    'canal_temp_empuje_bomba_1a': 'temp_empuje',
-    'canal_temperatura_descanso_interna_motor_bomba_1a': 'temp_motor',
-    'canal_vibracion_axial_descanso': 'vibracion_axial',
-    'canal_voltaje_barra': 'voltaje_barra',
-    'canal_excentricidad_bomba': 'excentricidad_bomba',
-    'canal_flujo_agua_recalentador': 'flujo_agua_recalentador',
-    'canal_flujo_agua_vapor_alta': 'flujo_agua',
-    'canal_posicion_valvula_recirc': 'posicion_valvula_recirc',
-    'canal_presion_succion_baa': 'presion_succion_baa',
-    'canal_temperatura_estator': 'temperatura_estator',
-    'canal_flujo_salida_12fpmfc': 'flujo_salida_12fpmfc',
+# El perfil, el motor y las rutas se arman al ejecutar el listener (ver __main__):
+# importar este modulo no abre conexiones, archivos ni hilos
+PERFIL = None
+MOTOR = None
+RUTAS_ESTADISTICAS = {}
 
-    # Vibraciones internas y externas
-    'canal_vibracion_x_descanso_interno_bomba_1a': 'vibracion_x_interno',
-    'canal_vibracion_y_descanso_interno_bomba_1a': 'vibracion_y_interno',
-    'canal_vibracion_x_descanso_externo': 'vibracion_x_externo',
-    'canal_vibracion_y_descanso_externo': 'vibracion_y_externo',
 
-    # Canales redirigidos a tablas compartidas con Bomba B
-    # (gm_influx inserta en estas tablas _b, no en las versiones sin _b)
-    'canal_flujo_agua_domo_ap_b': 'flujo_agua_domo_ap',
-    'canal_flujo_agua_domo_mp_b': 'flujo_agua_domo_mp',
-    'canal_presion_agua_b': 'presion_agua_mp',
+def configuracion_db():
+    """Configuracion de la base de datos usando variables de entorno"""
+    return {
+        'dbname': os.environ.get('DB_NAME'),
+        'user': os.environ.get('DB_USER'),
+        'password': os.environ.get('DB_PASSWORD'),
+        'host': os.environ.get('DB_HOST'),
+        'port': int(os.environ.get('DB_PORT'))
+    }
 
-    # Canales redirigidos a tablas que antes no tenian listener
-    'canal_flujo_de_agua_atemp_vapor_alta_ap': 'presion_agua',
-    'canal_temperatura_agua_alim_b': 'temp_agua_alim_domo_mp',
-
-    # Canal nuevo (tabla antes sin trigger, creado en Fase 1)
-    'canal_presion_agua_alimentacion_econ_ap': 'presion_agua_alimentacion_econ_ap',
-}
-
-# Mapeo CANAL -> ENDPOINT POST (actualizado 2026-02-25)
-CANAL_ENDPOINTS = {
-    # Endpoints principales (tablas exclusivas Bomba A)
-    'canal_sensores_corriente': f"{BASE_URL}/prediccion_corriente",
-    'canal_mw_brutos_gas': f"{BASE_URL}/prediccion_mw-brutos-gas",
-    'canal_temperatura_ambiental': f"{BASE_URL}/prediccion_temperatura-ambiental",
-    'canal_temperatura_descanso_interno_bomba_1a': f"{BASE_URL}/prediccion_temp-descanso-bomba-1a",
-    'canal_temp_empuje_bomba_1a': f"{BASE_URL}/prediccion_temp-empuje-bomba-1a",
-    'canal_temperatura_descanso_interna_motor_bomba_1a': f"{BASE_URL}/prediccion_temp-motor-bomba-1a",
-    'canal_vibracion_axial_descanso': f"{BASE_URL}/prediccion_vibracion-axial",
-    'canal_voltaje_barra': f"{BASE_URL}/prediccion_voltaje-barra",
-    'canal_excentricidad_bomba': f"{BASE_URL}/prediccion_excentricidad-bomba",
-    'canal_flujo_agua_recalentador': f"{BASE_URL}/prediccion_flujo-agua-recalentador",
-    'canal_flujo_agua_vapor_alta': f"{BASE_URL}/prediccion_flujo-agua-vapor-alta",
-    'canal_posicion_valvula_recirc': f"{BASE_URL}/prediccion_posicion-valvula-recirc",
-    'canal_presion_succion_baa': f"{BASE_URL}/prediccion_presion-succion-baa",
-    'canal_temperatura_estator': f"{BASE_URL}/prediccion_temperatura-estator",
-    'canal_flujo_salida_12fpmfc': f"{BASE_URL}/prediccion_flujo-salida-12fpmfc",
-
-    # Vibraciones internas y externas
-    'canal_vibracion_x_descanso_interno_bomba_1a': f"{BASE_URL}/prediccion_vibracion-x-interno",
-    'canal_vibracion_y_descanso_interno_bomba_1a': f"{BASE_URL}/prediccion_vibracion-y-interno",
-    'canal_vibracion_x_descanso_externo': f"{BASE_URL}/prediccion_vibracion-x-externo",
-    'canal_vibracion_y_descanso_externo': f"{BASE_URL}/prediccion_vibracion-y-externo",
-
-    # Endpoints redirigidos a tablas compartidas con Bomba B
-    'canal_flujo_agua_domo_ap_b': f"{BASE_URL}/prediccion_flujo-agua-domo-ap",
-    'canal_flujo_agua_domo_mp_b': f"{BASE_URL}/prediccion_flujo-agua-domo-mp",
-    'canal_presion_agua_b': f"{BASE_URL}/prediccion_presion-agua-mp",
-
-    # Endpoints redirigidos a tablas que antes no tenian listener
-    'canal_flujo_de_agua_atemp_vapor_alta_ap': f"{BASE_URL}/prediccion_presion-agua",
-    'canal_temperatura_agua_alim_b': f"{BASE_URL}/prediccion_temperatura-agua-alim-domo-mp",
-
-    # Endpoint nuevo (tabla antes sin trigger)
-    'canal_presion_agua_alimentacion_econ_ap': f"{BASE_URL}/prediccion_presion-agua-alimentacion-econ-ap",
-}
-
-# Lista de canales a escuchar para bomba A
-CANALES = list(CANAL_TO_CAMPO.keys())
-
-def conectar():
-    """Establece una nueva conexión a la base de datos y configura los canales de escucha"""
-    try:
-        print("Conectando a la base de datos...")
-        conn = psycopg2.connect(**DB_CONFIG)
-        conn.set_isolation_level(psycopg2.extensions.ISOLATION_LEVEL_AUTOCOMMIT)
-        cur = conn.cursor()
-        
-        for canal in CANALES:
-            cur.execute(f"LISTEN {canal};")
-            print(f"Escuchando canal '{canal}'")
-        
-        print("Conexión establecida.")
-        print("Listener de Bomba A iniciado y esperando notificaciones...")
-        return conn, cur
-    except Exception as e:
-        print(f"Error de conexión: {e}")
-        import time
-        time.sleep(5)
-        return None, None
 
 def main():
-    intentos_conexion = 0
-    max_intentos_inicial = 10
-    reconexiones_consecutivas = 0
-    max_reconexiones = 50  # Límite para reconexiones durante ejecución
-    tiempo_espera_base = 5
-    # Modificación: cambiar a un diccionario donde cada clave es un tiempo_sensor
-    datos_por_tiempo = {}
-
-    while True:
-        conn, cur = conectar()
-        if not conn:
-            intentos_conexion += 1
-            reconexiones_consecutivas += 1
-
-            # Aplicar backoff exponencial con límite máximo de 60 segundos
-            tiempo_espera = min(tiempo_espera_base * (2 ** min(intentos_conexion - 1, 4)), 60)
-
-            print(f"Reintento {intentos_conexion} (reconexiones consecutivas: {reconexiones_consecutivas}/{max_reconexiones})")
-            print(f"Esperando {tiempo_espera} segundos antes del próximo intento...")
-
-            # Verificar si hemos excedido los límites
-            if intentos_conexion >= max_intentos_inicial and reconexiones_consecutivas >= max_reconexiones:
-                print(f"Se alcanzó el límite de {max_reconexiones} reconexiones consecutivas fallidas. Deteniendo...")
-                break
-
-            import time
-            time.sleep(tiempo_espera)
-            continue
+    MOTOR.ejecutar()
 
-        # Reiniciar contadores al conectar exitosamente
-        intentos_conexion = 0
-        reconexiones_consecutivas = 0
-        print("Conexión exitosa. Contadores de reintento reiniciados.")
 
-        try:
-            while True:
-                if select.select([conn], [], [], 10) == ([], [], []):
-                    try:
-                        cur.execute("SELECT 1")
-                        continue
-                    except psycopg2.OperationalError as e:
-                        print(f"Conexión perdida (heartbeat falló): {e}")
-                        print("Reconectando...")
-                        reconexiones_consecutivas += 1
-                        break
-
-                conn.poll()
-                while conn.notifies:
-                    notify = conn.notifies.pop(0)
-                    canal = notify.channel
-                    payload = json.loads(notify.payload)
-                    print(f"Recibido en {canal}: {payload}")
-                    
-                    # Extraer tiempo_sensor del payload (solo para agrupación)
-                    tiempo_sensor = payload.get('tiempo_sensor')
-                    
-                    if not tiempo_sensor:
-                        print(f"ADVERTENCIA: Notificación sin tiempo_sensor: {payload}")
-                        continue
-
-                    # Inicializar el diccionario para este tiempo si no existe
-                    if tiempo_sensor not in datos_por_tiempo:
-                        datos_por_tiempo[tiempo_sensor] = {}
-                    
-                    # Almacenar el valor en nuestro diccionario de datos
-                    # Guardar valores en el diccionario de datos
-                    # Si el valor es None, se usa 0.0 como valor por defecto
-                    if canal in CANAL_TO_CAMPO:
-                        campo = CANAL_TO_CAMPO[canal]
-                        valor = payload.get('valor')
-                        if valor is None:
-                            print(f"ADVERTENCIA: '{campo}' tiene valor None para tiempo {tiempo_sensor}, usando 0.0 por defecto")
-                            valor = 0.0
-                        datos_por_tiempo[tiempo_sensor][campo] = valor
-                        print(f"Guardado '{campo}' para tiempo {tiempo_sensor}: {valor}")
-                        
-                        # Opcional: enviar también a la ruta individual (sin el tiempo_sensor)
-                        try:
-                            endpoint = CANAL_ENDPOINTS.get(canal)
-                            if endpoint:
-                                # Solo enviamos id_sensor y valor
-                                data = {
-                                    'id_sensor': payload.get('id_sensor'),
-                                    'valor': payload.get('valor')
-                                }
-                                res = requests.post(endpoint, json=data, headers=HEADERS, timeout=30)
-                                print(f"Enviado a endpoint individual {endpoint}: {res.status_code}")
-                        except Exception as e:
-                            print(f"Error al enviar a endpoint individual: {e}")
-
-
-                    # Verificar si tenemos suficientes datos para enviar a la predicción unificada
-                    # Lista de campos requeridos según PrediccionBombaInput
-                    campos_requeridos = [
-                        'presion_agua', 'voltaje_barra', 'corriente_motor', 'vibracion_axial',
-                        'flujo_agua', 'mw_brutos_gas', 'temp_motor',
-                        'temp_bomba', 'temp_empuje', 'temp_ambiental', 'excentricidad_bomba',
-                        'flujo_agua_domo_ap', 'flujo_agua_domo_mp', 'flujo_agua_recalentador',
-                        'posicion_valvula_recirc', 'presion_agua_mp', 'presion_succion_baa',
-                        'temperatura_estator', 'flujo_salida_12fpmfc'
-                    ]
-                    
-                    # Verificar los datos para el tiempo actual
-                    datos_sensores = datos_por_tiempo[tiempo_sensor]
-                    campos_presentes = [campo for campo in campos_requeridos if campo in datos_sensores]
-                    campos_faltantes = [campo for campo in campos_requeridos if campo not in datos_sensores]
-                    
-                    print(f"Estado para tiempo {tiempo_sensor}: {len(campos_presentes)}/{len(campos_requeridos)} campos recopilados")
-                    
-                    # Solo enviar cuando tengamos TODOS los campos requeridos
-                    if len(campos_presentes) == len(campos_requeridos):
-                        print(f"{'='*60}")
-                        print(f"PREDICCION GENERAL BOMBA A - INICIO")
-                        print(f"{'='*60}")
-                        print(f"Tiempo sensor: {tiempo_sensor}")
-                        print(f"Campos recopilados: {len(campos_presentes)}/{len(campos_requeridos)}")
-
-                        try:
-                            # Mostrar configuracion de URL
-                            print(f"BASE_URL configurada: {BASE_URL}")
-                            print(f"PREDICCION_URL: {PREDICCION_URL}")
-                            print(f"API_KEY (primeros 10 chars): {API_KEY[:10]}...")
-
-                            # Mostrar los datos que se van a enviar
-                            print(f"Datos a enviar ({len(datos_sensores)} campos):")
-                            for campo, valor in sorted(datos_sensores.items()):
-                                es_requerido = "REQUERIDO" if campo in campos_requeridos else "EXTRA"
-                                print(f"  [{es_requerido}] {campo}: {valor}")
-
-                            # Filtrar solo los campos requeridos para el envio
-                            datos_a_enviar = {campo: datos_sensores[campo] for campo in campos_requeridos if campo in datos_sensores}
-                            campos_extra = [c for c in datos_sensores if c not in campos_requeridos]
-                            if campos_extra:
-                                print(f"NOTA: Se omiten {len(campos_extra)} campos extra del envio: {campos_extra}")
-                            print(f"Campos enviados al modelo: {len(datos_a_enviar)}")
-
-                            print(f"Enviando POST a: {PREDICCION_URL}")
-                            res = requests.post(PREDICCION_URL, json=datos_a_enviar, headers=HEADERS, timeout=60)
-                            print(f"Respuesta HTTP: {res.status_code}")
-                            if res.status_code == 200:
-                                print(f"PREDICCION GENERAL BOMBA A - EXITOSA")
-                                try:
-                                    resp_json = res.json()
-                                    print(f"  Respuesta JSON: {resp_json}")
-                                except:
-                                    print(f"  Respuesta texto: {res.text[:200] if res.text else 'Sin contenido'}")
-                                # Eliminar este conjunto de datos después del envío exitoso
-                                del datos_por_tiempo[tiempo_sensor]
-                            else:
-                                print(f"PREDICCION GENERAL BOMBA A - ERROR {res.status_code}")
-                                print(f"  URL usada: {PREDICCION_URL}")
-                                print(f"  Headers: {HEADERS}")
-                                print(f"  Respuesta: {res.text[:500] if res.text else 'Sin contenido'}")
-                        except requests.exceptions.ConnectionError as e:
-                            print(f"PREDICCION GENERAL BOMBA A - ERROR DE CONEXION")
-                            print(f"  No se pudo conectar a: {PREDICCION_URL}")
-                            print(f"  Error: {e}")
-                        except requests.exceptions.Timeout as e:
-                            print(f"PREDICCION GENERAL BOMBA A - TIMEOUT")
-                            print(f"  URL: {PREDICCION_URL}")
-                            print(f"  Error: {e}")
-                        except Exception as e:
-                            print(f"PREDICCION GENERAL BOMBA A - ERROR INESPERADO")
-                            print(f"  Error: {e}")
-                            import traceback
-                            traceback.print_exc()
-                        print(f"{'='*60}")
-                    else:
-                        print(f"Esperando más datos. Faltan {len(campos_faltantes)} campos: {campos_faltantes}")
-
-                    # Limpieza de conjuntos antiguos incompletos
-                    # IMPORTANTE: Nunca eliminar el timestamp que se esta procesando actualmente
-                    if len(datos_por_tiempo) > 10:
-                        print("Limpiando conjuntos de datos antiguos incompletos...")
-                        tiempos_ordenados = sorted(datos_por_tiempo.keys())
-                        for t in tiempos_ordenados[:-10]:
-                            if t == tiempo_sensor:
-                                continue
-                            if len(datos_por_tiempo[t]) < len(campos_requeridos):
-                                print(f"Eliminando conjunto incompleto para tiempo {t} con {len(datos_por_tiempo[t])}/{len(campos_requeridos)} campos")
-                                del datos_por_tiempo[t]
-
-        except Exception as e:
-            print(f"Error inesperado: {e}")
-            import traceback
-            traceback.print_exc()
-            reconexiones_consecutivas += 1
-
-        # Cierre de conexión
-        try:
-            if cur and not cur.closed:
-                cur.close()
-            if conn and not conn.closed:
-                conn.close()
-            print("Conexión cerrada. Reconectando...")
-        except Exception as e:
-            print(f"Error al cerrar conexión: {e}")
-
-        # Backoff exponencial antes de reconectar
-        tiempo_espera = min(tiempo_espera_base * (2 ** min(reconexiones_consecutivas - 1, 4)), 60)
-        print(f"Esperando {tiempo_espera} segundos antes de reconectar...")
-        import time
-        time.sleep(tiempo_espera)
+PAGINA_SALUD = b"<html><body><h1>Listener de Bomba A funcionando</h1><p>El servicio esta activo y escuchando notificaciones PostgreSQL.</p></body></html>"
 
 # Definir un manejador HTTP simple
 class SimpleHTTPHandler(BaseHTTPRequestHandler):
     def do_GET(self):
         """Manejador para peticiones GET"""
+        if self.path == '/metrics':
+            cuerpo = REGISTRO.exponer().encode()
+            self.send_response(200)
+            self.send_header('Content-type', TIPO_CONTENIDO)
+            self.end_headers()
+            self.wfile.write(cuerpo)
+            return
+        if self.path.split('?')[0] == '/ultimos' and MOTOR.ultimos is not None:
+            status, encabezados, cuerpo = MOTOR.ultimos.responder(self.path, self.headers.get('If-None-Match'))
+            self.send_response(status)
+            for nombre, valor in encabezados.items():
+                self.send_header(nombre, valor)
+            self.end_headers()
+            self.wfile.write(cuerpo)
+            return
+        if self.path in RUTAS_ESTADISTICAS:
+            cuerpo = json.dumps(RUTAS_ESTADISTICAS[self.path]()).encode()
+            self.send_response(200)
+            self.send_header('Content-type', 'application/json')
+            self.end_headers()
+            self.wfile.write(cuerpo)
+            return
         self.send_response(200)
         self.send_header('Content-type', 'text/html')
         self.end_headers()
-        self.wfile.write(b"<html><body><h1>Listener de Bomba A funcionando</h1><p>El servicio esta activo y escuchando notificaciones PostgreSQL.</p></body></html>")
+        self.wfile.write(PAGINA_SALUD)
     
     def log_message(self, format, *args):
         """Sobrescribir el método de logging para evitar mensajes excesivos"""
@@ -360,14 +86,28 @@ def run_http_server():
     port = int(os.environ.get('PORT', 8080))
     server_address = ('', port)
     httpd = HTTPServer(server_address, SimpleHTTPHandler)
-    print(f"Servidor HTTP iniciado en el puerto {port}")
+    log.info("Servidor HTTP iniciado en el puerto %s", port)
     httpd.serve_forever()
 
 if __name__ == '__main__':
-    # Iniciar el servidor HTTP en un hilo separado
-    http_thread = threading.Thread(target=run_http_server)
-    http_thread.daemon = True  # El hilo terminará cuando el programa principal termine
-    http_thread.start()
-    
-    # Ejecutar el listener en el hilo principal
-    main()
\ No newline at end of file
+    # Cargar variables de entorno desde .env
+    load_dotenv()
+    logs.configurar()
+
+    PERFIL = crear_perfil()
+    # Motor de escucha con una sola conexion; solo aloja el perfil de esta bomba
+    MOTOR = MotorListener('Listener de Bomba A', configuracion_db(), [PERFIL.consumidor])
+    # Rutas JSON con estadisticas internas del listener
+    RUTAS_ESTADISTICAS = {'/motor': MOTOR.estadisticas, **PERFIL.rutas_estadisticas}
+
+    if modo_asincrono():
+        # Servidor de salud y listener en un solo event loop
+        asyncio.run(ejecutar_asincrono(MOTOR, RUTAS_ESTADISTICAS, PAGINA_SALUD, int(os.environ.get('PORT', 8080))))
+    else:
+        # Iniciar el servidor HTTP en un hilo separado
+        http_thread = threading.Thread(target=run_http_server)
+        http_thread.daemon = True  # El hilo terminará cuando el programa principal termine
+        http_thread.start()
+
+        # Ejecutar el listener en el hilo principal
+        main()
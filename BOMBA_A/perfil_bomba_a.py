@@ -0,0 +1,168 @@
+"""
+Perfil de la Bomba A: canales, campos del modelo y endpoints.
+
+Importarlo no tiene efectos: crear_perfil() arma el despachador, el cliente
+HTTP, el outbox, el agrupador de lotes y el agregador a partir del entorno.
+Lo usan el listener de la Bomba A y el listener unificado.
+"""
+
+import os
+
+from comun.bomba import AgregadorBomba
+from comun.despacho import crear_despachador
+from comun.http_cliente import ClienteHTTP
+from comun.lotes import AgrupadorLecturas
+from comun.outbox import crear_outbox
+from comun.perfiles import Perfil
+
+# Mapeo de nombre de canal a campo del modelo para bomba A (actualizado 2026-02-25)
+# NOTA: Algunos canales son compartidos con Bomba B (tablas _b) porque
+# gm_influx inserta datos en esas tablas para ambas bombas.
+CANAL_TO_CAMPO = {
+    # Canales principales (tablas exclusivas Bomba A)
+    'canal_sensores_corriente': 'corriente_motor',
+    'canal_mw_brutos_gas': 'mw_brutos_gas',
+    'canal_temperatura_ambiental': 'temp_ambiental',
+    'canal_temperatura_descanso_interno_bomba_1a': 'temp_bomba',
+    'canal_temp_empuje_bomba_1a': 'temp_empuje',
+    'canal_temperatura_descanso_interna_motor_bomba_1a': 'temp_motor',
+    'canal_vibracion_axial_descanso': 'vibracion_axial',
+    'canal_voltaje_barra': 'voltaje_barra',
+    'canal_excentricidad_bomba': 'excentricidad_bomba',
+    'canal_flujo_agua_recalentador': 'flujo_agua_recalentador',
+    'canal_flujo_agua_vapor_alta': 'flujo_agua',
+    'canal_posicion_valvula_recirc': 'posicion_valvula_recirc',
+    'canal_presion_succion_baa': 'presion_succion_baa',
+    'canal_temperatura_estator': 'temperatura_estator',
+    'canal_flujo_salida_12fpmfc': 'flujo_salida_12fpmfc',
+
+    # Vibraciones internas y externas
+    'canal_vibracion_x_descanso_interno_bomba_1a': 'vibracion_x_interno',
+    'canal_vibracion_y_descanso_interno_bomba_1a': 'vibracion_y_interno',
+    'canal_vibracion_x_descanso_externo': 'vibracion_x_externo',
+    'canal_vibracion_y_descanso_externo': 'vibracion_y_externo',
+
+    # Canales redirigidos a tablas compartidas con Bomba B
+    # (gm_influx inserta en estas tablas _b, no en las versiones sin _b)
+    'canal_flujo_agua_domo_ap_b': 'flujo_agua_domo_ap',
+    'canal_flujo_agua_domo_mp_b': 'flujo_agua_domo_mp',
+    'canal_presion_agua_b': 'presion_agua_mp',
+
+    # Canales redirigidos a tablas que antes no tenian listener
+    'canal_flujo_de_agua_atemp_vapor_alta_ap': 'presion_agua',
+    'canal_temperatura_agua_alim_b': 'temp_agua_alim_domo_mp',
+
+    # Canal nuevo (tabla antes sin trigger, creado en Fase 1)
+    'canal_presion_agua_alimentacion_econ_ap': 'presion_agua_alimentacion_econ_ap',
+}
+
+
+# Mapeo CANAL -> ENDPOINT POST (actualizado 2026-02-25)
+def canal_endpoints(base_url):
+    """Endpoint POST de cada canal bajo la URL base del backend"""
+    return {
+        # Endpoints principales (tablas exclusivas Bomba A)
+        'canal_sensores_corriente': f"{base_url}/prediccion_corriente",
+        'canal_mw_brutos_gas': f"{base_url}/prediccion_mw-brutos-gas",
+        'canal_temperatura_ambiental': f"{base_url}/prediccion_temperatura-ambiental",
+        'canal_temperatura_descanso_interno_bomba_1a': f"{base_url}/prediccion_temp-descanso-bomba-1a",
+        'canal_temp_empuje_bomba_1a': f"{base_url}/prediccion_temp-empuje-bomba-1a",
+        'canal_temperatura_descanso_interna_motor_bomba_1a': f"{base_url}/prediccion_temp-motor-bomba-1a",
+        'canal_vibracion_axial_descanso': f"{base_url}/prediccion_vibracion-axial",
+        'canal_voltaje_barra': f"{base_url}/prediccion_voltaje-barra",
+        'canal_excentricidad_bomba': f"{base_url}/prediccion_excentricidad-bomba",
+        'canal_flujo_agua_recalentador': f"{base_url}/prediccion_flujo-agua-recalentador",
+        'canal_flujo_agua_vapor_alta': f"{base_url}/prediccion_flujo-agua-vapor-alta",
+        'canal_posicion_valvula_recirc': f"{base_url}/prediccion_posicion-valvula-recirc",
+        'canal_presion_succion_baa': f"{base_url}/prediccion_presion-succion-baa",
+        'canal_temperatura_estator': f"{base_url}/prediccion_temperatura-estator",
+        'canal_flujo_salida_12fpmfc': f"{base_url}/prediccion_flujo-salida-12fpmfc",
+
+        # Vibraciones internas y externas
+        'canal_vibracion_x_descanso_interno_bomba_1a': f"{base_url}/prediccion_vibracion-x-interno",
+        'canal_vibracion_y_descanso_interno_bomba_1a': f"{base_url}/prediccion_vibracion-y-interno",
+        'canal_vibracion_x_descanso_externo': f"{base_url}/prediccion_vibracion-x-externo",
+        'canal_vibracion_y_descanso_externo': f"{base_url}/prediccion_vibracion-y-externo",
+
+        # Endpoints redirigidos a tablas compartidas con Bomba B
+        'canal_flujo_agua_domo_ap_b': f"{base_url}/prediccion_flujo-agua-domo-ap",
+        'canal_flujo_agua_domo_mp_b': f"{base_url}/prediccion_flujo-agua-domo-mp",
+        'canal_presion_agua_b': f"{base_url}/prediccion_presion-agua-mp",
+
+        # Endpoints redirigidos a tablas que antes no tenian listener
+        'canal_flujo_de_agua_atemp_vapor_alta_ap': f"{base_url}/prediccion_presion-agua",
+        'canal_temperatura_agua_alim_b': f"{base_url}/prediccion_temperatura-agua-alim-domo-mp",
+
+        # Endpoint nuevo (tabla antes sin trigger)
+        'canal_presion_agua_alimentacion_econ_ap': f"{base_url}/prediccion_presion-agua-alimentacion-econ-ap",
+    }
+
+
+# Lista de campos requeridos según PrediccionBombaInput
+CAMPOS_REQUERIDOS = [
+    'presion_agua', 'voltaje_barra', 'corriente_motor', 'vibracion_axial', 'flujo_agua',
+    'mw_brutos_gas', 'temp_motor', 'temp_bomba', 'temp_empuje', 'temp_ambiental',
+    'excentricidad_bomba', 'flujo_agua_domo_ap', 'flujo_agua_domo_mp',
+    'flujo_agua_recalentador', 'posicion_valvula_recirc', 'presion_agua_mp',
+    'presion_succion_baa', 'temperatura_estator', 'flujo_salida_12fpmfc'
+]
+
+# Lista de canales a escuchar para bomba A
+CANALES = list(CANAL_TO_CAMPO.keys())
+
+
+def base_url():
+    """BASE_URL del entorno; si no termina en /sensores, se agrega automaticamente"""
+    url = os.environ.get('BASE_URL', '').rstrip('/')
+    if not url.endswith('/sensores'):
+        url = f"{url}/sensores"
+    return url
+
+
+def crear_perfil():
+    """Componentes del perfil de la Bomba A, con la configuracion del entorno"""
+    url = base_url()
+    endpoints = canal_endpoints(url)
+
+    # API Key para autenticacion con el backend principal
+    headers = {
+        'Content-Type': 'application/json',
+        'X-API-Key': os.environ.get('API_KEY', 'gm-internal-service-key-2025'),
+    }
+
+    # Pool de trabajadores para los POST al backend (fuera del loop de notificaciones)
+    despachador = crear_despachador('bomba-a')
+
+    # Session HTTP compartida (keep-alive); un slot de conexion por endpoint individual
+    cliente = ClienteHTTP(headers, pool_maxsize=len(endpoints))
+    timeout_individual = float(os.environ.get('HTTP_TIMEOUT_INDIVIDUAL', 30))
+    timeout_prediccion = float(os.environ.get('HTTP_TIMEOUT_PREDICCION', 60))
+
+    # Outbox en disco: los envios se registran antes de despacharse y se reintentan si fallan
+    outbox = crear_outbox('bomba-a')
+
+    # Lecturas individuales agrupadas por endpoint y enviadas por lote
+    agrupador = AgrupadorLecturas('bomba-a', despachador, cliente, timeout_individual, outbox=outbox)
+
+    # Perfil de la Bomba A como consumidor del motor de escucha
+    agregador = AgregadorBomba(
+        'Bomba A', CANAL_TO_CAMPO, endpoints, CAMPOS_REQUERIDOS,
+        url, f"{url}/predecir-bomba", cliente, despachador, agrupador,
+        timeout_prediccion=timeout_prediccion, outbox=outbox,
+    )
+
+    # Rutas JSON con estadisticas internas del perfil
+    rutas = {
+        '/despacho': despachador.estadisticas,   # profundidad de cola y latencias
+        '/http': cliente.estadisticas,           # reutilizacion de conexiones
+        '/lotes': agrupador.estadisticas,        # lecturas agrupadas por lote
+        '/tramas': agregador.estadisticas_tramas,  # tramas pendientes, imputadas y lecturas tardias
+    }
+    if outbox is not None:
+        rutas['/outbox'] = outbox.estadisticas   # envios pendientes en disco
+    if agregador.ventana is not None:
+        rutas['/ventana'] = agregador.caracteristicas   # estadisticas de ventana movil
+    if agregador.banda is not None:
+        rutas['/banda'] = agregador.banda.estadisticas   # lecturas suprimidas por canal
+
+    return Perfil('bomba_a', agregador, rutas, despachador=despachador, agrupador=agrupador, outbox=outbox)
@@ -0,0 +1,172 @@
+"""
+Perfil de la Bomba B: canales, campos del modelo y endpoints.
+
+Importarlo no tiene efectos: crear_perfil() arma el despachador, el cliente
+HTTP, el outbox, el agrupador de lotes y el agregador a partir del entorno.
+Lo usan el listener de la Bomba B y el listener unificado.
+"""
+
+import os
+
+from comun.bomba import AgregadorBomba
+from comun.despacho import crear_despachador
+from comun.http_cliente import ClienteHTTP
+from comun.lotes import AgrupadorLecturas
+from comun.outbox import crear_outbox
+from comun.perfiles import Perfil
+
+
+# Mapeo CANAL -> ENDPOINT POST (actualizado 2026-02-25)
+# NOTA: Algunos canales son compartidos con Bomba A (tablas sin _b) porque
+# gm_influx inserta datos en esas tablas para ambas bombas.
+def canal_endpoints(base_url):
+    """Endpoint POST de cada canal bajo la URL base del backend"""
+    return {
+        # Endpoints exclusivos Bomba B
+        'canal_sensores_corriente_b': f"{base_url}/prediccion_corriente",
+        'canal_excentricidad_bomba_b': f"{base_url}/prediccion_excentricidad_bomba",
+        'canal_flujo_descarga_b': f"{base_url}/prediccion_flujo_descarga",
+        'canal_flujo_agua_domo_ap_b': f"{base_url}/prediccion_flujo_agua_domo_ap",
+        'canal_flujo_agua_domo_mp_b': f"{base_url}/prediccion_flujo_agua_domo_mp",
+        'canal_presion_agua_b': f"{base_url}/prediccion_presion_agua",
+        'canal_temperatura_agua_alim_b': f"{base_url}/prediccion_temperatura_agua_alim",
+        'canal_temperatura_agua_alim_ap_b': f"{base_url}/prediccion_temperatura_agua_alim",
+        'canal_temperatura_estator_b': f"{base_url}/prediccion_temperatura_estator",
+        'canal_vibracion_axial_empuje_b': f"{base_url}/prediccion_vibracion_axial_empuje",
+        'canal_vibracion_x_descanso_b': f"{base_url}/prediccion_vibracion_x_descanso",
+        'canal_vibracion_y_descanso_b': f"{base_url}/prediccion_vibracion_y_descanso",
+
+        # Temperaturas descanso (exclusivos Bomba B)
+        'canal_temperatura_descanso_interno_bomba_b': f"{base_url}/prediccion_temp_descanso_bomba",
+        'canal_temperatura_descanso_interna_empuje_bomba_b': f"{base_url}/prediccion_temp_descanso_empuje",
+        'canal_temperatura_descanso_interna_motor_bomba_b': f"{base_url}/prediccion_temp_descanso_motor",
+
+        # Vibraciones externas (exclusivos Bomba B)
+        'canal_vibracion_x_descanso_externo_b': f"{base_url}/prediccion_vibracion_x_descanso_externo",
+        'canal_vibracion_y_descanso_externo_b': f"{base_url}/prediccion_vibracion_y_descanso_externo",
+
+        # Otros exclusivos Bomba B
+        'canal_presion_succion_baa_b': f"{base_url}/prediccion_presion_succion_baa",
+        'canal_posicion_valvula_recirc_b': f"{base_url}/prediccion_posicion_valvula_recirc",
+
+        # Canales redirigidos a tablas compartidas con Bomba A
+        # (gm_influx inserta en estas tablas sin _b, no en versiones _b)
+        'canal_flujo_agua_recalentador': f"{base_url}/prediccion_flujo_agua_recalentador",
+        'canal_flujo_agua_vapor_alta': f"{base_url}/prediccion_flujo_agua_vapor_alta",
+        'canal_temperatura_ambiental': f"{base_url}/prediccion_temperatura_ambiental",
+        'canal_voltaje_barra': f"{base_url}/prediccion_voltaje_barra",
+        'canal_mw_brutos_gas': f"{base_url}/prediccion_mw_brutos_generacion_gas",
+        'canal_presion_agua_alimentacion_econ_ap': f"{base_url}/prediccion_presion_agua_econ_ap",
+    }
+
+
+# Mapeo de nombre de canal a campo del modelo (actualizado 2026-02-25)
+# NOTA: Algunos canales son compartidos con Bomba A (tablas sin _b) porque
+# gm_influx inserta datos en esas tablas para ambas bombas.
+CANAL_TO_CAMPO = {
+    # Campos exclusivos Bomba B
+    'canal_sensores_corriente_b': 'corriente_motor',
+    'canal_excentricidad_bomba_b': 'excentricidad_bomba',
+    'canal_flujo_descarga_b': 'flujo_descarga_ap',
+    'canal_flujo_agua_domo_ap_b': 'flujo_agua_domo_ap',
+    'canal_flujo_agua_domo_mp_b': 'flujo_agua_domo_mp',
+    'canal_presion_agua_b': 'presion_agua_ap',
+    'canal_temperatura_agua_alim_b': 'temperatura_agua_alim_ap',
+    # La tabla temperatura_agua_alim_b esta vacia, los datos reales estan en temperatura_agua_alim_ap_b
+    'canal_temperatura_agua_alim_ap_b': 'temperatura_agua_alim_ap',
+    'canal_temperatura_estator_b': 'temperatura_estator',
+    'canal_vibracion_axial_empuje_b': 'vibracion_axial',
+    'canal_vibracion_x_descanso_b': 'vibracion_x_descanso',
+    'canal_vibracion_y_descanso_b': 'vibracion_y_descanso',
+
+    # Temperaturas descanso (exclusivos Bomba B)
+    'canal_temperatura_descanso_interno_bomba_b': 'temp_descanso_bomba',
+    'canal_temperatura_descanso_interna_empuje_bomba_b': 'temp_descanso_empuje',
+    'canal_temperatura_descanso_interna_motor_bomba_b': 'temp_descanso_motor',
+
+    # Vibraciones externas (exclusivos Bomba B)
+    'canal_vibracion_x_descanso_externo_b': 'vibracion_x_externo',
+    'canal_vibracion_y_descanso_externo_b': 'vibracion_y_externo',
+
+    # Otros exclusivos Bomba B
+    'canal_presion_succion_baa_b': 'presion_succion_baa',
+    'canal_posicion_valvula_recirc_b': 'posicion_valvula_recirc',
+
+    # Canales redirigidos a tablas compartidas con Bomba A
+    # (gm_influx inserta en estas tablas sin _b, no en versiones _b)
+    'canal_flujo_agua_recalentador': 'flujo_agua_recalentador',
+    'canal_flujo_agua_vapor_alta': 'flujo_agua_vapor_alta',
+    'canal_temperatura_ambiental': 'temperatura_ambiental',
+    'canal_voltaje_barra': 'voltaje_barra',
+    'canal_mw_brutos_gas': 'mw_brutos_generacion_gas',
+    'canal_presion_agua_alimentacion_econ_ap': 'presion_agua_econ_ap',
+}
+
+# Lista de todos los campos requeridos para la prediccion unificada
+REQUIRED_FIELDS = [
+    'corriente_motor', 'excentricidad_bomba', 'flujo_descarga_ap', 'flujo_agua_domo_ap',
+    'flujo_agua_domo_mp', 'flujo_agua_recalentador', 'flujo_agua_vapor_alta',
+    'presion_agua_ap', 'temperatura_ambiental', 'temperatura_agua_alim_ap',
+    'temperatura_estator', 'vibracion_axial', 'vibracion_x_descanso',
+    'vibracion_y_descanso', 'voltaje_barra'
+]
+
+# Lista de canales a escuchar (usa CANAL_TO_CAMPO para incluir todos)
+CANALES = list(CANAL_TO_CAMPO.keys())
+
+
+def base_url():
+    """BASE_URL_B del entorno; si no termina en /sensores_b, se agrega automaticamente"""
+    url = os.environ.get('BASE_URL_B', '').rstrip('/')
+    if not url.endswith('/sensores_b'):
+        url = f"{url}/sensores_b"
+    return url
+
+
+def crear_perfil():
+    """Componentes del perfil de la Bomba B, con la configuracion del entorno"""
+    url = base_url()
+    endpoints = canal_endpoints(url)
+
+    # API Key para autenticacion con el backend principal
+    headers = {
+        'Content-Type': 'application/json',
+        'X-API-Key': os.environ.get('API_KEY', 'gm-internal-service-key-2025'),
+    }
+
+    # Pool de trabajadores para los POST al backend (fuera del loop de notificaciones)
+    despachador = crear_despachador('bomba-b')
+
+    # Session HTTP compartida (keep-alive); un slot de conexion por endpoint individual
+    cliente = ClienteHTTP(headers, pool_maxsize=len(endpoints))
+    timeout_individual = float(os.environ.get('HTTP_TIMEOUT_INDIVIDUAL', 30))
+    timeout_prediccion = float(os.environ.get('HTTP_TIMEOUT_PREDICCION', 60))
+
+    # Outbox en disco: los envios se registran antes de despacharse y se reintentan si fallan
+    outbox = crear_outbox('bomba-b')
+
+    # Lecturas individuales agrupadas por endpoint y enviadas por lote
+    agrupador = AgrupadorLecturas('bomba-b', despachador, cliente, timeout_individual, outbox=outbox)
+
+    # Perfil de la Bomba B como consumidor del motor de escucha
+    agregador = AgregadorBomba(
+        'Bomba B', CANAL_TO_CAMPO, endpoints, REQUIRED_FIELDS,
+        url, f"{url}/predecir-bomba-b", cliente, despachador, agrupador,
+        timeout_prediccion=timeout_prediccion, outbox=outbox,
+    )
+
+    # Rutas JSON con estadisticas internas del perfil
+    rutas = {
+        '/despacho': despachador.estadisticas,   # profundidad de cola y latencias
+        '/http': cliente.estadisticas,           # reutilizacion de conexiones
+        '/lotes': agrupador.estadisticas,        # lecturas agrupadas por lote
+        '/tramas': agregador.estadisticas_tramas,  # tramas pendientes, imputadas y lecturas tardias
+    }
+    if outbox is not None:
+        rutas['/outbox'] = outbox.estadisticas   # envios pendientes en disco
+    if agregador.ventana is not None:
+        rutas['/ventana'] = agregador.caracteristicas   # estadisticas de ventana movil
+    if agregador.banda is not None:
+        rutas['/banda'] = agregador.banda.estadisticas   # lecturas suprimidas por canal
+
+    return Perfil('bomba_b', agregador, rutas, despachador=despachador, agrupador=agrupador, outbox=outbox)
@@ -0,0 +1,295 @@
+"""
+Perfil de bitacoras: canales, clasificacion contra el backend y consumidor.
+
+Importarlo no tiene efectos: crear_perfil() arma el cliente HTTP, el cache,
+el clasificador y el ejecutor a partir del entorno. Lo usan el listener de
+bitacoras y el listener unificado.
+"""
+
+import os
+import threading
+import time
+
+import requests
+
+from comun import logs
+from comun.cache import CacheClasificaciones
+from comun.codec import BITACORA
+from comun.ejecutor import EjecutorJusto
+from comun.http_cliente import ClienteHTTP
+from comun.lotes import CODIGOS_SIN_LOTE
+from comun.perfiles import Perfil
+
+log = logs.obtener('bitacoras')
+
+# URL del backend principal si BASE_URL no esta configurada
+BASE_URL_DEFECTO = 'https://backend-qa.1tfr3xva5g42.us-south.codeengine.appdomain.cloud'
+
+# Canales a escuchar
+CANALES = ['canal_gm_bitacora_a', 'canal_gm_bitacora_b']
+
+# Mapeo canal -> tabla
+CANAL_TO_TABLA = {
+    'canal_gm_bitacora_a': 'a',
+    'canal_gm_bitacora_b': 'b'
+}
+
+
+def base_url():
+    """URL base del backend principal (BASE_URL sin /sensores ni /sensores_b)"""
+    url = os.environ.get('BASE_URL', BASE_URL_DEFECTO)
+    # Quitar /sensores si viene en la URL
+    if url.endswith('/sensores'):
+        url = url.replace('/sensores', '')
+    if url.endswith('/sensores_b'):
+        url = url.replace('/sensores_b', '')
+    return url
+
+
+class ClasificadorBitacoras:
+    """Clasificacion de bitacoras en el backend: una a una, por lote o reutilizando el cache"""
+
+    def __init__(self, base_url, cliente, timeout, cache=None, reintento_lote=600.0, reintento_guardado=600.0):
+        self.clasificar_url = f"{base_url}/gm-bitacoras/clasificar"
+        self.clasificar_lote_url = f"{self.clasificar_url}/lote"
+        # Registro de una clasificacion reutilizada del cache (el backend la guarda sin llamar al LLM).
+        # Ruta opcional del backend: {id, tabla, clasificacion, alerta_aviso} -> 200; con 404/405/501
+        # se clasifica con el LLM y la ruta se vuelve a probar cada reintento_guardado s
+        self.guardar_clasificacion_url = f"{base_url}/gm-bitacoras/guardar-clasificacion"
+        self.cliente = cliente
+        self.timeout = timeout
+        self.cache = cache
+        # Cada cuanto se vuelve a probar la ruta por lote si el backend no la expone
+        self.reintento_lote = float(os.environ.get('CLASIFICACION_REINTENTO_LOTE', reintento_lote))
+        self.reintento_guardado = float(os.environ.get('CACHE_CLASIFICACION_REINTENTO_GUARDADO', reintento_guardado))
+
+        # Los trabajadores del ejecutor clasifican en paralelo: el estado y los contadores van con lock
+        self._lock = threading.Lock()
+        # Instante en que el backend respondio que no tiene ruta por lote (None = se asume que si)
+        self.lote_no_soportado_desde = None
+        # Instante en que el backend respondio que no tiene ruta para guardar clasificaciones del cache
+        self.guardado_no_soportado_desde = None
+
+        # Contadores
+        self.clasificadas = 0
+        self.desde_cache = 0
+        self.errores = 0
+        self.peticiones_individuales = 0
+        self.peticiones_lote = 0
+
+    def _contar(self, contador):
+        with self._lock:
+            setattr(self, contador, getattr(self, contador) + 1)
+
+    def clasificar_bitacora(self, id_bitacora, texto_bitacora, tabla, usar_cache=True):
+        """Envia una bitacora al backend para clasificacion"""
+        if usar_cache and self.clasificar_desde_cache(id_bitacora, texto_bitacora, tabla):
+            return True
+        try:
+            data = {
+                'id': id_bitacora,
+                'bitacora': texto_bitacora,
+                'tabla': tabla
+            }
+            log.info("Enviando bitacora %s (tabla %s) a clasificar...", id_bitacora, tabla)
+            log.debug("  Texto: %s...", texto_bitacora[:80])
+
+            self._contar('peticiones_individuales')
+            response = self.cliente.post(self.clasificar_url, data, self.timeout)
+
+            if response.status_code == 200:
+                self.registrar_clasificacion(id_bitacora, texto_bitacora, response.json())
+                return True
+            else:
+                log.error("Error %s al clasificar bitacora %s: %s",
+                          response.status_code, id_bitacora, response.text[:200])
+                self._contar('errores')
+                return False
+
+        except requests.exceptions.Timeout:
+            log.error("Timeout al clasificar bitacora %s", id_bitacora)
+            self._contar('errores')
+            return False
+        except Exception as e:
+            log.error("Error al clasificar bitacora %s: %s", id_bitacora, e)
+            self._contar('errores')
+            return False
+
+    def registrar_clasificacion(self, id_bitacora, texto_bitacora, resultado, desde_cache=False):
+        origen = " (desde cache)" if desde_cache else ""
+        log.info("Bitacora %s clasificada exitosamente%s: %s", id_bitacora, origen, resultado.get('clasificacion', 'N/A'))
+        if resultado.get('alerta_aviso'):
+            log.info("  Alerta: %s...", resultado.get('alerta_aviso', '')[:50])
+        self._contar('desde_cache' if desde_cache else 'clasificadas')
+        if self.cache is not None and not desde_cache:
+            self.cache.guardar(texto_bitacora, resultado)
+
+    def clasificar_desde_cache(self, id_bitacora, texto_bitacora, tabla):
+        """
+        Si el texto ya fue clasificado, envia el resultado guardado al backend sin pasar por el LLM.
+        Retorna False si no hay resultado en cache o el backend no lo acepta.
+        """
+        if self.cache is None:
+            return False
+        with self._lock:
+            no_soportado_desde = self.guardado_no_soportado_desde
+        if no_soportado_desde is not None and time.time() - no_soportado_desde < self.reintento_guardado:
+            return False
+        resultado = self.cache.obtener(texto_bitacora)
+        if resultado is None:
+            return False
+
+        data = {'id': id_bitacora, 'tabla': tabla, **resultado}
+        try:
+            response = self.cliente.post(self.guardar_clasificacion_url, data, self.timeout)
+        except Exception as e:
+            log.error("Error al guardar clasificacion en cache de bitacora %s: %s", id_bitacora, e)
+            self.cache.contar(False)
+            return False
+        if response.status_code in CODIGOS_SIN_LOTE:
+            log.info("Backend sin ruta para clasificaciones en cache (%s), se usara el LLM", response.status_code)
+            with self._lock:
+                self.guardado_no_soportado_desde = time.time()
+            self.cache.contar(False)
+            return False
+        if response.status_code != 200:
+            log.error("Error %s al guardar clasificacion en cache de bitacora %s", response.status_code, id_bitacora)
+            self.cache.contar(False)
+            return False
+        with self._lock:
+            self.guardado_no_soportado_desde = None
+        # Solo cuenta como acierto lo que el backend guardo
+        self.cache.contar(True)
+        self.registrar_clasificacion(id_bitacora, texto_bitacora, resultado, desde_cache=True)
+        return True
+
+    def clasificar_lote(self, bitacoras):
+        """
+        Clasifica varias bitacoras [(id, texto, tabla), ...] con un solo POST a la ruta por lote.
+        Las que no vuelvan en la respuesta, o todas si no hay ruta por lote, se envian una a una.
+        """
+        bitacoras = [b for b in bitacoras if not self.clasificar_desde_cache(*b)]
+        if not bitacoras:
+            return
+
+        with self._lock:
+            no_soportado_desde = self.lote_no_soportado_desde
+        soporta_lote = no_soportado_desde is None or time.time() - no_soportado_desde >= self.reintento_lote
+        if len(bitacoras) == 1 or not soporta_lote:
+            for bitacora in bitacoras:
+                self.clasificar_bitacora(*bitacora, usar_cache=False)
+            return
+
+        pendientes = {(id_bitacora, tabla): (id_bitacora, texto, tabla) for id_bitacora, texto, tabla in bitacoras}
+        data = {'bitacoras': [{'id': i, 'bitacora': t, 'tabla': tb} for i, t, tb in bitacoras]}
+        log.info("Enviando lote de %d bitacoras a clasificar...", len(bitacoras))
+        self._contar('peticiones_lote')
+        try:
+            response = self.cliente.post(self.clasificar_lote_url, data, self.timeout)
+            if response.status_code in CODIGOS_SIN_LOTE:
+                log.info("Backend sin ruta de clasificacion por lote (%s), enviando individualmente",
+                         response.status_code)
+                with self._lock:
+                    self.lote_no_soportado_desde = time.time()
+            elif response.status_code == 200:
+                with self._lock:
+                    self.lote_no_soportado_desde = None
+                for resultado in response.json().get('resultados', []):
+                    clave = (resultado.get('id'), resultado.get('tabla'))
+                    if clave in pendientes:
+                        self.registrar_clasificacion(clave[0], pendientes.pop(clave)[1], resultado)
+                if pendientes:
+                    log.warning("%d bitacoras sin resultado en el lote, enviando individualmente", len(pendientes))
+            else:
+                log.error("Error %s al clasificar lote: %s", response.status_code, response.text[:200])
+        except Exception as e:
+            log.error("Error al clasificar lote de %d bitacoras: %s", len(bitacoras), e)
+
+        for bitacora in pendientes.values():
+            self.clasificar_bitacora(*bitacora, usar_cache=False)
+
+    def estadisticas(self):
+        with self._lock:
+            return {
+                'clasificadas': self.clasificadas,
+                'desde_cache': self.desde_cache,
+                'errores': self.errores,
+                'peticiones_individuales': self.peticiones_individuales,
+                'peticiones_lote': self.peticiones_lote,
+                'ruta_lote': self.lote_no_soportado_desde is None,
+                'ruta_guardado': self.guardado_no_soportado_desde is None,
+            }
+
+
+class ConsumidorBitacoras:
+    """Consumidor del motor de escucha para los canales de bitacoras"""
+
+    nombre = 'Bitacoras GM'
+    canales = CANALES
+    esquema = BITACORA
+
+    def __init__(self, ejecutor, clasificar_url):
+        self.ejecutor = ejecutor
+        self.clasificar_url = clasificar_url
+
+    def iniciar(self):
+        log.info("Endpoint de clasificacion: %s", self.clasificar_url)
+        self.ejecutor.iniciar()
+
+    def procesar(self, canal, payload):
+        if logs.muestrear('notificacion'):
+            log.info("Notificacion recibida en %s", canal)
+
+        id_bitacora = payload.id
+        texto_bitacora = payload.bitacora
+        tabla = CANAL_TO_TABLA.get(canal, 'a')
+
+        if id_bitacora and texto_bitacora:
+            if not self.ejecutor.enviar(tabla, id_bitacora, texto_bitacora, tabla):
+                log.warning("⚠️  Cola de clasificacion llena, bitacora %s (tabla %s) descartada", id_bitacora, tabla)
+        else:
+            log.warning("Payload incompleto: %s", payload)
+
+
+def crear_perfil():
+    """Componentes del perfil de bitacoras, con la configuracion del entorno"""
+    # API Key para autenticacion
+    headers = {
+        'Content-Type': 'application/json',
+        'X-API-Key': os.environ.get('API_KEY', 'gm-internal-service-key-2025'),
+    }
+
+    # Clasificaciones simultaneas (cada una es una llamada al LLM de hasta HTTP_TIMEOUT_CLASIFICAR s)
+    concurrencia = int(os.environ.get('CLASIFICACION_CONCURRENCIA', 4))
+
+    # Session HTTP compartida (keep-alive); una conexion por clasificacion en curso
+    cliente = ClienteHTTP(headers, pool_maxsize=concurrencia)
+
+    # Cache de clasificaciones por texto normalizado (LRU + TTL, opcionalmente en disco)
+    cache = CacheClasificaciones() if os.environ.get('CACHE_CLASIFICACION_HABILITADO', '1') == '1' else None
+
+    clasificador = ClasificadorBitacoras(base_url(), cliente, float(os.environ.get('HTTP_TIMEOUT_CLASIFICAR', 120)),
+                                         cache=cache)
+
+    # Clasificacion por lote: bitacoras que se juntan y cuanto se espera a que lleguen mas
+    lote_max = int(os.environ.get('CLASIFICACION_LOTE_MAX', 8))
+    ventana = float(os.environ.get('CLASIFICACION_LOTE_VENTANA', 2))
+
+    # Clasificaciones fuera del loop de notificaciones, atendiendo las tablas a y b por turnos
+    # Con CLASIFICACION_LOTE_MAX > 1 cada trabajador junta bitacoras y las clasifica por lote
+    ejecutor = EjecutorJusto('bitacoras',
+                             clasificador.clasificar_lote if lote_max > 1 else clasificador.clasificar_bitacora,
+                             colas=['a', 'b'], concurrencia=concurrencia,
+                             tamano_lote=lote_max, ventana=ventana)
+
+    # Rutas JSON con estadisticas internas del perfil
+    rutas = {
+        '/clasificacion': ejecutor.estadisticas,  # cola por tabla y latencias
+        '/clasificador': clasificador.estadisticas,  # resultados, errores y rutas del backend disponibles
+        '/http': cliente.estadisticas,            # reutilizacion de conexiones
+    }
+    if cache is not None:
+        rutas['/cache'] = cache.estadisticas      # aciertos del cache de clasificaciones
+
+    return Perfil('bitacoras', ConsumidorBitacoras(ejecutor, clasificador.clasificar_url), rutas,
+                  ejecutor=ejecutor)
@@ -0,0 +1,3 @@
+"""
+Modulos compartidos por los listeners de Bomba A, Bomba B y bitacoras.
+"""
@@ -0,0 +1,244 @@
+"""
+Modo de ejecucion asyncio (MODO_EJECUCION=async).
+
+Todo corre en un solo event loop:
+  - la conexion LISTEN se vigila con loop.add_reader() sobre el socket de
+    psycopg2 en vez de select.select() bloqueante;
+  - los POST al backend son corrutinas (ClienteHTTP.post_async, con aiohttp
+    si esta instalado) limitadas por un semaforo de concurrencia;
+  - el servidor de health checks es un asyncio.start_server, de modo que una
+    sonda lenta no bloquea a las demas.
+
+Los consumidores no cambian: siguen recibiendo procesar(canal, payload) desde
+el loop. Lo que bloquea en psycopg2 (conexion, heartbeat, relleno,
+coordinacion de replicas) se ejecuta en un hilo con asyncio.to_thread.
+"""
+
+import asyncio
+import json
+import threading
+import time
+
+from comun import logs
+from comun.despacho import PRIORIDAD_ALTA, Despachador
+from comun.fuentes import ConexionPerdida
+from comun.metricas import REGISTRO, TIPO_CONTENIDO
+
+log = logs.obtener('asincrono')
+
+
+class DespachadorAsync(Despachador):
+    """Misma interfaz que Despachador, con tareas asyncio en lugar de hilos"""
+
+    asincrono = True
+
+    def iniciar(self):
+        """Crea las tareas trabajadoras en el loop actual (idempotente)"""
+        if self._hilos:
+            return
+        self._loop = asyncio.get_running_loop()
+        self._hilo_loop = threading.get_ident()
+        self._colas = [asyncio.PriorityQueue() for _ in range(self.num_trabajadores)]  # sin maxsize
+        for i, cola in enumerate(self._colas):
+            self._hilos.append(self._loop.create_task(self._trabajar(cola), name=f"{self.nombre}-{i}"))
+        log.info("Despachador '%s' iniciado (asyncio): %d trabajadores, max %d pendientes",
+                 self.nombre, self.num_trabajadores, self.max_pendientes)
+
+    def enviar(self, clave, funcion, *args, prioridad=PRIORIDAD_ALTA):
+        """
+        Encola funcion(*args); funcion puede ser una corrutina o una funcion normal
+        (que se ejecuta en un hilo). Se puede llamar desde otro hilo. No bloquea.
+        """
+        if not self._admitir(prioridad):
+            return False
+
+        # Las colas no tienen maxsize: el cupo ya lo reservo _admitir, asi que put_nowait
+        # no puede fallar aunque se ejecute despues en el loop (call_soon_threadsafe)
+        cola = self._colas[hash(clave) % self.num_trabajadores]
+        item = (prioridad, next(self._secuencia), clave, funcion, args, time.monotonic())
+        if threading.get_ident() == self._hilo_loop:
+            cola.put_nowait(item)
+            return True
+        try:
+            self._loop.call_soon_threadsafe(cola.put_nowait, item)
+        except RuntimeError:
+            # Loop cerrado: la tarea no se va a ejecutar, se devuelve su lugar
+            self._liberar(prioridad)
+            return False
+        return True
+
+    async def _trabajar(self, cola):
+        while True:
+            item = await cola.get()
+            espera = self._esperar_presupuesto(item[0])
+            if espera:
+                cola.put_nowait(item)
+                await asyncio.sleep(espera)
+                continue
+            prioridad, _, clave, funcion, args, encolado_en = item
+            inicio = time.monotonic()
+            error = False
+            try:
+                if asyncio.iscoroutinefunction(funcion):
+                    await funcion(*args)
+                else:
+                    await asyncio.to_thread(funcion, *args)
+            except Exception as e:
+                error = True
+                log.error("Error en despachador '%s' (%s): %s", self.nombre, clave, e)
+            self._terminar(prioridad, clave, error, inicio - encolado_en, time.monotonic() - inicio)
+
+
+async def _revisar(motor):
+    """motor.revisar() con la coordinacion de replicas (SQL bloqueante de psycopg2) en un hilo"""
+    replicas = motor.replicas
+    if replicas is not None and replicas.pendiente() and motor.fuente.cur is not None:
+        motor.tomar(await asyncio.to_thread(replicas.coordinar, motor.fuente.cur))
+    motor.revisar(coordinar=False)
+
+
+async def escuchar(motor):
+    """Equivalente asyncio de MotorListener.ejecutar()"""
+    loop = asyncio.get_running_loop()
+
+    for consumidor in motor.consumidores:
+        consumidor.iniciar()
+
+    intentos_conexion = 0
+    reconexiones_consecutivas = 0
+
+    while True:
+        # psycopg2.connect es bloqueante; se hace fuera del loop
+        if not await asyncio.to_thread(motor.conectar):
+            intentos_conexion += 1
+            reconexiones_consecutivas += 1
+            tiempo_espera = motor.tiempo_espera(intentos_conexion)
+
+            log.warning("Reintento %d (reconexiones consecutivas: %d/%d). Esperando %s segundos antes del próximo intento...",
+                        intentos_conexion, reconexiones_consecutivas, motor.max_reconexiones, tiempo_espera)
+
+            if motor.limite_alcanzado(intentos_conexion, reconexiones_consecutivas):
+                log.error("Se alcanzó el límite de %d reconexiones consecutivas fallidas. Deteniendo...",
+                          motor.max_reconexiones)
+                break
+
+            await asyncio.sleep(tiempo_espera)
+            continue
+
+        intentos_conexion = 0
+        reconexiones_consecutivas = 0
+        log.info("Conexión exitosa. Contadores de reintento reiniciados.")
+
+        fuente = motor.fuente
+        hay_datos = asyncio.Event()
+        # Las fuentes sin socket (capturas, sinteticas) se esperan en un hilo
+        descriptor = fuente.fileno() if hasattr(fuente, 'fileno') else None
+        if descriptor is not None:
+            loop.add_reader(descriptor, hay_datos.set)
+        try:
+            # La consulta de relleno bloquea; las filas se entregan desde el loop
+            if motor.relleno is not None and fuente.cur is not None:
+                for canal, payload in await asyncio.to_thread(motor.relleno.consultar, fuente.cur):
+                    motor.entregar(canal, payload)
+            ultima_actividad = time.monotonic()
+
+            while True:
+                try:
+                    if descriptor is not None:
+                        await asyncio.wait_for(hay_datos.wait(), motor.espera())
+                    elif not await asyncio.to_thread(fuente.esperar, motor.espera()):
+                        raise asyncio.TimeoutError
+                except asyncio.TimeoutError:
+                    await _revisar(motor)
+                    if time.monotonic() - ultima_actividad < motor.intervalo_heartbeat:
+                        continue
+                    try:
+                        # SELECT 1 bloqueante: con la conexion medio caida congelaria el loop
+                        await asyncio.to_thread(fuente.latido)
+                        ultima_actividad = time.monotonic()
+                        continue
+                    except ConexionPerdida as e:
+                        log.warning("Conexión perdida (heartbeat falló): %s. Reconectando...", e)
+                        reconexiones_consecutivas += 1
+                        break
+
+                hay_datos.clear()
+                motor.drenar()
+                await _revisar(motor)
+                ultima_actividad = time.monotonic()
+                if fuente.agotada:
+                    log.info("Fuente de notificaciones agotada, %s detenido", motor.nombre)
+                    fuente.cerrar()
+                    return
+
+        except Exception as e:
+            log.exception("Error inesperado: %s", e)
+            reconexiones_consecutivas += 1
+        finally:
+            if descriptor is not None:
+                loop.remove_reader(descriptor)
+
+        motor.cerrar()
+
+        tiempo_espera = motor.tiempo_espera(reconexiones_consecutivas)
+        log.info("Esperando %s segundos antes de reconectar...", tiempo_espera)
+        await asyncio.sleep(tiempo_espera)
+
+
+async def servir_salud(puerto, rutas_estadisticas, pagina_html, ultimos=None):
+    """Servidor HTTP minimo para health checks, rutas JSON de estadisticas y /ultimos"""
+
+    async def atender(lector, escritor):
+        try:
+            linea = await asyncio.wait_for(lector.readline(), 10)
+            # De los encabezados de la peticion solo interesa If-None-Match (/ultimos)
+            etag_cliente = None
+            while True:
+                encabezado = await asyncio.wait_for(lector.readline(), 10)
+                if encabezado in (b'\r\n', b'\n', b''):
+                    break
+                nombre, _, valor = encabezado.decode('latin-1').partition(':')
+                if nombre.strip().lower() == 'if-none-match':
+                    etag_cliente = valor.strip()
+            partes = linea.decode('latin-1').split()
+            ruta = partes[1] if len(partes) > 1 else '/'
+
+            if ruta.split('?')[0] == '/ultimos' and ultimos is not None:
+                status, encabezados, cuerpo = ultimos.responder(ruta, etag_cliente)
+                razon = {200: 'OK', 304: 'Not Modified', 404: 'Not Found'}[status]
+                extra = ''.join(f"{n}: {v}\r\n" for n, v in encabezados.items())
+                escritor.write(
+                    f"HTTP/1.1 {status} {razon}\r\n{extra}"
+                    f"Content-Length: {len(cuerpo)}\r\nConnection: close\r\n\r\n".encode() + cuerpo
+                )
+                await escritor.drain()
+                return
+            if ruta == '/metrics':
+                cuerpo = REGISTRO.exponer().encode()
+                tipo = TIPO_CONTENIDO
+            elif ruta in rutas_estadisticas:
+                cuerpo = json.dumps(rutas_estadisticas[ruta]()).encode()
+                tipo = 'application/json'
+            else:
+                cuerpo = pagina_html
+                tipo = 'text/html'
+            escritor.write(
+                f"HTTP/1.1 200 OK\r\nContent-Type: {tipo}\r\n"
+                f"Content-Length: {len(cuerpo)}\r\nConnection: close\r\n\r\n".encode() + cuerpo
+            )
+            await escritor.drain()
+        except Exception as e:
+            log.error("Error en servidor de salud: %s", e)
+        finally:
+            escritor.close()
+
+    servidor = await asyncio.start_server(atender, '', puerto)
+    log.info("Servidor HTTP (asyncio) iniciado en el puerto %s", puerto)
+    return servidor
+
+
+async def ejecutar_asincrono(motor, rutas_estadisticas, pagina_html, puerto=8080):
+    """Punto de entrada del modo asyncio: servidor de salud + motor en el mismo loop"""
+    servidor = await servir_salud(puerto, rutas_estadisticas, pagina_html, motor.ultimos)
+    async with servidor:
+        await escuchar(motor)
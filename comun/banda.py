@@ -0,0 +1,84 @@
+"""
+Banda muerta de las lecturas individuales por canal.
+
+Cada lectura de un canal con endpoint individual se compara con la ultima
+que se envio de ese canal; si la diferencia no supera la banda
+
+    banda = max(absoluta, relativa * |valor_enviado|)
+
+la lectura no genera un POST. Para que el backend no pierda un sensor que
+no se mueve, una lectura se envia igual si pasaron `silencio_max` segundos
+(de tiempo_sensor) desde el ultimo envio del canal. Con ambas bandas en
+cero solo se omiten los valores exactamente repetidos. Los valores no
+numericos se envian siempre que cambien.
+"""
+
+import threading
+import time
+
+from comun.tramas import parsear_tiempo
+
+
+class BandaMuerta:
+    """Decide por canal si una lectura individual se envia o cae dentro de la banda"""
+
+    def __init__(self, canales, absoluta=0.0, relativa=0.0, silencio_max=300.0, por_canal=None):
+        por_canal = por_canal or {}
+        # canal -> (absoluta, relativa, silencio_max)
+        self.bandas = {}
+        for canal in canales:
+            propia = por_canal.get(canal, {})
+            self.bandas[canal] = (float(propia.get('absoluta', absoluta)),
+                                  float(propia.get('relativa', relativa)),
+                                  float(propia.get('silencio', silencio_max)))
+
+        self._lock = threading.Lock()
+        self._enviados = {}  # canal -> (valor, segundos)
+
+        # Contadores por canal
+        self.enviadas = {}
+        self.suprimidas = {}
+        self.por_silencio = {}
+
+    def admitir(self, canal, valor, tiempo_sensor):
+        """True si la lectura debe enviarse (y la registra como la ultima enviada del canal)"""
+        banda = self.bandas.get(canal)
+        if banda is None:
+            return True
+        absoluta, relativa, silencio_max = banda
+        parseado = parsear_tiempo(str(tiempo_sensor))
+        segundos = parseado[1] if parseado is not None else time.time()
+
+        with self._lock:
+            anterior = self._enviados.get(canal)
+            if anterior is not None:
+                valor_enviado, segundos_enviado = anterior
+                try:
+                    dentro = abs(float(valor) - float(valor_enviado)) <= max(absoluta,
+                                                                            relativa * abs(float(valor_enviado)))
+                except (TypeError, ValueError):
+                    dentro = valor == valor_enviado
+                if dentro:
+                    if not silencio_max or segundos - segundos_enviado < silencio_max:
+                        self.suprimidas[canal] = self.suprimidas.get(canal, 0) + 1
+                        return False
+                    self.por_silencio[canal] = self.por_silencio.get(canal, 0) + 1
+            self._enviados[canal] = (valor, segundos)
+            self.enviadas[canal] = self.enviadas.get(canal, 0) + 1
+            return True
+
+    def estadisticas(self):
+        with self._lock:
+            enviadas = sum(self.enviadas.values())
+            suprimidas = sum(self.suprimidas.values())
+            return {
+                'enviadas': enviadas,
+                'suprimidas': suprimidas,
+                'enviadas_por_silencio': sum(self.por_silencio.values()),
+                'fraccion_suprimida': suprimidas / (enviadas + suprimidas) if enviadas + suprimidas else 0.0,
+                'canales': {canal: {'absoluta': absoluta, 'relativa': relativa, 'silencio_max': silencio_max,
+                                    'enviadas': self.enviadas.get(canal, 0),
+                                    'suprimidas': self.suprimidas.get(canal, 0),
+                                    'por_silencio': self.por_silencio.get(canal, 0)}
+                            for canal, (absoluta, relativa, silencio_max) in self.bandas.items()},
+            }
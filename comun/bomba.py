@@ -0,0 +1,456 @@
+"""
+Agregador de lecturas de una bomba.
+
+Un AgregadorBomba es un consumidor del MotorListener: recibe las lecturas
+de sus canales, reenvia cada una a su endpoint individual y arma los
+conjuntos por tiempo_sensor para la prediccion unificada. Bomba A y
+Bomba B son dos instancias con distinto perfil (canales, campos y URLs).
+Con TRAMA_PLAZO, una trama que no se completa a tiempo se envia con el
+ultimo valor conocido de los campos que faltan (marcados como imputados).
+Con VENTANA_TAMANO cada envio lleva las estadisticas de ventana movil de
+cada campo (comun/ventanas.py). Con COMPUERTA_HABILITADA las tramas que no
+cambiaron respecto de la ultima enviada se omiten (comun/compuerta.py), y
+con BANDA_HABILITADA las lecturas individuales dentro de la banda muerta de
+su canal no se envian (comun/banda.py).
+Si tiene outbox, cada prediccion se registra en disco antes de enviarse y
+se reintenta mas tarde si el backend no la recibe.
+"""
+
+import json
+import logging
+import os
+import time
+
+import requests
+
+from comun import logs
+from comun.banda import BandaMuerta
+from comun.codec import LECTURA
+from comun.compuerta import CompuertaCambios
+from comun.metricas import BUCKETS_TRAMA, REGISTRO
+from comun.outbox import reintentable
+from comun.relleno import tablas_de_canales
+from comun.tramas import AlmacenTramas
+from comun.ventanas import VentanaMovil
+
+LATENCIA_TRAMA = REGISTRO.histograma(
+    'listener_trama_completado_segundos', 'Tiempo entre el primer campo de una trama y su envio a prediccion',
+    ['perfil'], buckets=BUCKETS_TRAMA)
+TRAMAS_PENDIENTES = REGISTRO.medidor(
+    'listener_tramas_pendientes', 'Tramas incompletas en memoria', ['perfil'])
+TRAMAS_VENCIDAS = REGISTRO.contador(
+    'listener_tramas_vencidas_total', 'Tramas que vencieron su plazo, imputadas o descartadas',
+    ['perfil', 'resultado'])
+COMPUERTA = REGISTRO.contador(
+    'listener_compuerta_tramas_total', 'Tramas completas enviadas u omitidas por la compuerta de cambios',
+    ['perfil', 'decision'])
+LECTURAS_BANDA = REGISTRO.contador(
+    'listener_banda_lecturas_total', 'Lecturas individuales enviadas o suprimidas por la banda muerta',
+    ['perfil', 'decision'])
+
+log = logs.obtener('bomba')
+
+
+class AgregadorBomba:
+    """Perfil de bomba: canales -> campos, endpoints individuales y prediccion unificada"""
+
+    # Sus canales se decodifican a registros Lectura (tiempo_sensor, valor, id_sensor)
+    esquema = LECTURA
+
+    def __init__(self, nombre, canal_to_campo, canal_endpoints, campos_requeridos,
+                 base_url, prediccion_url, cliente, despachador, agrupador,
+                 timeout_prediccion=60, max_tramas=10, outbox=None, plazo_trama=0,
+                 antiguedad_maxima=300, min_presentes=1, campo_imputados='campos_imputados',
+                 resolucion=0.0, tolerancia=None, tamano_ventana=0, adjuntar_ventana=True,
+                 campo_ventana='ventana', compuerta=False, umbral_cambio=3.0, alfa_cambio=0.1,
+                 latido_cambio=60.0, banda=False, banda_absoluta=0.0, banda_relativa=0.0,
+                 silencio_banda=300.0, max_reintentos=100):
+        self.nombre = nombre
+        self.canal_to_campo = canal_to_campo
+        self.canal_endpoints = canal_endpoints
+        self.campos_requeridos = campos_requeridos
+        self.base_url = base_url
+        self.prediccion_url = prediccion_url
+        self.cliente = cliente
+        self.despachador = despachador
+        self.agrupador = agrupador
+        self.timeout_prediccion = timeout_prediccion
+        self.outbox = outbox
+        if outbox is not None:
+            outbox.registrar('prediccion', self._entregar_prediccion)
+        self.canales = list(canal_to_campo.keys())
+        # Tablas de sensores de las que se recuperan las lecturas perdidas al reconectar
+        self.tablas_relleno = tablas_de_canales(self.canales)
+
+        # Conjuntos de datos por tiempo_sensor (arreglo de valores + mascara de campos presentes)
+        # Con TRAMA_RESOLUCION los tiempos se agrupan en cubetas de ese ancho (segundos)
+        max_tramas = int(os.environ.get('TRAMA_MAX_PENDIENTES', max_tramas))
+        resolucion = float(os.environ.get('TRAMA_RESOLUCION', resolucion))
+        tolerancia = os.environ.get('TRAMA_TOLERANCIA', tolerancia)
+        # Sin outbox, las completas que no entran a la cola llena esperan reintento (hasta
+        # TRAMA_MAX_REINTENTOS; al superarlo se abandona la mas antigua)
+        self.tramas = AlmacenTramas(campos_requeridos, canal_to_campo, max_tramas=max_tramas,
+                                    resolucion=resolucion,
+                                    tolerancia=float(tolerancia) if tolerancia not in (None, '') else None,
+                                    max_aplazadas=int(os.environ.get('TRAMA_MAX_REINTENTOS', max_reintentos)))
+        self._etiqueta = nombre.upper()
+        self.tardias = 0
+        self.coalescidas = 0
+        self.imputadas = 0
+        self.vencidas_descartadas = 0
+
+        # Plazo de las tramas incompletas (0 = esperar todos los campos, sin limite).
+        # Al vencer se completan con el ultimo valor de cada campo si no tiene mas de
+        # antiguedad_maxima segundos; el envio lista los campos imputados en campo_imputados.
+        self.plazo_trama = float(os.environ.get('TRAMA_PLAZO', plazo_trama))
+        self.antiguedad_maxima = float(os.environ.get('TRAMA_ANTIGUEDAD_MAXIMA', antiguedad_maxima))
+        self.min_presentes = int(os.environ.get('TRAMA_MIN_PRESENTES', min_presentes))
+        self.campo_imputados = os.environ.get('TRAMA_CAMPO_IMPUTADOS', campo_imputados)
+        # Media, desviacion, minimo, maximo y pendiente de cada campo en las ultimas
+        # VENTANA_TAMANO tramas (0 = no calcular); se adjuntan al envio en campo_ventana
+        tamano_ventana = int(os.environ.get('VENTANA_TAMANO', tamano_ventana))
+        self.ventana = VentanaMovil(campos_requeridos, tamano_ventana) if tamano_ventana > 0 else None
+        self.adjuntar_ventana = os.environ.get('VENTANA_ADJUNTAR', '1' if adjuntar_ventana else '0') == '1'
+        self.campo_ventana = os.environ.get('VENTANA_CAMPO', campo_ventana)
+        self._ultima_ventana = None
+        if self.ventana is not None:
+            log.info("[%s] Ventana movil de %d tramas (%s)", nombre, tamano_ventana,
+                     'NumPy' if self.ventana.numpy else 'Python puro, NumPy no instalado')
+        # Compuerta de cambios: una trama que ningun campo movio mas de COMPUERTA_UMBRAL
+        # desviaciones (EWMA) desde la ultima enviada se omite, salvo cada COMPUERTA_LATIDO segundos
+        self.compuerta = None
+        if os.environ.get('COMPUERTA_HABILITADA', '1' if compuerta else '0') == '1':
+            umbral_cambio = float(os.environ.get('COMPUERTA_UMBRAL', umbral_cambio))
+            self.compuerta = CompuertaCambios(
+                campos_requeridos,
+                umbral=umbral_cambio,
+                alfa=float(os.environ.get('COMPUERTA_ALFA', alfa_cambio)),
+                latido=float(os.environ.get('COMPUERTA_LATIDO', latido_cambio)),
+                calentamiento=int(os.environ.get('COMPUERTA_CALENTAMIENTO', 10)),
+                desv_min=float(os.environ.get('COMPUERTA_DESV_MIN', 0.001)),
+                umbrales=json.loads(os.environ.get('COMPUERTA_UMBRALES', '{}') or '{}'))
+            log.info("[%s] Compuerta de cambios: umbral %s desviaciones, latido %ss", nombre,
+                     umbral_cambio, self.compuerta.latido)
+        # Banda muerta de los envios individuales: una lectura que no se aleja de la ultima
+        # enviada del canal mas de max(absoluta, relativa * |valor|) no genera POST, salvo
+        # cada BANDA_SILENCIO_MAX segundos. BANDA_CANALES ajusta las bandas de cada canal.
+        self.banda = None
+        if os.environ.get('BANDA_HABILITADA', '1' if banda else '0') == '1':
+            self.banda = BandaMuerta(
+                list(canal_endpoints),
+                absoluta=float(os.environ.get('BANDA_ABSOLUTA', banda_absoluta)),
+                relativa=float(os.environ.get('BANDA_RELATIVA', banda_relativa)),
+                silencio_max=float(os.environ.get('BANDA_SILENCIO_MAX', silencio_banda)),
+                por_canal=json.loads(os.environ.get('BANDA_CANALES', '{}') or '{}'))
+            log.info("[%s] Banda muerta en %d canales individuales", nombre, len(self.banda.bandas))
+
+        # Cada cuanto el motor debe llamar a revisar() (sin plazo, solo para los reintentos)
+        self.intervalo_revision = min(max(self.plazo_trama / 4, 0.1), 1.0) if self.plazo_trama else 1.0
+        TRAMAS_PENDIENTES.registrar(lambda: len(self.tramas), nombre)
+
+    def iniciar(self):
+        self.despachador.iniciar()
+        self.agrupador.iniciar()
+        if self.outbox is not None:
+            self.outbox.iniciar()
+
+    def procesar(self, canal, payload):
+        """Procesa una lectura ya decodificada de uno de los canales de la bomba"""
+        tramas = self.tramas
+
+        # Extraer tiempo_sensor del payload (solo para agrupación)
+        tiempo_sensor = payload.tiempo_sensor
+
+        if not tiempo_sensor:
+            log.warning("[%s] Notificación sin tiempo_sensor en %s: %s", self.nombre, canal, payload)
+            return
+
+        # Trama (cubeta de tiempo con TRAMA_RESOLUCION) a la que pertenece la lectura
+        clave, fecha = tramas.ubicar(tiempo_sensor)
+
+        # Lectura tardia de un tiempo ya enviado: solo se reenvia a su endpoint individual
+        if tramas.cerrada(clave):
+            self.tardias += 1
+            log.debug("[%s] Lectura tardia de %s para tiempo %s ya enviado", self.nombre, canal, tiempo_sensor)
+            self._enviar_individual(canal, payload, tiempo_sensor)
+            return
+
+        # Obtener (o crear) el conjunto de datos para este tiempo
+        trama = tramas.obtener(clave, tiempo_sensor, fecha)
+
+        # Guardar valores en el conjunto de datos
+        # Si el valor es None, se usa 0.0 como valor por defecto
+        if canal in self.canal_to_campo:
+            campo = self.canal_to_campo[canal]
+            valor = payload.valor
+            if valor is None:
+                log.warning("'%s' tiene valor None para tiempo %s, usando 0.0 por defecto", campo, tiempo_sensor)
+                valor = 0.0
+            try:
+                tramas.guardar(trama, canal, valor)
+            except (TypeError, ValueError):
+                log.warning("'%s' tiene valor no numerico %r para tiempo %s, usando 0.0 por defecto",
+                            campo, valor, tiempo_sensor)
+                tramas.guardar(trama, canal, 0.0)
+
+            self._enviar_individual(canal, payload, tiempo_sensor)
+
+        # Verificar los datos para el tiempo actual
+        presentes = tramas.presentes(trama)
+        total = len(self.campos_requeridos)
+        # Una linea por notificacion, muestreada (LOG_MUESTREO)
+        if log.isEnabledFor(logging.INFO) and logs.muestrear('notificacion'):
+            log.info("[%s] Recibido en %s: %s (%d/%d campos para tiempo %s)",
+                     self.nombre, canal, payload, presentes, total, tiempo_sensor)
+
+        # Solo enviar cuando tengamos TODOS los campos requeridos
+        if tramas.completa(trama):
+            log.info("[%s] Conjunto completo para tiempo %s: %d/%d campos", self.nombre, trama.tiempo_sensor,
+                     presentes, total)
+            self._emitir(trama)
+        elif log.isEnabledFor(logging.DEBUG):
+            faltantes = tramas.faltantes(trama)
+            log.debug("Esperando más datos para tiempo %s. Faltan %d campos: %s",
+                      trama.tiempo_sensor, len(faltantes), faltantes)
+
+        # Limpieza de conjuntos antiguos incompletos
+        # IMPORTANTE: Nunca eliminar el timestamp que se esta procesando actualmente
+        if len(tramas) > tramas.max_tramas:
+            for t, n in tramas.limpiar(clave):
+                log.info("[%s] Eliminando conjunto incompleto para tiempo %s con %d/%d campos", self.nombre, t, n, total)
+
+    def clave_trama(self, tiempo_sensor):
+        """Trama de una lectura, para que el motor coalesca las rafagas por trama"""
+        return self.tramas.clave(tiempo_sensor)
+
+    def coalescida(self, canal, payload):
+        """Lectura descartada por el motor al coalescer una rafaga (otra del mismo canal y trama la reemplazo)"""
+        self.coalescidas += 1
+        log.debug("[%s] Lectura de %s para tiempo %s reemplazada al coalescer", self.nombre, canal,
+                  payload.tiempo_sensor)
+
+    def revisar(self):
+        """
+        Tareas periodicas (las llama el motor): reintenta las tramas completas
+        que no entraron a la cola de despacho y vence las que llevan mas de
+        plazo_trama segundos esperando campos. Cada trama vencida se completa
+        con el ultimo valor conocido de los campos que faltan y se envia
+        marcando los campos imputados; si algun faltante no tiene un valor
+        reciente se descarta.
+        """
+        self._reintentar()
+        if not self.plazo_trama:
+            return
+        tramas = self.tramas
+        total = len(self.campos_requeridos)
+        for trama in tramas.vencidas(self.plazo_trama):
+            if tramas.completa(trama):
+                continue  # pendiente de reintento (cola de despacho llena)
+            presentes = tramas.presentes(trama)
+            if presentes < self.min_presentes or not tramas.imputar(trama, self.antiguedad_maxima):
+                self.vencidas_descartadas += 1
+                TRAMAS_VENCIDAS.inc(self.nombre, 'descartada')
+                log.warning("[%s] Plazo de %ss vencido para tiempo %s con %d/%d campos, sin valores recientes "
+                            "para completarlo: se descarta (faltan %s)", self.nombre, self.plazo_trama,
+                            trama.tiempo_sensor, presentes, total, tramas.faltantes(trama))
+                tramas.descartar(trama.clave)
+                continue
+            self.imputadas += 1
+            TRAMAS_VENCIDAS.inc(self.nombre, 'imputada')
+            log.info("[%s] Plazo de %ss vencido para tiempo %s: %d/%d campos, se imputan %s",
+                     self.nombre, self.plazo_trama, trama.tiempo_sensor, presentes, total,
+                     tramas.campos_imputados(trama))
+            self._emitir(trama)
+
+    def _enviar_individual(self, canal, payload, tiempo_sensor):
+        # Enviar también a la ruta individual (sin el tiempo_sensor)
+        endpoint = self.canal_endpoints.get(canal)
+        if endpoint:
+            if self.banda is not None:
+                if not self.banda.admitir(canal, payload.valor, tiempo_sensor):
+                    LECTURAS_BANDA.inc(self.nombre, 'suprimida')
+                    return
+                LECTURAS_BANDA.inc(self.nombre, 'enviada')
+            # Solo enviamos id_sensor y valor
+            data = {
+                'id_sensor': payload.id_sensor,
+                'valor': payload.valor
+            }
+            self.agrupador.agregar(endpoint, data, tiempo_sensor)
+
+    def _reintentar(self):
+        """Reintenta en orden las tramas completas pendientes; se detiene si la cola sigue llena"""
+        for trama in self.tramas.aplazadas():
+            if not self._emitir(trama):
+                break
+
+    @staticmethod
+    def _instante(trama):
+        """Segundos epoch del tiempo_sensor de la trama (el reloj local si no es parseable)"""
+        t = trama.orden[0]
+        return t if t != float('-inf') else time.time()
+
+    def _emitir(self, trama):
+        """
+        Envia una trama completa (real o imputada) a la prediccion unificada.
+        Retorna False si la cola de despacho esta llena y la trama queda en los reintentos.
+        """
+        tramas = self.tramas
+        tiempo_sensor = trama.tiempo_sensor
+        espera = time.monotonic() - trama.creada
+
+        # Filtrar solo los campos requeridos para el envio
+        datos_a_enviar = tramas.datos(trama)
+        campos_extra = tramas.extras(trama)
+        if trama.imputados and self.campo_imputados:
+            datos_a_enviar[self.campo_imputados] = tramas.campos_imputados(trama)
+        if self.ventana is not None:
+            # Una sola vez por trama, aunque se reintente el envio con la cola llena
+            if trama.caracteristicas is None:
+                trama.caracteristicas = self.ventana.agregar(self._instante(trama), trama.valores)
+                self._ultima_ventana = (tiempo_sensor, trama.caracteristicas)
+            if self.adjuntar_ventana and self.campo_ventana:
+                datos_a_enviar[self.campo_ventana] = trama.caracteristicas
+        if self.compuerta is not None:
+            # Tambien una sola vez por trama: el reintento de una aprobada no se vuelve a evaluar
+            if trama.aprobada is None:
+                trama.aprobada, motivo, distancia = self.compuerta.evaluar(self._instante(trama), trama.valores)
+                COMPUERTA.inc(self.nombre, motivo)
+                if not trama.aprobada:
+                    log.debug("[%s] Trama %s sin cambios (distancia %.2f del umbral), se omite",
+                              self.nombre, tiempo_sensor, distancia)
+                    tramas.eliminar(trama.clave)
+                    return True
+
+        if campos_extra:
+            log.info("NOTA: Se omiten %d campos extra del envio: %s", len(campos_extra), list(campos_extra))
+        if log.isEnabledFor(logging.DEBUG):
+            log.debug("Datos a enviar: %s", dict(sorted(datos_a_enviar.items())))
+            log.debug("Campos extra: %s", dict(sorted(campos_extra.items())))
+
+        # Con outbox, la prediccion se registra en disco antes de despacharla
+        id_fila = None
+        if self.outbox is not None:
+            id_fila = self.outbox.guardar('prediccion', f"prediccion|{self.nombre}|{tiempo_sensor}",
+                                          {'tiempo_sensor': tiempo_sensor, 'datos': datos_a_enviar})
+
+        # El POST se hace en el despachador; el conjunto se elimina al encolarlo
+        enviar = self.enviar_prediccion_async if self.despachador.asincrono else self.enviar_prediccion
+        if self.outbox is not None and id_fila is None:
+            log.info("Prediccion para %s ya registrada en el outbox, se omite", tiempo_sensor)
+            tramas.eliminar(trama.clave)
+        elif self.despachador.enviar(self.prediccion_url, enviar, tiempo_sensor, datos_a_enviar, id_fila):
+            LATENCIA_TRAMA.observar(espera, self.nombre)
+            tramas.eliminar(trama.clave)
+        elif id_fila is not None:
+            # Queda en disco; el hilo de drenado del outbox la enviara
+            self.outbox.liberar(id_fila)
+            LATENCIA_TRAMA.observar(espera, self.nombre)
+            tramas.eliminar(trama.clave)
+            log.warning("Cola de despacho llena, prediccion para %s queda en el outbox", tiempo_sensor)
+        else:
+            # Sin outbox: queda apartada en memoria y revisar() la reintenta
+            if not tramas.aplazada(trama.clave):
+                log.warning("Cola de despacho llena, prediccion para %s queda pendiente de reintento",
+                            tiempo_sensor)
+                descartada = tramas.aplazar(trama)
+                if descartada is not None:
+                    log.warning("[%s] Mas de %d predicciones pendientes de reintento: se abandona la de %s",
+                                self.nombre, tramas.max_aplazadas, descartada.tiempo_sensor)
+            return False
+        return True
+
+    def enviar_prediccion(self, tiempo_sensor, datos_a_enviar, id_fila=None):
+        """Envia un conjunto completo a la prediccion unificada (se ejecuta en el despachador)"""
+        self.cliente.ejecutar(self._pasos_prediccion(tiempo_sensor, datos_a_enviar, id_fila))
+
+    async def enviar_prediccion_async(self, tiempo_sensor, datos_a_enviar, id_fila=None):
+        """Igual que enviar_prediccion, para el despachador asyncio"""
+        await self.cliente.ejecutar_async(self._pasos_prediccion(tiempo_sensor, datos_a_enviar, id_fila))
+
+    def _pasos_prediccion(self, tiempo_sensor, datos_a_enviar, id_fila):
+        """Envio a la prediccion unificada como generador de pasos (ver ClienteHTTP.ejecutar)"""
+        log.debug("PREDICCION GENERAL %s - enviando tiempo %s a %s", self._etiqueta, tiempo_sensor, self.prediccion_url)
+        try:
+            res = yield self.prediccion_url, datos_a_enviar, self.timeout_prediccion
+        except Exception as e:
+            self._error_prediccion(e)
+            self._cerrar_outbox(id_fila, error=e)
+            return
+        self._respuesta_prediccion(tiempo_sensor, res)
+        self._cerrar_outbox(id_fila, res.status_code)
+
+    def _cerrar_outbox(self, id_fila, status_code=None, error=None):
+        if id_fila is None:
+            return
+        if error is not None or reintentable(status_code):
+            self.outbox.reprogramar(id_fila, error or f"HTTP {status_code}")
+        else:
+            self.outbox.confirmar(id_fila)
+
+    def _entregar_prediccion(self, datos):
+        """Entregador del outbox: reenvia una prediccion pendiente (hilo de drenado)"""
+        tiempo_sensor = datos['tiempo_sensor']
+        res = self.cliente.post(self.prediccion_url, datos['datos'], self.timeout_prediccion)
+        log.info("Outbox: prediccion %s para %s reenviada: %s", self.nombre, tiempo_sensor, res.status_code)
+        if reintentable(res.status_code):
+            raise RuntimeError(f"HTTP {res.status_code}")
+        return None
+
+    def _respuesta_prediccion(self, tiempo_sensor, res):
+        etiqueta = self._etiqueta
+        if res.status_code == 200:
+            log.info("PREDICCION GENERAL %s - EXITOSA para tiempo %s", etiqueta, tiempo_sensor)
+            if log.isEnabledFor(logging.DEBUG):
+                try:
+                    log.debug("  Respuesta JSON: %s", res.json())
+                except ValueError:
+                    log.debug("  Respuesta texto: %s", res.text[:200] if res.text else 'Sin contenido')
+        else:
+            log.warning("PREDICCION GENERAL %s - ERROR %s para tiempo %s en %s: %s",
+                        etiqueta, res.status_code, tiempo_sensor, self.prediccion_url,
+                        res.text[:500] if res.text else 'Sin contenido')
+
+    def _error_prediccion(self, e):
+        etiqueta = self._etiqueta
+        url = self.prediccion_url
+        if isinstance(e, requests.exceptions.ConnectionError):
+            log.error("PREDICCION GENERAL %s - ERROR DE CONEXION a %s: %s", etiqueta, url, e)
+        elif isinstance(e, requests.exceptions.Timeout):
+            log.error("PREDICCION GENERAL %s - TIMEOUT en %s: %s", etiqueta, url, e)
+        else:
+            log.error("PREDICCION GENERAL %s - ERROR INESPERADO: %s", etiqueta, e, exc_info=e)
+
+    def caracteristicas(self):
+        """Estadisticas de ventana movil de la ultima trama enviada (GET /ventana)"""
+        if self._ultima_ventana is None:
+            return None
+        tiempo_sensor, caracteristicas = self._ultima_ventana
+        return {'tiempo_sensor': tiempo_sensor, **caracteristicas, 'ventana': self.ventana.estadisticas()}
+
+    def estadisticas_tramas(self):
+        return {
+            'pendientes': len(self.tramas),
+            'plazo': self.plazo_trama,
+            'resolucion': self.tramas.resolucion_ms / 1000,
+            'tolerancia': self.tramas.tolerancia_ms / 1000,
+            'fuera_de_tolerancia': self.tramas.fuera_de_tolerancia,
+            'tiempos_no_parseables': self.tramas.no_parseables,
+            'imputadas': self.imputadas,
+            'vencidas_descartadas': self.vencidas_descartadas,
+            'lecturas_tardias': self.tardias,
+            'lecturas_coalescidas': self.coalescidas,
+            'reintentos': len(self.tramas.aplazadas()),
+            'reintentos_abandonados': self.tramas.aplazadas_descartadas,
+            'compuerta': self.compuerta.estadisticas() if self.compuerta is not None else None,
+        }
+
+    def estadisticas(self):
+        return {
+            'tramas': self.estadisticas_tramas(),
+            'despacho': self.despachador.estadisticas(),
+            'http': self.cliente.estadisticas(),
+            'lotes': self.agrupador.estadisticas(),
+            'banda': self.banda.estadisticas() if self.banda is not None else None,
+            'outbox': self.outbox.estadisticas() if self.outbox is not None else None,
+        }
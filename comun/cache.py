@@ -0,0 +1,139 @@
+"""
+Cache de clasificaciones de bitacoras por contenido.
+
+Los operadores suelen pegar textos identicos o casi (notas de cambio de
+turno, avisos de rutina) y cada copia pasaba por la llamada completa al LLM.
+La clave es el SHA-256 del texto normalizado (minusculas, espacios
+colapsados), asi que dos bitacoras que solo difieren en mayusculas o
+espacios comparten resultado.
+
+Las entradas se descartan por LRU cuando se supera max_entradas y expiran
+tras ttl segundos. Con `ruta` se persisten en SQLite y se recargan al
+reiniciar el listener.
+"""
+
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+from comun import logs
+
+log = logs.obtener('cache')
+
+# Campos del resultado del backend que se guardan y se reutilizan
+CAMPOS_RESULTADO = ('clasificacion', 'alerta_aviso')
+
+
+def normalizar(texto):
+    return ' '.join(str(texto).lower().split())
+
+
+def clave_texto(texto):
+    """Hash del texto normalizado"""
+    return hashlib.sha256(normalizar(texto).encode('utf-8')).hexdigest()
+
+
+class CacheClasificaciones:
+    """Cache LRU con TTL y persistencia opcional en SQLite"""
+
+    def __init__(self, max_entradas=1000, ttl=7 * 24 * 3600, ruta=None):
+        self.max_entradas = int(os.environ.get('CACHE_CLASIFICACION_MAX', max_entradas))
+        self.ttl = float(os.environ.get('CACHE_CLASIFICACION_TTL', ttl))
+        self.ruta = os.environ.get('CACHE_CLASIFICACION_RUTA', ruta or '') or None
+
+        self._lock = threading.Lock()
+        self._entradas = OrderedDict()   # clave -> (instante de guardado, resultado)
+        self._conn = None
+        if self.ruta:
+            self._conn = sqlite3.connect(self.ruta, check_same_thread=False, isolation_level=None)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("CREATE TABLE IF NOT EXISTS clasificaciones ("
+                               "clave TEXT PRIMARY KEY, resultado TEXT NOT NULL, guardado REAL NOT NULL)")
+            self._cargar()
+
+        # Contadores
+        self.aciertos = 0
+        self.fallos = 0
+        self.expirados = 0
+        self.descartados = 0
+
+    def _cargar(self):
+        """Recarga las entradas vigentes mas recientes desde disco"""
+        limite = time.time() - self.ttl
+        self._conn.execute("DELETE FROM clasificaciones WHERE guardado < ?", (limite,))
+        filas = self._conn.execute(
+            "SELECT clave, resultado, guardado FROM clasificaciones ORDER BY guardado DESC LIMIT ?",
+            (self.max_entradas,)).fetchall()
+        for clave, resultado, guardado in reversed(filas):
+            self._entradas[clave] = (guardado, json.loads(resultado))
+        log.info("Cache de clasificaciones: %d entradas cargadas desde %s", len(self._entradas), self.ruta)
+
+    def obtener(self, texto):
+        """
+        Resultado guardado para el texto, o None (cuenta un fallo). El acierto
+        lo cuenta quien lo usa, con contar(), cuando el resultado se aprovecho.
+        """
+        clave = clave_texto(texto)
+        with self._lock:
+            entrada = self._entradas.get(clave)
+            if entrada is None:
+                self.fallos += 1
+                return None
+            guardado, resultado = entrada
+            if time.time() - guardado > self.ttl:
+                del self._entradas[clave]
+                self.expirados += 1
+                self.fallos += 1
+                if self._conn is not None:
+                    self._conn.execute("DELETE FROM clasificaciones WHERE clave = ?", (clave,))
+                return None
+            self._entradas.move_to_end(clave)
+            return dict(resultado)
+
+    def contar(self, acierto):
+        """Resultado de usar una entrada obtenida: acierto si se aprovecho, fallo si no"""
+        with self._lock:
+            if acierto:
+                self.aciertos += 1
+            else:
+                self.fallos += 1
+
+    def guardar(self, texto, resultado):
+        """Guarda los campos de clasificacion del resultado del backend"""
+        resultado = {campo: resultado.get(campo) for campo in CAMPOS_RESULTADO}
+        if resultado.get('clasificacion') is None:
+            return
+        clave = clave_texto(texto)
+        ahora = time.time()
+        with self._lock:
+            self._entradas[clave] = (ahora, resultado)
+            self._entradas.move_to_end(clave)
+            descartadas = []
+            while len(self._entradas) > self.max_entradas:
+                descartadas.append(self._entradas.popitem(last=False)[0])
+                self.descartados += 1
+            if self._conn is not None:
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO clasificaciones (clave, resultado, guardado) VALUES (?, ?, ?)",
+                    (clave, json.dumps(resultado), ahora))
+                self._conn.executemany("DELETE FROM clasificaciones WHERE clave = ?",
+                                       [(c,) for c in descartadas])
+
+    def estadisticas(self):
+        with self._lock:
+            consultas = self.aciertos + self.fallos
+            return {
+                'entradas': len(self._entradas),
+                'max_entradas': self.max_entradas,
+                'ttl': self.ttl,
+                'persistente': self.ruta is not None,
+                'aciertos': self.aciertos,
+                'fallos': self.fallos,
+                'tasa_aciertos': self.aciertos / consultas if consultas else 0.0,
+                'expirados': self.expirados,
+                'descartados': self.descartados,
+            }
@@ -0,0 +1,234 @@
+"""
+Circuit breaker y limite de concurrencia adaptativo por endpoint.
+
+Cuando el backend se degrada, cada POST espera su timeout completo (30 s
+las lecturas, 60 s la prediccion) y los trabajadores pasan el tiempo
+bloqueados en llamadas que van a fallar. ClienteHTTP consulta aqui el
+circuito de cada URL antes de enviar:
+
+    cerrado     se envia; las ultimas `ventana` respuestas se evaluan y si la
+                fraccion de errores (excepcion, 408, 429, 5xx salvo 501) o de
+                respuestas lentas (mas de `lenta` veces el timeout de la
+                peticion) supera su umbral, el circuito se abre
+    abierto     se falla de inmediato con CircuitoAbierto (un ConnectionError,
+                asi el outbox lo reprograma como cualquier error de conexion)
+                durante `espera` segundos, duplicada en cada apertura seguida
+    semiabierto pasada la espera se deja pasar una sonda; si responde bien el
+                circuito se cierra, si no vuelve a abrirse. Solo decide la
+                respuesta de la sonda: adquirir() la marca y su resultado se
+                registra con sonda=True; las peticiones que salieron antes de
+                abrirse y responden tarde no cambian el estado
+
+Un 429 o 503 con Retry-After abre el circuito por ese tiempo. Ademas cada
+endpoint tiene un limite de POST simultaneos que crece de a uno por ronda
+de respuestas rapidas y se reduce a la mitad con cada error o respuesta
+lenta (AIMD); lo que lo excede tambien falla de inmediato.
+"""
+
+import threading
+import time
+from collections import deque
+from email.utils import parsedate_to_datetime
+
+import requests
+
+from comun import logs
+from comun.metricas import REGISTRO
+
+log = logs.obtener('circuito')
+
+CERRADO, SEMIABIERTO, ABIERTO = 'cerrado', 'semiabierto', 'abierto'
+CODIGO_ESTADO = {CERRADO: 0, SEMIABIERTO: 1, ABIERTO: 2}
+
+RECHAZOS = REGISTRO.contador(
+    'listener_circuito_rechazos_total', 'POST no enviados por circuito abierto o limite de concurrencia',
+    ['url', 'motivo'])
+ESTADO = REGISTRO.medidor(
+    'listener_circuito_estado', 'Estado del circuito por URL (0 cerrado, 1 semiabierto, 2 abierto)', ['url'])
+LIMITE = REGISTRO.medidor(
+    'listener_circuito_limite', 'Limite adaptativo de POST simultaneos por URL', ['url'])
+
+
+class CircuitoAbierto(requests.exceptions.ConnectionError):
+    """POST rechazado sin enviarse (circuito abierto o limite de concurrencia)"""
+
+
+def fallo_backend(status_code):
+    """Respuestas que indican un backend degradado (501 es 'ruta no soportada', no un fallo)"""
+    return status_code in (408, 429) or (status_code >= 500 and status_code != 501)
+
+
+def segundos_retry_after(valor):
+    """Segundos de un encabezado Retry-After (numero o fecha HTTP), o None"""
+    if not valor:
+        return None
+    try:
+        return max(float(valor), 0.0)
+    except ValueError:
+        pass
+    try:
+        return max(parsedate_to_datetime(valor).timestamp() - time.time(), 0.0)
+    except (TypeError, ValueError):
+        return None
+
+
+class Circuito:
+    """Estado, ventana de resultados y limite de concurrencia de un endpoint"""
+
+    def __init__(self, url, config):
+        self.url = url
+        self.config = config
+        self._lock = threading.Lock()
+        self.estado = CERRADO
+        self._resultados = deque(maxlen=config.ventana)  # (fallo, lenta)
+        self._reabrir_en = 0.0
+        self._aperturas_seguidas = 0
+        self.en_vuelo = 0
+        self.sondas_en_vuelo = 0
+        self.limite = float(config.limite_max)
+
+        # Contadores
+        self.aperturas = 0
+        self.rechazadas = 0
+        self.por_retry_after = 0
+
+    def adquirir(self):
+        """
+        Reserva un lugar para un POST o lanza CircuitoAbierto. Retorna True si
+        el POST es una sonda del circuito semiabierto: hay que pasarlo como
+        sonda a registrar() o liberar().
+        """
+        with self._lock:
+            if self.estado == ABIERTO:
+                if time.monotonic() < self._reabrir_en:
+                    self._rechazar('abierto')
+                self.estado = SEMIABIERTO
+                log.info("Circuito de %s semiabierto: se envia una sonda", self.url)
+            sonda = self.estado == SEMIABIERTO
+            if sonda:
+                if self.sondas_en_vuelo >= self.config.sondas:
+                    self._rechazar('abierto')
+                self.sondas_en_vuelo += 1
+            elif self.en_vuelo >= int(self.limite):
+                self._rechazar('concurrencia')
+            self.en_vuelo += 1
+            return sonda
+
+    def _rechazar(self, motivo):
+        self.rechazadas += 1
+        RECHAZOS.inc(self.url, motivo)
+        if motivo == 'abierto':
+            raise CircuitoAbierto(f"Circuito abierto para {self.url}")
+        raise CircuitoAbierto(f"Limite de {int(self.limite)} POST simultaneos alcanzado para {self.url}")
+
+    def liberar(self, sonda=False):
+        """Devuelve el lugar de un POST adquirido que no llego a enviarse"""
+        with self._lock:
+            self.en_vuelo -= 1
+            if sonda:
+                self.sondas_en_vuelo -= 1
+
+    def registrar(self, duracion, timeout, status_code=None, retry_after=None, sonda=False):
+        """
+        Resultado de un POST adquirido: status_code None si termino en excepcion;
+        sonda es lo que retorno adquirir()
+        """
+        fallo = status_code is None or fallo_backend(status_code)
+        # Lenta: mas de una fraccion del timeout de la peticion (30 s lecturas, 60 s prediccion)
+        lenta = duracion >= self.config.lenta * timeout
+        espera = segundos_retry_after(retry_after) if status_code in (429, 503) else None
+        with self._lock:
+            self.en_vuelo -= 1
+            if sonda:
+                self.sondas_en_vuelo -= 1
+            if fallo or lenta:
+                self.limite = max(self.limite * self.config.factor_reduccion, 1.0)
+            else:
+                self.limite = min(self.limite + 1.0 / self.limite, float(self.config.limite_max))
+
+            if self.estado == SEMIABIERTO and not sonda:
+                return  # respuesta tardia de antes de abrirse: solo decide la sonda
+            if espera is not None:
+                self.por_retry_after += 1
+                self._abrir(f"Retry-After {espera:.0f}s (HTTP {status_code})", espera)
+                return
+            if self.estado == SEMIABIERTO:
+                if fallo or lenta:
+                    self._abrir("fallo la sonda")
+                else:
+                    self.estado = CERRADO
+                    self._aperturas_seguidas = 0
+                    self._resultados.clear()
+                    log.info("Circuito de %s cerrado: el endpoint respondio", self.url)
+                return
+            if self.estado != CERRADO:
+                return
+            self._resultados.append((fallo, lenta))
+            n = len(self._resultados)
+            if n < self.config.min_peticiones:
+                return
+            fallos = sum(1 for f, _ in self._resultados if f)
+            lentas = sum(1 for _, l in self._resultados if l)
+            if fallos / n >= self.config.tasa_errores:
+                self._abrir(f"{fallos}/{n} errores")
+            elif lentas / n >= self.config.tasa_lentas:
+                self._abrir(f"{lentas}/{n} respuestas lentas")
+
+    def _abrir(self, motivo, espera=None):
+        self._aperturas_seguidas += 1
+        if espera is None:
+            espera = self.config.espera * 2 ** (self._aperturas_seguidas - 1)
+        espera = min(espera, self.config.espera_max)
+        self.estado = ABIERTO
+        self._reabrir_en = time.monotonic() + espera
+        self._resultados.clear()
+        self.aperturas += 1
+        log.warning("Circuito de %s abierto por %.0fs: %s", self.url, espera, motivo)
+
+    def estadisticas(self):
+        with self._lock:
+            return {
+                'estado': self.estado,
+                'en_vuelo': self.en_vuelo,
+                'sondas_en_vuelo': self.sondas_en_vuelo,
+                'limite': round(self.limite, 2),
+                'aperturas': self.aperturas,
+                'rechazadas': self.rechazadas,
+                'por_retry_after': self.por_retry_after,
+                'reabre_en': max(self._reabrir_en - time.monotonic(), 0.0) if self.estado == ABIERTO else 0.0,
+            }
+
+
+class Circuitos:
+    """Un Circuito por URL, creado con la primera peticion, con la misma configuracion"""
+
+    def __init__(self, limite_max, ventana=20, min_peticiones=10, tasa_errores=0.5, tasa_lentas=0.5,
+                 lenta=0.5, espera=15.0, espera_max=300.0, sondas=1, factor_reduccion=0.5):
+        self.limite_max = int(limite_max)
+        self.ventana = int(ventana)
+        self.min_peticiones = int(min_peticiones)
+        self.tasa_errores = float(tasa_errores)
+        self.tasa_lentas = float(tasa_lentas)
+        self.lenta = float(lenta)
+        self.espera = float(espera)
+        self.espera_max = float(espera_max)
+        self.sondas = int(sondas)
+        self.factor_reduccion = float(factor_reduccion)
+        self._lock = threading.Lock()
+        self._circuitos = {}
+
+    def de(self, url):
+        circuito = self._circuitos.get(url)
+        if circuito is None:
+            with self._lock:
+                circuito = self._circuitos.get(url)
+                if circuito is None:
+                    circuito = self._circuitos[url] = Circuito(url, self)
+                    ESTADO.registrar(lambda: CODIGO_ESTADO[circuito.estado], url)
+                    LIMITE.registrar(lambda: circuito.limite, url)
+        return circuito
+
+    def estadisticas(self):
+        with self._lock:
+            circuitos = list(self._circuitos.values())
+        return {c.url: c.estadisticas() for c in circuitos}
@@ -0,0 +1,195 @@
+"""
+Codec tipado de los payloads: NOTIFY de entrada y cuerpos de los POST.
+
+Cada tipo de payload de entrada tiene un esquema con sus campos, los tipos
+aceptados y cuales son obligatorios:
+
+    lectura   tiempo_sensor (texto, obligatorio), valor (numero o texto), id_sensor
+    bitacora  id (numero o texto, obligatorio), bitacora (texto, obligatorio)
+
+El motor decodifica cada notificacion con el esquema de su canal (el que
+declaran sus consumidores en `esquema`) directamente a un registro compacto:
+una tupla con nombre (Lectura, Bitacora) con acceso por atributo y get()
+como un dict. Un payload que no es un objeto JSON, al que le falta un campo
+obligatorio o trae un tipo inesperado se rechaza con PayloadInvalido antes
+de llegar a los consumidores; los campos que el esquema no declara se
+descartan.
+
+Los cuerpos de salida (trama unificada a prediccion, POST por sensor, lotes)
+los arma el propio listener a partir de registros ya validados; se
+serializan con codificar() a bytes con el mismo backend JSON.
+
+Backend: orjson si esta instalado (opcional), si no el json de la libreria
+estandar; CODEC_JSON=json fuerza el estandar. Los dos envian el mismo JSON:
+los registros como objetos y NaN/inf como null en vez del literal NaN (que
+no es JSON valido).
+"""
+
+import json
+import math
+import os
+from collections import namedtuple
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+BACKEND = 'orjson' if orjson is not None and os.environ.get('CODEC_JSON', 'auto') != 'json' else 'json'
+
+
+class PayloadInvalido(ValueError):
+    """Payload que no es JSON valido o no cumple el esquema de su canal"""
+
+
+class Registro(tuple):
+    """Base de los registros decodificados: tupla con nombre que tambien responde get() como un dict"""
+
+    __slots__ = ()
+    _fields = ()
+    _indices = {}
+
+    def get(self, campo, defecto=None):
+        indice = self._indices.get(campo)
+        return defecto if indice is None else self[indice]
+
+    def como_dict(self):
+        return dict(zip(self._fields, self))
+
+
+def _registro(nombre, campos):
+    """Clase de registro con los campos en orden (namedtuple + Registro)"""
+    base = namedtuple(nombre, campos)
+    return type(nombre, (base, Registro), {'__slots__': (), '_indices': {c: i for i, c in enumerate(base._fields)}})
+
+
+Lectura = _registro('Lectura', ('tiempo_sensor', 'valor', 'id_sensor'))
+Bitacora = _registro('Bitacora', ('id', 'bitacora'))
+
+
+def _por_defecto(obj):
+    """Tipos que orjson no serializa solo: escalares de NumPy, subclases de float y registros"""
+    if isinstance(obj, Registro):
+        return obj.como_dict()
+    if hasattr(obj, 'item'):
+        return obj.item()
+    if isinstance(obj, float):
+        return float(obj)
+    raise TypeError(f"Tipo no serializable a JSON: {type(obj).__name__}")
+
+
+if BACKEND == 'orjson':
+    _cargar = orjson.loads
+
+    def codificar(datos):
+        """Serializa un cuerpo a bytes JSON (UTF-8)"""
+        return orjson.dumps(datos, default=_por_defecto)
+else:
+    _cargar = json.loads
+    _codificador = json.JSONEncoder(separators=(',', ':'), default=_por_defecto)
+
+    def _como_orjson(obj):
+        """
+        Lo que orjson enviaria: el json estandar nunca llama a default con una
+        tupla (los registros saldrian como listas) y escribe NaN/inf literales
+        """
+        if isinstance(obj, Registro):
+            return {c: _como_orjson(v) for c, v in zip(obj._fields, obj)}
+        if isinstance(obj, dict):
+            return {c: _como_orjson(v) for c, v in obj.items()}
+        if isinstance(obj, (list, tuple)):
+            return [_como_orjson(v) for v in obj]
+        if isinstance(obj, float):
+            return obj if math.isfinite(obj) else None
+        if hasattr(obj, 'item') and not isinstance(obj, (str, int)):
+            return _como_orjson(obj.item())
+        return obj
+
+    def codificar(datos):
+        """Serializa un cuerpo a bytes JSON (UTF-8)"""
+        return _codificador.encode(_como_orjson(datos)).encode()
+
+
+def decodificar(texto):
+    """JSON generico (canales sin esquema); PayloadInvalido si no es JSON valido"""
+    try:
+        return _cargar(texto)
+    except ValueError as e:
+        raise PayloadInvalido(f"JSON invalido: {e}") from e
+
+
+class Esquema:
+    """
+    Campos, tipos aceptados y obligatoriedad de un tipo de payload.
+
+    Al crearlo se compila un decodificador propio del esquema, sin bucles ni
+    busquedas por campo: un get() y una comparacion de tipo exacto por campo
+    (los tipos que produce el parser JSON, sin subclases como bool).
+    """
+
+    def __init__(self, nombre, registro, campos):
+        # campos: (campo, tipos, requerido) en el orden del registro
+        if tuple(c for c, _, _ in campos) != registro._fields:
+            raise ValueError(f"Los campos del esquema '{nombre}' no coinciden con {registro.__name__}")
+        self.nombre = nombre
+        self.registro = registro
+        self.campos = registro._fields
+        self.tipos = {campo: tipos if isinstance(tipos, tuple) else (tipos,) for campo, tipos, _ in campos}
+        self.requeridos = tuple(campo for campo, _, requerido in campos if requerido)
+        self.desde_dict = self._compilar()
+
+    def _compilar(self):
+        """Funcion desde_dict(datos) -> registro con una linea por campo"""
+        lineas = ["def desde_dict(datos):",
+                  "    if type(datos) is not dict:",
+                  "        _rechazar(datos, None)",
+                  "    get = datos.get"]
+        entorno = {'_nuevo': tuple.__new__, '_registro': self.registro, '_rechazar': self._rechazar}
+        for i, campo in enumerate(self.campos):
+            tipos = self.tipos[campo]
+            if len(tipos) == 1:
+                entorno[f"_tipos{i}"] = tipos[0]
+                chequeo = f"type(v{i}) is not _tipos{i}"
+            else:
+                entorno[f"_tipos{i}"] = frozenset(tipos)
+                chequeo = f"type(v{i}) not in _tipos{i}"
+            lineas.append(f"    v{i} = get({campo!r})")
+            if campo in self.requeridos:
+                lineas.append(f"    if {chequeo}:")
+            else:
+                lineas.append(f"    if v{i} is not None and {chequeo}:")
+            lineas.append(f"        _rechazar(datos, {campo!r})")
+        valores = ', '.join(f"v{i}" for i in range(len(self.campos)))
+        lineas.append(f"    return _nuevo(_registro, ({valores},))")
+        exec('\n'.join(lineas), entorno)
+        return entorno['desde_dict']
+
+    def _rechazar(self, datos, campo):
+        if campo is None:
+            raise PayloadInvalido(f"{self.nombre}: se esperaba un objeto JSON, llego {type(datos).__name__}")
+        valor = datos.get(campo)
+        if valor is None:
+            raise PayloadInvalido(f"{self.nombre}: falta '{campo}'")
+        raise PayloadInvalido(f"{self.nombre}: '{campo}' de tipo {type(valor).__name__}")
+
+    def decodificar(self, texto):
+        """Texto JSON -> registro; PayloadInvalido si no cumple el esquema"""
+        # Un payload que no empieza como objeto se rechaza sin parsearlo
+        if texto[:1] != '{' and not texto.lstrip().startswith('{'):
+            raise PayloadInvalido(f"{self.nombre}: se esperaba un objeto JSON")
+        try:
+            datos = _cargar(texto)
+        except ValueError as e:
+            raise PayloadInvalido(f"{self.nombre}: JSON invalido: {e}") from e
+        return self.desde_dict(datos)
+
+
+LECTURA = Esquema('lectura', Lectura, (
+    ('tiempo_sensor', str, True),
+    ('valor', (int, float, str), False),
+    ('id_sensor', (int, str), False),
+))
+BITACORA = Esquema('bitacora', Bitacora, (
+    ('id', (int, str), True),
+    ('bitacora', str, True),
+))
@@ -0,0 +1,119 @@
+"""
+Compuerta de cambios para la prediccion unificada.
+
+En regimen estable las tramas consecutivas de una bomba son casi iguales y
+cada una dispara una llamada completa al modelo. La compuerta compara cada
+trama completa con la ultima enviada, campo a campo, en desviaciones
+estandar: la escala de cada campo es una desviacion estimada con EWMA
+(media y varianza exponenciales de sus valores). Si ningun campo se movio
+mas de `umbral` desviaciones la trama se omite, salvo que hayan pasado
+`latido` segundos (de tiempo_sensor) desde el ultimo envio.
+
+    z(campo) = |valor - valor_enviado| / max(desv_ewma, desv_min * |media_ewma|)
+
+Las primeras `calentamiento` tramas siempre se envian, mientras la EWMA se
+estabiliza.
+"""
+
+import math
+import threading
+
+# Escala minima absoluta, para campos constantes en cero
+ESCALA_MINIMA = 1e-9
+
+
+class CompuertaCambios:
+    """Decide si una trama completa se envia a la prediccion o se omite por no haber cambiado"""
+
+    def __init__(self, campos, umbral=3.0, alfa=0.1, latido=60.0, calentamiento=10, desv_min=0.001,
+                 umbrales=None):
+        self.campos = list(campos)
+        self.alfa = float(alfa)
+        self.latido = float(latido)
+        self.calentamiento = int(calentamiento)
+        self.desv_min = float(desv_min)
+        # Umbral por campo (z); los campos sin umbral propio usan el general
+        umbrales = umbrales or {}
+        self.umbrales = [float(umbrales.get(campo, umbral)) for campo in self.campos]
+
+        self._lock = threading.Lock()
+        ancho = len(self.campos)
+        self._media = [0.0] * ancho
+        self._varianza = [0.0] * ancho
+        self._enviado = None          # valores de la ultima trama enviada
+        self._tiempo_enviado = None   # su tiempo (segundos)
+        self.observadas = 0
+
+        # Contadores por motivo de la decision
+        self.enviadas_calentamiento = 0
+        self.enviadas_cambio = 0
+        self.enviadas_latido = 0
+        self.omitidas = 0
+        self.ultima_distancia = 0.0
+
+    def evaluar(self, tiempo, valores):
+        """
+        Retorna (enviar, motivo, distancia) para una trama completa y actualiza
+        la EWMA con sus valores. `valores` tiene los campos en el orden de `campos`.
+        motivo: 'calentamiento', 'cambio', 'latido' u 'omitida'.
+        """
+        with self._lock:
+            distancia = self._distancia(valores)
+            self._actualizar(valores)
+            self.ultima_distancia = distancia
+
+            if self._enviado is None or self.observadas <= self.calentamiento:
+                motivo = 'calentamiento'
+                self.enviadas_calentamiento += 1
+            elif distancia >= 1.0:
+                motivo = 'cambio'
+                self.enviadas_cambio += 1
+            elif self.latido and tiempo - self._tiempo_enviado >= self.latido:
+                motivo = 'latido'
+                self.enviadas_latido += 1
+            else:
+                self.omitidas += 1
+                return False, 'omitida', distancia
+
+            self._enviado = [valores[i] for i in range(len(self.campos))]
+            self._tiempo_enviado = tiempo
+            return True, motivo, distancia
+
+    def _distancia(self, valores):
+        """Mayor z / umbral entre los campos (>= 1 significa que algun campo supero su umbral)"""
+        if self._enviado is None:
+            return math.inf
+        maxima = 0.0
+        for i in range(len(self.campos)):
+            escala = max(math.sqrt(self._varianza[i]), self.desv_min * abs(self._media[i]), ESCALA_MINIMA)
+            z = abs(valores[i] - self._enviado[i]) / escala / self.umbrales[i]
+            if z > maxima:
+                maxima = z
+        return maxima
+
+    def _actualizar(self, valores):
+        """Media y varianza exponenciales de cada campo"""
+        self.observadas += 1
+        alfa = self.alfa
+        if self.observadas == 1:
+            for i in range(len(self.campos)):
+                self._media[i] = valores[i]
+            return
+        for i in range(len(self.campos)):
+            diferencia = valores[i] - self._media[i]
+            self._media[i] += alfa * diferencia
+            self._varianza[i] = (1 - alfa) * (self._varianza[i] + alfa * diferencia * diferencia)
+
+    def estadisticas(self):
+        with self._lock:
+            enviadas = self.enviadas_calentamiento + self.enviadas_cambio + self.enviadas_latido
+            return {
+                'observadas': self.observadas,
+                'enviadas': enviadas,
+                'enviadas_por_cambio': self.enviadas_cambio,
+                'enviadas_por_latido': self.enviadas_latido,
+                'enviadas_calentamiento': self.enviadas_calentamiento,
+                'omitidas': self.omitidas,
+                'fraccion_omitida': self.omitidas / self.observadas if self.observadas else 0.0,
+                'ultima_distancia': self.ultima_distancia,
+            }
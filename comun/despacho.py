@@ -0,0 +1,273 @@
+"""
+Etapa de despacho de peticiones al backend.
+
+Las llamadas HTTP se ejecutan en un pool de hilos trabajadores para que el
+loop de LISTEN siga drenando notificaciones aunque el backend este lento.
+Cada clave (normalmente la URL del endpoint) se asigna siempre al mismo
+trabajador, por lo que los envios a un mismo endpoint conservan su orden.
+En modo asyncio (MODO_EJECUCION=async) se usa DespachadorAsync, con la misma
+interfaz pero con tareas del event loop en lugar de hilos.
+
+Cada tarea tiene una prioridad: la prediccion unificada es PRIORIDAD_ALTA y
+los lotes de lecturas individuales PRIORIDAD_BAJA. Cada trabajador toma
+primero las de prioridad alta y cada prioridad tiene su propio cupo en la
+cola: max_pendientes para la alta y max_pendientes_baja para la baja, de
+modo que los lotes nunca ocupan lugares de la prediccion. Con
+DESPACHO_TASA_MAX, un presupuesto global de peticiones por segundo (token
+bucket) del que la prioridad baja no puede usar los tokens de reserva.
+"""
+
+import itertools
+import os
+import queue
+import threading
+import time
+
+from comun import logs
+from comun.metricas import REGISTRO
+
+log = logs.obtener('despacho')
+
+PRIORIDAD_ALTA, PRIORIDAD_BAJA = 0, 1
+NOMBRES_PRIORIDAD = ('alta', 'baja')
+# Espera maxima de un trabajador antes de volver a mirar su cola cuando falta presupuesto
+ESPERA_MAXIMA_TOKEN = 0.05
+
+RECHAZOS = REGISTRO.contador(
+    'listener_despacho_rechazos_total', 'Tareas rechazadas por cola llena, por prioridad', ['despachador', 'prioridad'])
+
+
+def modo_asincrono():
+    """True si el listener corre en modo asyncio (MODO_EJECUCION=async)"""
+    return os.environ.get('MODO_EJECUCION', 'hilos').lower() == 'async'
+
+
+def crear_despachador(nombre, num_trabajadores=None, max_pendientes=None):
+    """Despachador de POST al backend (hilos o tareas asyncio segun MODO_EJECUCION)"""
+    tasa_max = float(os.environ.get('DESPACHO_TASA_MAX', 0))
+    if modo_asincrono():
+        from comun.asincrono import DespachadorAsync
+        return DespachadorAsync(nombre, num_trabajadores, max_pendientes, tasa_max=tasa_max)
+    return Despachador(nombre, num_trabajadores, max_pendientes, tasa_max=tasa_max)
+
+
+class CuboTokens:
+    """Presupuesto de `tasa` tareas por segundo con rafagas de hasta `rafaga`"""
+
+    def __init__(self, tasa, rafaga=None, reserva=0.0):
+        self.tasa = float(tasa)
+        self.rafaga = max(float(rafaga or self.tasa), 1.0)
+        # Tokens que solo puede usar la prioridad alta
+        self.reserva = min(float(reserva), self.rafaga - 1.0)
+        self._tokens = self.rafaga
+        self._ultimo = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _recargar(self):
+        ahora = time.monotonic()
+        self._tokens = min(self._tokens + (ahora - self._ultimo) * self.tasa, self.rafaga)
+        self._ultimo = ahora
+
+    def tomar(self, prioridad):
+        """Toma un token; retorna 0 si lo obtuvo o los segundos que faltan para que haya uno"""
+        piso = 0.0 if prioridad == PRIORIDAD_ALTA else self.reserva
+        with self._lock:
+            self._recargar()
+            if self._tokens - 1.0 >= piso:
+                self._tokens -= 1.0
+                return 0.0
+            return (piso + 1.0 - self._tokens) / self.tasa
+
+    def escaso(self):
+        """True si la prioridad baja no tiene tokens disponibles"""
+        with self._lock:
+            self._recargar()
+            return self._tokens - 1.0 < self.reserva
+
+    def disponibles(self):
+        with self._lock:
+            self._recargar()
+            return self._tokens
+
+
+class Despachador:
+    """Pool de trabajadores con cola acotada, orden por clave y dos prioridades"""
+
+    asincrono = False
+
+    def __init__(self, nombre, num_trabajadores=None, max_pendientes=None, tasa_max=0):
+        self.nombre = nombre
+        self.num_trabajadores = num_trabajadores or int(os.environ.get('DESPACHO_TRABAJADORES', 4))
+        self.max_pendientes = max_pendientes or int(os.environ.get('DESPACHO_MAX_PENDIENTES', 200))
+        # Cupos separados: max_pendientes para la prioridad alta y max_pendientes_baja para la baja
+        # (la cola completa queda acotada por la suma)
+        self.max_pendientes_baja = int(os.environ.get('DESPACHO_MAX_PENDIENTES_BAJA',
+                                                      max(self.max_pendientes * 3 // 4, 1)))
+        # Presupuesto global de tareas por segundo (0 = sin limite); la prioridad baja no
+        # puede usar los ultimos DESPACHO_RESERVA_ALTA tokens de la rafaga
+        self.cubo = None
+        if tasa_max > 0:
+            rafaga = float(os.environ.get('DESPACHO_RAFAGA', max(tasa_max, 1.0)))
+            self.cubo = CuboTokens(tasa_max, rafaga, float(os.environ.get('DESPACHO_RESERVA_ALTA', rafaga / 4)))
+
+        # Una cola de prioridad por trabajador; la secuencia conserva el orden dentro de cada prioridad
+        self._colas = [queue.PriorityQueue() for _ in range(self.num_trabajadores)]
+        self._secuencia = itertools.count()
+        self._hilos = []
+        self._lock = threading.Lock()
+
+        # Contadores
+        self.encolados = 0
+        self.completados = 0
+        self.errores = 0
+        self.rechazados = 0
+        self.pendientes = 0
+        self.pendientes_prioridad = [0, 0]
+        self.rechazados_prioridad = [0, 0]
+        self.max_pendientes_observado = 0
+        self._latencias = {}
+
+    def iniciar(self):
+        """Arranca los hilos trabajadores (idempotente)"""
+        if self._hilos:
+            return
+        for i, cola in enumerate(self._colas):
+            hilo = threading.Thread(target=self._trabajar, args=(cola,), name=f"{self.nombre}-{i}")
+            hilo.daemon = True
+            hilo.start()
+            self._hilos.append(hilo)
+        log.info("Despachador '%s' iniciado: %d trabajadores, max %d pendientes (%d de prioridad baja)%s",
+                 self.nombre, self.num_trabajadores, self.max_pendientes, self.max_pendientes_baja,
+                 f", {self.cubo.tasa:g} peticiones/s" if self.cubo is not None else '')
+
+    def enviar(self, clave, funcion, *args, prioridad=PRIORIDAD_ALTA):
+        """
+        Encola funcion(*args) en el trabajador asignado a la clave.
+        No bloquea: retorna False si la cola (o el cupo de su prioridad) esta llena.
+        """
+        if not self._admitir(prioridad):
+            return False
+        cola = self._colas[hash(clave) % self.num_trabajadores]
+        cola.put((prioridad, next(self._secuencia), clave, funcion, args, time.monotonic()))
+        return True
+
+    def _admitir(self, prioridad):
+        """Reserva un lugar en la cola para una tarea de la prioridad dada"""
+        with self._lock:
+            cupo = self.max_pendientes if prioridad == PRIORIDAD_ALTA else self.max_pendientes_baja
+            if self.pendientes_prioridad[prioridad] >= cupo:
+                self.rechazados += 1
+                self.rechazados_prioridad[prioridad] += 1
+                RECHAZOS.inc(self.nombre, NOMBRES_PRIORIDAD[prioridad])
+                return False
+            self.encolados += 1
+            self.pendientes += 1
+            self.pendientes_prioridad[prioridad] += 1
+            if self.pendientes > self.max_pendientes_observado:
+                self.max_pendientes_observado = self.pendientes
+            return True
+
+    def _liberar(self, prioridad):
+        """Devuelve el lugar reservado por _admitir de una tarea que no se pudo encolar"""
+        with self._lock:
+            self.encolados -= 1
+            self.pendientes -= 1
+            self.pendientes_prioridad[prioridad] -= 1
+            self.rechazados += 1
+            self.rechazados_prioridad[prioridad] += 1
+        RECHAZOS.inc(self.nombre, NOMBRES_PRIORIDAD[prioridad])
+
+    def _esperar_presupuesto(self, prioridad):
+        """0 si hay presupuesto para ejecutar una tarea de la prioridad, o cuanto esperar"""
+        if self.cubo is None:
+            return 0.0
+        espera = self.cubo.tomar(prioridad)
+        return min(espera, ESPERA_MAXIMA_TOKEN) if espera else 0.0
+
+    def _trabajar(self, cola):
+        while True:
+            item = cola.get()
+            espera = self._esperar_presupuesto(item[0])
+            if espera:
+                # Vuelve a su lugar en la cola: una tarea de prioridad alta que llegue
+                # mientras tanto se ejecuta antes
+                cola.put(item)
+                time.sleep(espera)
+                continue
+            prioridad, _, clave, funcion, args, encolado_en = item
+            inicio = time.monotonic()
+            error = False
+            try:
+                funcion(*args)
+            except Exception as e:
+                error = True
+                log.error("Error en despachador '%s' (%s): %s", self.nombre, clave, e)
+            self._terminar(prioridad, clave, error, inicio - encolado_en, time.monotonic() - inicio)
+
+    def _terminar(self, prioridad, clave, error, espera, duracion):
+        with self._lock:
+            self.pendientes -= 1
+            self.pendientes_prioridad[prioridad] -= 1
+            if error:
+                self.errores += 1
+            else:
+                self.completados += 1
+            self._registrar_latencia(clave, espera, duracion)
+
+    def restringido(self):
+        """True si la prioridad baja esta sin presupuesto o tiene su cupo de cola a mas de la mitad"""
+        with self._lock:
+            if self.pendientes_prioridad[PRIORIDAD_BAJA] * 2 >= self.max_pendientes_baja:
+                return True
+        return self.cubo is not None and self.cubo.escaso()
+
+    def _registrar_latencia(self, clave, espera, duracion):
+        lat = self._latencias.get(clave)
+        if lat is None:
+            lat = self._latencias[clave] = {
+                'n': 0, 'espera_total': 0.0, 'espera_max': 0.0,
+                'duracion_total': 0.0, 'duracion_max': 0.0,
+            }
+        lat['n'] += 1
+        lat['espera_total'] += espera
+        lat['duracion_total'] += duracion
+        if espera > lat['espera_max']:
+            lat['espera_max'] = espera
+        if duracion > lat['duracion_max']:
+            lat['duracion_max'] = duracion
+
+    def profundidad(self):
+        """Numero de tareas encoladas o en ejecucion"""
+        with self._lock:
+            return self.pendientes
+
+    def estadisticas(self):
+        """Snapshot de contadores y latencias (en segundos) por clave"""
+        with self._lock:
+            latencias = {}
+            for clave, lat in self._latencias.items():
+                n = lat['n']
+                latencias[clave] = {
+                    'n': n,
+                    'espera_media': lat['espera_total'] / n,
+                    'espera_max': lat['espera_max'],
+                    'duracion_media': lat['duracion_total'] / n,
+                    'duracion_max': lat['duracion_max'],
+                }
+            return {
+                'trabajadores': self.num_trabajadores,
+                'max_pendientes': self.max_pendientes,
+                'pendientes': self.pendientes,
+                'max_pendientes_observado': self.max_pendientes_observado,
+                'encolados': self.encolados,
+                'completados': self.completados,
+                'errores': self.errores,
+                'rechazados': self.rechazados,
+                'prioridades': {nombre: {'pendientes': self.pendientes_prioridad[i],
+                                         'rechazados': self.rechazados_prioridad[i]}
+                                for i, nombre in enumerate(NOMBRES_PRIORIDAD)},
+                'max_pendientes_baja': self.max_pendientes_baja,
+                'tasa_max': self.cubo.tasa if self.cubo is not None else 0,
+                'tokens': round(self.cubo.disponibles(), 2) if self.cubo is not None else None,
+                'latencias': latencias,
+            }
@@ -0,0 +1,184 @@
+"""
+Ejecutor con concurrencia acotada y reparto justo entre colas.
+
+Pensado para la clasificacion de bitacoras: cada llamada al LLM puede tardar
+hasta TIMEOUT_CLASIFICAR segundos, asi que se ejecutan en varios hilos fuera
+del loop de notificaciones. Cada tabla (a, b) tiene su propia cola y los
+trabajadores las atienden por turnos, de modo que una rafaga en una tabla
+no deja esperando a la otra. El total de tareas en espera esta acotado.
+
+Con tamano_lote > 1 cada trabajador junta hasta tamano_lote tareas (tambien
+por turnos entre colas), esperando como maximo `ventana` segundos a que
+lleguen mas, y llama a funcion(lista de args) una sola vez por lote.
+"""
+
+import os
+import threading
+import time
+from collections import deque
+
+from comun import logs
+from comun.metricas import REGISTRO
+
+log = logs.obtener('ejecutor')
+
+ESPERA = REGISTRO.histograma(
+    'listener_ejecutor_espera_segundos', 'Tiempo en cola antes de ejecutarse', ['ejecutor', 'cola'])
+DURACION = REGISTRO.histograma(
+    'listener_ejecutor_duracion_segundos', 'Duracion de cada tarea (clasificacion de bitacoras)',
+    ['ejecutor', 'cola'])
+
+
+class EjecutorJusto:
+    """Pool de hilos que atiende varias colas por turnos (round-robin)"""
+
+    def __init__(self, nombre, funcion, colas, concurrencia=None, max_pendientes=None,
+                 tamano_lote=1, ventana=0.0):
+        self.nombre = nombre
+        self.funcion = funcion
+        self.concurrencia = concurrencia or int(os.environ.get('CLASIFICACION_CONCURRENCIA', 4))
+        self.max_pendientes = max_pendientes or int(os.environ.get('CLASIFICACION_MAX_PENDIENTES', 100))
+        self.tamano_lote = max(int(tamano_lote), 1)
+        self.ventana = float(ventana)
+
+        self._orden = list(colas)
+        self._colas = {cola: deque() for cola in self._orden}
+        self._turno = 0
+        self._condicion = threading.Condition()
+        self._hilos = []
+
+        # Contadores
+        self.encolados = 0
+        self.completados = 0
+        self.errores = 0
+        self.rechazados = 0
+        self.en_curso = 0
+        self.lotes = 0
+        self._latencias = {cola: {'n': 0, 'espera_total': 0.0, 'espera_max': 0.0,
+                                  'duracion_total': 0.0, 'duracion_max': 0.0}
+                           for cola in self._orden}
+
+    def iniciar(self):
+        """Arranca los hilos trabajadores (idempotente)"""
+        if self._hilos:
+            return
+        for i in range(self.concurrencia):
+            hilo = threading.Thread(target=self._trabajar, name=f"{self.nombre}-{i}")
+            hilo.daemon = True
+            hilo.start()
+            self._hilos.append(hilo)
+        log.info("Ejecutor '%s' iniciado: %d en paralelo, max %d en espera, lotes de hasta %d",
+                 self.nombre, self.concurrencia, self.max_pendientes, self.tamano_lote)
+
+    def enviar(self, cola, *args):
+        """Encola funcion(*args) en la cola indicada. No bloquea: False si el backlog esta lleno"""
+        with self._condicion:
+            if self._pendientes() >= self.max_pendientes:
+                self.rechazados += 1
+                return False
+            self._colas[cola].append((args, time.monotonic()))
+            self.encolados += 1
+            self._condicion.notify()
+        return True
+
+    def _pendientes(self):
+        return sum(len(c) for c in self._colas.values())
+
+    def _siguiente(self):
+        """Toma la primera tarea de la siguiente cola no vacia, por turnos"""
+        for _ in range(len(self._orden)):
+            cola = self._orden[self._turno]
+            self._turno = (self._turno + 1) % len(self._orden)
+            if self._colas[cola]:
+                return cola, self._colas[cola].popleft()
+        return None
+
+    def _tomar_lote(self):
+        """Espera la primera tarea y junta hasta tamano_lote dentro de la ventana (con el lock tomado)"""
+        tarea = self._siguiente()
+        while tarea is None:
+            self._condicion.wait()
+            tarea = self._siguiente()
+        lote = [tarea]
+        limite = time.monotonic() + self.ventana
+        while len(lote) < self.tamano_lote:
+            tarea = self._siguiente()
+            if tarea is not None:
+                lote.append(tarea)
+                continue
+            restante = limite - time.monotonic()
+            if restante <= 0:
+                break
+            self._condicion.wait(restante)
+        return lote
+
+    def _trabajar(self):
+        while True:
+            with self._condicion:
+                lote = self._tomar_lote()
+                self.en_curso += len(lote)
+
+            inicio = time.monotonic()
+            error = False
+            try:
+                if self.tamano_lote > 1:
+                    self.funcion([args for _, (args, _) in lote])
+                else:
+                    self.funcion(*lote[0][1][0])
+            except Exception as e:
+                error = True
+                log.error("Error en ejecutor '%s' (%d tareas): %s", self.nombre, len(lote), e)
+            fin = time.monotonic()
+
+            with self._condicion:
+                self.en_curso -= len(lote)
+                if error:
+                    self.errores += len(lote)
+                else:
+                    self.completados += len(lote)
+                if self.tamano_lote > 1:
+                    self.lotes += 1
+                for cola, (_, encolado_en) in lote:
+                    ESPERA.observar(inicio - encolado_en, self.nombre, cola)
+                    DURACION.observar(fin - inicio, self.nombre, cola)
+                    lat = self._latencias[cola]
+                    lat['n'] += 1
+                    lat['espera_total'] += inicio - encolado_en
+                    lat['duracion_total'] += fin - inicio
+                    lat['espera_max'] = max(lat['espera_max'], inicio - encolado_en)
+                    lat['duracion_max'] = max(lat['duracion_max'], fin - inicio)
+
+    def profundidad(self):
+        """Tareas en espera (sin contar las que se estan ejecutando)"""
+        with self._condicion:
+            return self._pendientes()
+
+    def estadisticas(self):
+        """Profundidad por cola y latencias (en segundos) de espera y de ejecucion"""
+        with self._condicion:
+            colas = {}
+            for cola in self._orden:
+                lat = self._latencias[cola]
+                n = lat['n']
+                colas[cola] = {
+                    'en_espera': len(self._colas[cola]),
+                    'procesadas': n,
+                    'espera_media': lat['espera_total'] / n if n else 0.0,
+                    'espera_max': lat['espera_max'],
+                    'duracion_media': lat['duracion_total'] / n if n else 0.0,
+                    'duracion_max': lat['duracion_max'],
+                }
+            return {
+                'concurrencia': self.concurrencia,
+                'max_pendientes': self.max_pendientes,
+                'tamano_lote': self.tamano_lote,
+                'ventana': self.ventana,
+                'lotes': self.lotes,
+                'en_espera': self._pendientes(),
+                'en_curso': self.en_curso,
+                'encolados': self.encolados,
+                'completados': self.completados,
+                'errores': self.errores,
+                'rechazados': self.rechazados,
+                'colas': colas,
+            }
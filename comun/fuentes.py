@@ -0,0 +1,210 @@
+"""
+Fuentes de notificaciones del motor de escucha.
+
+El motor ya no lee directamente de psycopg2: pide las notificaciones a una
+fuente con esta interfaz:
+    conectar(canales)  -- abre la fuente (puede lanzar excepcion)
+    esperar(timeout)   -- True si hay notificaciones listas antes del timeout
+    leer()             -- itera (canal, payload_texto) de las notificaciones listas
+    latido()           -- comprueba la conexion; lanza ConexionPerdida si se cayo
+    cerrar()
+    finita / agotada   -- una fuente finita termina el motor al agotarse
+    cur                -- cursor para el relleno de huecos (None si no aplica)
+
+FuentePostgres es la conexion LISTEN en vivo (la fuente por defecto).
+FuenteGrabacion reproduce una captura hecha con herramientas/grabar_notificaciones.py
+y FuenteSintetica genera tramas completas; las dos respetan los tiempos entre
+notificaciones divididos por `velocidad` (0 = sin esperas) y sirven para medir
+el listener sin base de datos (ver herramientas/benchmark.py).
+
+Formato de captura (una linea JSON por notificacion, t en segundos desde el inicio):
+    {"t": 0.125, "canal": "canal_sensores_corriente", "payload": "{...}"}
+"""
+
+import json
+import random
+import select
+import time
+from datetime import datetime, timedelta
+
+import psycopg2
+
+
+class ConexionPerdida(Exception):
+    """La fuente dejo de responder al latido"""
+
+
+class FuentePostgres:
+    """Conexion LISTEN sobre PostgreSQL"""
+
+    finita = False
+    agotada = False
+
+    def __init__(self, db_config):
+        self.db_config = db_config
+        self.conn = None
+        self.cur = None
+
+    def conectar(self, canales):
+        self.conn = psycopg2.connect(**self.db_config)
+        self.conn.set_isolation_level(psycopg2.extensions.ISOLATION_LEVEL_AUTOCOMMIT)
+        self.cur = self.conn.cursor()
+        for canal in canales:
+            self.cur.execute(f"LISTEN {canal};")
+
+    def fileno(self):
+        return self.conn.fileno()
+
+    def esperar(self, timeout):
+        return select.select([self.conn], [], [], timeout) != ([], [], [])
+
+    def leer(self):
+        self.conn.poll()
+        notificaciones = self.conn.notifies
+        if not notificaciones:
+            return
+        # Todas las pendientes de una vez: pop(0) en la lista es O(n) por notificacion
+        pendientes = notificaciones[:]
+        del notificaciones[:]
+        for notify in pendientes:
+            yield notify.channel, notify.payload
+
+    def latido(self):
+        try:
+            self.cur.execute("SELECT 1")
+        except psycopg2.OperationalError as e:
+            raise ConexionPerdida(str(e)) from e
+
+    def cerrar(self):
+        cur, conn = self.cur, self.conn
+        self.cur = self.conn = None
+        if cur and not cur.closed:
+            cur.close()
+        if conn and not conn.closed:
+            conn.close()
+
+
+class FuenteProgramada:
+    """Base de las fuentes finitas: eventos (t, canal, payload) entregados a su tiempo"""
+
+    finita = True
+    cur = None
+
+    def __init__(self, velocidad=1.0):
+        self.velocidad = float(velocidad)
+        self.agotada = False
+        self.emitidas = 0
+        self._eventos = None
+        self._siguiente = None
+        self._inicio = 0.0
+
+    def eventos(self, canales):
+        """Itera (t, canal, payload_texto) en orden de t; t en segundos desde el inicio"""
+        raise NotImplementedError
+
+    def conectar(self, canales):
+        canales = set(canales)
+        self._eventos = (e for e in self.eventos(canales) if e[1] in canales)
+        self._inicio = time.monotonic()
+        self._avanzar()
+
+    def _avanzar(self):
+        self._siguiente = next(self._eventos, None)
+        if self._siguiente is None:
+            self.agotada = True
+
+    def _vence(self, evento):
+        if self.velocidad <= 0:
+            return self._inicio
+        return self._inicio + evento[0] / self.velocidad
+
+    def esperar(self, timeout):
+        if self._siguiente is None:
+            return False
+        restante = self._vence(self._siguiente) - time.monotonic()
+        if restante > timeout:
+            time.sleep(timeout)
+            return False
+        if restante > 0:
+            time.sleep(restante)
+        return True
+
+    def leer(self):
+        ahora = time.monotonic()
+        while self._siguiente is not None and self._vence(self._siguiente) <= ahora:
+            _, canal, payload = self._siguiente
+            self._avanzar()
+            self.emitidas += 1
+            yield canal, payload
+
+    def latido(self):
+        pass
+
+    def cerrar(self):
+        self._eventos = None
+
+
+class FuenteGrabacion(FuenteProgramada):
+    """Reproduce una captura JSON lines a `velocidad`x (0 = tan rapido como se pueda)"""
+
+    def __init__(self, ruta, velocidad=1.0):
+        super().__init__(velocidad)
+        self.ruta = ruta
+
+    def eventos(self, canales):
+        with open(self.ruta, encoding='utf-8') as archivo:
+            for linea in archivo:
+                if linea.strip():
+                    evento = json.loads(linea)
+                    yield evento['t'], evento['canal'], evento['payload']
+
+
+class FuenteSintetica(FuenteProgramada):
+    """
+    Genera `tramas` conjuntos completos, uno cada `periodo` segundos, con una
+    notificacion por canal. Con `desorden` > 0 esa fraccion de tramas llega con
+    los canales mezclados; con `perdida` > 0 esa fraccion de lecturas no llega.
+    Con `desfase` > 0 el tiempo_sensor de cada lectura se corre hasta +-desfase
+    segundos (sensores con relojes o formatos de tiempo distintos).
+    Con `duplicados` > 0 esa fraccion de lecturas se repite enseguida con el
+    mismo tiempo_sensor y otro valor (rafagas de triggers que reescriben la fila).
+    Los canales de bitacoras (nombre con 'bitacora') reciben {'id', 'bitacora'}.
+    """
+
+    def __init__(self, tramas=1000, periodo=1.0, velocidad=0.0, desorden=0.0, perdida=0.0,
+                 semilla=0, inicio='2025-01-01T00:00:00', desfase=0.0, duplicados=0.0):
+        super().__init__(velocidad)
+        self.tramas = int(tramas)
+        self.periodo = float(periodo)
+        self.desorden = float(desorden)
+        self.perdida = float(perdida)
+        self.desfase = float(desfase)
+        self.duplicados = float(duplicados)
+        self.semilla = semilla
+        self.inicio = datetime.fromisoformat(inicio)
+
+    def eventos(self, canales):
+        azar = random.Random(self.semilla)
+        canales = sorted(canales)
+        paso = self.periodo / max(len(canales), 1)
+        for n in range(self.tramas):
+            instante = self.inicio + timedelta(seconds=n * self.periodo)
+            tiempo_sensor = instante.isoformat()
+            orden = list(canales)
+            if azar.random() < self.desorden:
+                azar.shuffle(orden)
+            for i, canal in enumerate(orden):
+                if self.perdida and azar.random() < self.perdida:
+                    continue
+                if 'bitacora' in canal:
+                    payload = {'id': n, 'bitacora': f"Bitacora sintetica {n % 50}: revision de rutina"}
+                else:
+                    if self.desfase:
+                        tiempo_sensor = (instante + timedelta(
+                            seconds=azar.uniform(-self.desfase, self.desfase))).isoformat(timespec='milliseconds')
+                    payload = {'id_sensor': i + 1, 'valor': round(azar.uniform(0, 100), 3),
+                               'tiempo_sensor': tiempo_sensor}
+                    if self.duplicados and azar.random() < self.duplicados:
+                        yield n * self.periodo + i * paso, canal, json.dumps(payload)
+                        payload['valor'] = round(azar.uniform(0, 100), 3)
+                yield n * self.periodo + i * paso, canal, json.dumps(payload)
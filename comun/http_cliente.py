@@ -0,0 +1,240 @@
+"""
+Cliente HTTP compartido para los POST al backend.
+
+Usa una sola requests.Session con pools keep-alive, de modo que las
+conexiones TCP+TLS al backend de Code Engine se reutilizan entre lecturas
+en vez de abrir una conexion nueva por cada POST.
+
+En modo asyncio se usa post_async(): con aiohttp (opcional) si esta
+instalado, o el mismo post() en un hilo si no lo esta. En ambos casos la
+respuesta expone status_code, text y json() y los errores se reportan como
+requests.exceptions.ConnectionError / Timeout, igual que en modo hilos.
+
+Los cuerpos se serializan con comun/codec.py (orjson si esta instalado)
+en vez del json estandar que usan requests y aiohttp con json=.
+
+Los envios con logica propia (prediccion, lotes con respaldo individual) se
+escriben una sola vez como generadores de pasos: producen cada POST como
+(url, datos, timeout) y reciben la respuesta, o la excepcion, en el yield.
+ejecutar() y ejecutar_async() los recorren con post() o post_async(), de
+modo que el modo hilos y el modo asyncio solo difieren en el transporte.
+
+Cada URL tiene un circuit breaker y un limite de concurrencia adaptativo
+(comun/circuito.py): si el endpoint esta caido el POST falla de inmediato
+con CircuitoAbierto en vez de esperar el timeout.
+"""
+
+import asyncio
+import json
+import os
+import threading
+import time
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from comun.circuito import Circuitos
+from comun.codec import codificar
+from comun.metricas import REGISTRO
+
+try:
+    import aiohttp
+except ImportError:
+    aiohttp = None
+
+
+LATENCIA_BACKEND = REGISTRO.histograma(
+    'listener_backend_peticion_segundos', 'Duracion de los POST al backend por URL', ['url'])
+ERRORES_BACKEND = REGISTRO.contador(
+    'listener_backend_errores_total', 'POST al backend que terminaron en excepcion', ['url'])
+
+
+class RespuestaAsync:
+    """Respuesta de post_async con la misma forma que requests.Response"""
+
+    __slots__ = ('status_code', 'text', 'headers')
+
+    def __init__(self, status_code, text, headers=None):
+        self.status_code = status_code
+        self.text = text
+        self.headers = headers or {}
+
+    def json(self):
+        return json.loads(self.text)
+
+
+class ClienteHTTP:
+    """Session con pool de conexiones configurable y estadisticas de reutilizacion"""
+
+    def __init__(self, headers, pool_maxsize=10, pool_connections=4, timeout_conexion=5,
+                 max_concurrentes=None):
+        # Un pool por host; pool_maxsize es el maximo de conexiones abiertas por host.
+        # Las variables de entorno tienen prioridad sobre los valores del listener.
+        self.pool_maxsize = int(os.environ.get('HTTP_POOL_MAXSIZE', pool_maxsize))
+        self.pool_connections = int(os.environ.get('HTTP_POOL_CONNECTIONS', pool_connections))
+        self.timeout_conexion = float(os.environ.get('HTTP_TIMEOUT_CONEXION', timeout_conexion))
+        # Limite de POST simultaneos en modo asyncio (por defecto, el tamano del pool)
+        self.max_concurrentes = int(os.environ.get('HTTP_MAX_CONCURRENTES', max_concurrentes or self.pool_maxsize))
+        # Circuit breaker por URL; el limite adaptativo de POST simultaneos parte del tamano del pool
+        self.circuitos = None
+        if os.environ.get('CIRCUITO_HABILITADO', '1') == '1':
+            self.circuitos = Circuitos(
+                limite_max=int(os.environ.get('CIRCUITO_LIMITE_MAX', self.pool_maxsize)),
+                ventana=int(os.environ.get('CIRCUITO_VENTANA', 20)),
+                min_peticiones=int(os.environ.get('CIRCUITO_MIN_PETICIONES', 10)),
+                tasa_errores=float(os.environ.get('CIRCUITO_TASA_ERRORES', 0.5)),
+                tasa_lentas=float(os.environ.get('CIRCUITO_TASA_LENTAS', 0.5)),
+                lenta=float(os.environ.get('CIRCUITO_LENTA', 0.5)),
+                espera=float(os.environ.get('CIRCUITO_ESPERA', 15)),
+                espera_max=float(os.environ.get('CIRCUITO_ESPERA_MAX', 300)),
+            )
+
+        self._adapter = HTTPAdapter(
+            pool_connections=self.pool_connections,
+            pool_maxsize=self.pool_maxsize,
+            max_retries=0,
+        )
+        self.session = requests.Session()
+        self.session.headers.update(headers)
+        # El cuerpo se envia ya serializado (data=), sin el Content-Type que pondria json=
+        self.session.headers.setdefault('Content-Type', 'application/json')
+        self.session.mount('http://', self._adapter)
+        self.session.mount('https://', self._adapter)
+
+        self._headers = dict(headers)
+        if not any(nombre.lower() == 'content-type' for nombre in self._headers):
+            self._headers['Content-Type'] = 'application/json'
+        self._sesion_async = None
+        self._semaforo = None
+
+        self._lock = threading.Lock()
+        self.peticiones = 0
+        self.errores = 0
+        self.tiempo_total = 0.0
+
+    def post(self, url, datos, timeout):
+        """POST JSON con timeout de lectura `timeout` y timeout de conexion compartido"""
+        circuito = self.circuitos.de(url) if self.circuitos is not None else None
+        sonda = circuito.adquirir() if circuito is not None else False
+        inicio = time.monotonic()
+        res = None
+        try:
+            res = self.session.post(url, data=codificar(datos), timeout=(self.timeout_conexion, timeout))
+            return res
+        finally:
+            self._registrar(url, time.monotonic() - inicio, res, circuito, timeout, sonda)
+
+    def _registrar(self, url, duracion, res, circuito=None, timeout=None, sonda=False):
+        error = res is None
+        if circuito is not None:
+            if error:
+                circuito.registrar(duracion, timeout, sonda=sonda)
+            else:
+                circuito.registrar(duracion, timeout, res.status_code, res.headers.get('Retry-After'),
+                                   sonda=sonda)
+        LATENCIA_BACKEND.observar(duracion, url)
+        if error:
+            ERRORES_BACKEND.inc(url)
+        with self._lock:
+            self.peticiones += 1
+            self.tiempo_total += duracion
+            if error:
+                self.errores += 1
+
+    async def post_async(self, url, datos, timeout):
+        """Version corrutina de post(); como maximo max_concurrentes a la vez"""
+        if self._semaforo is None:
+            self._semaforo = asyncio.Semaphore(self.max_concurrentes)
+        if aiohttp is None:
+            async with self._semaforo:
+                return await asyncio.to_thread(self.post, url, datos, timeout)
+
+        # El circuito se consulta antes de esperar el semaforo: un endpoint caido falla sin hacer cola
+        circuito = self.circuitos.de(url) if self.circuitos is not None else None
+        sonda = circuito.adquirir() if circuito is not None else False
+        inicio = None
+        respuesta = None
+        try:
+            async with self._semaforo:
+                if self._sesion_async is None:
+                    self._sesion_async = aiohttp.ClientSession(
+                        headers=self._headers,
+                        connector=aiohttp.TCPConnector(limit=self.pool_maxsize),
+                    )
+                inicio = time.monotonic()
+                try:
+                    async with self._sesion_async.post(
+                        url, data=codificar(datos),
+                        timeout=aiohttp.ClientTimeout(total=timeout, sock_connect=self.timeout_conexion),
+                    ) as res:
+                        respuesta = RespuestaAsync(res.status, await res.text(), res.headers)
+                        return respuesta
+                except asyncio.TimeoutError as e:
+                    raise requests.exceptions.Timeout(f"Timeout en POST a {url}") from e
+                except aiohttp.ClientError as e:
+                    raise requests.exceptions.ConnectionError(str(e)) from e
+        finally:
+            if inicio is not None:
+                self._registrar(url, time.monotonic() - inicio, respuesta, circuito, timeout, sonda)
+            elif circuito is not None:
+                # Cancelado mientras esperaba el semaforo: no hubo POST
+                circuito.liberar(sonda)
+
+    def ejecutar(self, pasos):
+        """Recorre un generador de pasos haciendo cada POST con post(); retorna su resultado"""
+        try:
+            peticion = next(pasos)
+            while True:
+                try:
+                    res = self.post(*peticion)
+                except Exception as e:
+                    peticion = pasos.throw(e)
+                else:
+                    peticion = pasos.send(res)
+        except StopIteration as fin:
+            return fin.value
+
+    async def ejecutar_async(self, pasos):
+        """Igual que ejecutar(), con post_async()"""
+        try:
+            peticion = next(pasos)
+            while True:
+                try:
+                    res = await self.post_async(*peticion)
+                except Exception as e:
+                    peticion = pasos.throw(e)
+                else:
+                    peticion = pasos.send(res)
+        except StopIteration as fin:
+            return fin.value
+
+    def estadisticas(self):
+        """Conexiones abiertas vs peticiones servidas por cada pool (por host)"""
+        pools = {}
+        manager = self._adapter.poolmanager
+        for clave in list(manager.pools.keys()):
+            pool = manager.pools.get(clave)
+            if pool is None:
+                continue
+            nuevas = pool.num_connections
+            servidas = pool.num_requests
+            pools[f"{pool.scheme}://{pool.host}:{pool.port}"] = {
+                'conexiones_nuevas': nuevas,
+                'peticiones': servidas,
+                'reutilizadas': max(servidas - nuevas, 0),
+                'tasa_reutilizacion': (servidas - nuevas) / servidas if servidas else 0.0,
+            }
+
+        with self._lock:
+            return {
+                'pool_maxsize': self.pool_maxsize,
+                'pool_connections': self.pool_connections,
+                'timeout_conexion': self.timeout_conexion,
+                'max_concurrentes': self.max_concurrentes,
+                'cliente_async': 'aiohttp' if aiohttp is not None else 'hilos',
+                'circuitos': self.circuitos.estadisticas() if self.circuitos is not None else None,
+                'peticiones': self.peticiones,
+                'errores': self.errores,
+                'tiempo_medio': self.tiempo_total / self.peticiones if self.peticiones else 0.0,
+                'pools': pools,
+            }
@@ -0,0 +1,148 @@
+"""
+Logging de los listeners: niveles, muestreo por categoria y escritura en segundo plano.
+
+Cada notificacion generaba varias lineas en stdout (payload, campo guardado,
+estado de la trama, campos faltantes) y el print y el formateo de todas ellas
+ocupaban una parte visible del CPU y del volumen de logs de Code Engine.
+
+- Los mensajes pasan por el modulo logging con nivel (LOG_NIVEL).
+- Los mensajes por notificacion pueden muestrearse por categoria: con
+  LOG_MUESTREO='{"notificacion": 100}' se escribe 1 de cada 100. Por
+  defecto se escriben todos.
+- Un QueueListener escribe en stdout desde su propio hilo. La cola es
+  acotada (LOG_COLA_MAX) y, si se llena, el mensaje se descarta y se cuenta
+  en lugar de bloquear al llamador. El texto del mensaje se arma antes de
+  encolarlo (como QueueHandler.prepare), asi un payload o una trama que
+  cambian despues de loguear no alteran la linea escrita; el formato final
+  (fecha, nivel, JSON) y la escritura quedan en ese hilo.
+- LOG_FORMATO=json emite una linea JSON por mensaje; los campos pasados con
+  extra={'campos': {...}} se agregan a la linea.
+
+Cada listener llama a configurar() despues de load_dotenv(), asi las
+variables LOG_* del .env se respetan aunque los modulos de comun ya hayan
+creado sus loggers al importarse.
+"""
+
+import atexit
+import itertools
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import sys
+import threading
+
+from comun.metricas import REGISTRO
+
+# Tasa de muestreo por defecto (1 de cada n) de las categorias por notificacion: sin muestreo
+MUESTREO_POR_DEFECTO = {}
+
+FORMATO_TEXTO = '%(asctime)s %(levelname)s [%(name)s] %(message)s'
+
+DESCARTADOS = REGISTRO.contador(
+    'listener_logs_descartados_total', 'Mensajes de log descartados por cola llena')
+
+_lock = threading.Lock()
+_escritor = None
+_tasas = {}
+_contadores = {}
+
+
+class _ManejadorCola(logging.handlers.QueueHandler):
+    """QueueHandler que nunca bloquea: con la cola llena descarta el mensaje"""
+
+    def prepare(self, record):
+        # El texto se resuelve aqui: los argumentos (dicts de payload, tramas)
+        # pueden cambiar antes de que el hilo escritor llegue al mensaje
+        record.msg = record.getMessage()
+        record.args = None
+        # La traza de una excepcion tambien, mientras el traceback sigue vigente
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            DESCARTADOS.inc()
+
+
+class _FormatoTexto(logging.Formatter):
+    def format(self, record):
+        texto = super().format(record)
+        campos = getattr(record, 'campos', None)
+        if campos:
+            texto += ' ' + ' '.join(f"{k}={v}" for k, v in campos.items())
+        return texto
+
+
+class _FormatoJSON(logging.Formatter):
+    def format(self, record):
+        datos = {
+            'fecha': self.formatTime(record),
+            'nivel': record.levelname,
+            'logger': record.name,
+            'mensaje': record.getMessage(),
+        }
+        datos.update(getattr(record, 'campos', None) or {})
+        if record.exc_text:
+            datos['traza'] = record.exc_text
+        return json.dumps(datos, ensure_ascii=False, default=str)
+
+
+def configurar():
+    """Configura el logger 'listener' con escritura en segundo plano (idempotente)"""
+    global _escritor, _tasas
+    with _lock:
+        if _escritor is not None:
+            return
+        _tasas = dict(MUESTREO_POR_DEFECTO)
+        _tasas.update(json.loads(os.environ.get('LOG_MUESTREO', '{}') or '{}'))
+
+        salida = logging.StreamHandler(sys.stdout)
+        if os.environ.get('LOG_FORMATO', 'texto') == 'json':
+            salida.setFormatter(_FormatoJSON())
+        else:
+            salida.setFormatter(_FormatoTexto(FORMATO_TEXTO))
+
+        cola = queue.Queue(int(os.environ.get('LOG_COLA_MAX', 10000)))
+        raiz = logging.getLogger('listener')
+        raiz.setLevel(os.environ.get('LOG_NIVEL', 'INFO').upper())
+        raiz.addHandler(_ManejadorCola(cola))
+        raiz.propagate = False
+
+        _escritor = logging.handlers.QueueListener(cola, salida)
+        _escritor.start()
+        atexit.register(_detener)
+
+
+def _detener():
+    """Vacia la cola antes de terminar el proceso"""
+    try:
+        _escritor.stop()
+    except queue.Full:
+        pass
+
+
+def obtener(nombre):
+    """Logger hijo de 'listener'; escribe una vez llamado configurar()"""
+    return logging.getLogger(f"listener.{nombre}")
+
+
+def muestrear(categoria):
+    """
+    True si el mensaje de esta categoria debe escribirse (1 de cada n, segun LOG_MUESTREO).
+    Con n = 0 la categoria se silencia; las categorias sin tasa no se muestrean.
+    """
+    tasa = _tasas.get(categoria, 1)
+    if tasa == 1:
+        return True
+    if tasa <= 0:
+        return False
+    contador = _contadores.get(categoria)
+    if contador is None:
+        contador = _contadores.setdefault(categoria, itertools.count())
+    return next(contador) % tasa == 0
@@ -0,0 +1,332 @@
+"""
+Agrupacion de lecturas individuales en envios por lote.
+
+Las lecturas de cada endpoint individual (por ejemplo /sensores/prediccion_corriente)
+se acumulan y se envian juntas a la variante por lote del endpoint
+("<endpoint>/lote") cuando se alcanza el tamano maximo o la latencia maxima.
+Si el backend no expone la variante por lote (404/405/501) el endpoint se marca
+como no soportado y sus lecturas se envian una a una como antes.
+
+Con outbox, cada lote se registra en disco antes de despacharlo y las
+lecturas que no se pudieron entregar quedan ahi para reintentarse. Sin
+outbox, un lote que no entra a la cola de despacho llena vuelve a la espera
+de su endpoint y se reintenta en el siguiente vaciado; solo se descartan las
+lecturas mas antiguas que superan LOTES_MAX_EN_ESPERA por endpoint.
+
+Los lotes se despachan con prioridad baja: mientras el despachador esta
+restringido (sin presupuesto de peticiones o con la cola de prioridad baja
+cargada) la latencia maxima se multiplica por LOTES_FACTOR_RESTRINGIDO, de
+modo que las lecturas se juntan en menos POST en vez de demorar la
+prediccion unificada.
+"""
+
+import asyncio
+import hashlib
+import json
+import os
+import threading
+import time
+
+from comun import logs
+from comun.despacho import PRIORIDAD_BAJA
+from comun.outbox import reintentable
+
+log = logs.obtener('lotes')
+
+# Codigos con los que el backend indica que la ruta por lote no existe
+CODIGOS_SIN_LOTE = (404, 405, 501)
+
+
+class AgrupadorLecturas:
+    """Acumula lecturas por endpoint y las envia por lote a traves del despachador"""
+
+    def __init__(self, nombre, despachador, cliente, timeout, tamano_max=10, latencia_max=5.0,
+                 outbox=None, max_en_espera=1000):
+        self.nombre = nombre
+        self.despachador = despachador
+        self.cliente = cliente
+        self.timeout = timeout
+        self.outbox = outbox
+        if outbox is not None:
+            outbox.registrar('lote', self._entregar)
+        self.habilitado = os.environ.get('LOTES_HABILITADO', '1') == '1'
+        self.tamano_max = int(os.environ.get('LOTES_TAMANO_MAX', tamano_max))
+        self.latencia_max = float(os.environ.get('LOTES_LATENCIA_MAX', latencia_max))
+        self.sufijo_lote = os.environ.get('LOTES_SUFIJO', '/lote')
+        # Con el despachador restringido los lotes esperan hasta latencia_max * este factor
+        self.factor_restringido = float(os.environ.get('LOTES_FACTOR_RESTRINGIDO', 4))
+        # Cada cuanto se vuelve a probar la ruta por lote de un endpoint sin soporte
+        self.reintento_lote = float(os.environ.get('LOTES_REINTENTO_SOPORTE', 600))
+        # Lecturas en espera por endpoint mientras la cola de despacho sigue llena (sin outbox)
+        self.max_en_espera = int(os.environ.get('LOTES_MAX_EN_ESPERA', max_en_espera))
+
+        self._lock = threading.Lock()
+        self._pendientes = {}   # endpoint -> (instante primera lectura, [lecturas], [tiempos])
+        self._sin_lote = {}     # endpoint -> instante en que se detecto que no hay ruta por lote
+        self._reencolados = set()  # endpoints con lecturas que no entraron a la cola llena
+        self._hilo = None
+
+        # Contadores
+        self.lecturas = 0
+        self.lotes_enviados = 0
+        self.envios_individuales = 0
+        self.errores = 0
+        self.reencoladas = 0
+        self.descartadas = 0
+
+    def iniciar(self):
+        """
+        Arranca el hilo (o la tarea asyncio) que vacia los lotes que superan la
+        latencia maxima. Tambien corre sin agrupacion: reintenta los envios que no
+        entraron a la cola llena.
+        """
+        if self._hilo:
+            return
+        if self.despachador.asincrono:
+            self._hilo = asyncio.get_running_loop().create_task(self._vaciar_periodicamente_async())
+        else:
+            self._hilo = threading.Thread(target=self._vaciar_periodicamente, name=f"{self.nombre}-lotes")
+            self._hilo.daemon = True
+            self._hilo.start()
+        log.info("Agrupador '%s' iniciado: lotes de hasta %d lecturas o %ss",
+                 self.nombre, self.tamano_max, self.latencia_max)
+
+    def agregar(self, endpoint, lectura, tiempo_sensor=None):
+        """Agrega una lectura al lote del endpoint; lo despacha si esta lleno"""
+        with self._lock:
+            self.lecturas += 1
+            if self.habilitado and self.tamano_max > 1 or endpoint in self._reencolados:
+                pendiente = self._pendientes.get(endpoint)
+                if pendiente is None:
+                    pendiente = self._pendientes[endpoint] = (time.monotonic(), [], [])
+                _, lecturas, tiempos = pendiente
+                lecturas.append(lectura)
+                tiempos.append(tiempo_sensor)
+                if endpoint in self._reencolados:
+                    # La cola estaba llena: espera al siguiente vaciado, sin pasar de max_en_espera
+                    if len(lecturas) > self.max_en_espera:
+                        del lecturas[0], tiempos[0]
+                        self.descartadas += 1
+                    return True
+                if len(lecturas) < self.tamano_max:
+                    return True
+                del self._pendientes[endpoint]
+            else:
+                lecturas, tiempos = [lectura], [tiempo_sensor]
+        return self._despachar(endpoint, lecturas, tiempos)
+
+    def vaciar(self, forzar=False):
+        """Despacha los lotes cuya primera lectura supero la latencia maxima (o todos si forzar)"""
+        ahora = time.monotonic()
+        latencia = self.latencia_max
+        if not forzar and self.despachador.restringido():
+            latencia *= self.factor_restringido
+        listos = []
+        with self._lock:
+            for endpoint, (inicio, lecturas, tiempos) in list(self._pendientes.items()):
+                if forzar or ahora - inicio >= latencia:
+                    listos.append((endpoint, lecturas, tiempos))
+                    del self._pendientes[endpoint]
+        for endpoint, lecturas, tiempos in listos:
+            self._despachar(endpoint, lecturas, tiempos)
+
+    def _vaciar_periodicamente(self):
+        while True:
+            time.sleep(max(self.latencia_max / 4, 0.05))
+            try:
+                self.vaciar()
+            except Exception as e:
+                log.error("Error vaciando lotes de '%s': %s", self.nombre, e)
+
+    async def _vaciar_periodicamente_async(self):
+        while True:
+            await asyncio.sleep(max(self.latencia_max / 4, 0.05))
+            try:
+                self.vaciar()
+            except Exception as e:
+                log.error("Error vaciando lotes de '%s': %s", self.nombre, e)
+
+    def _despachar(self, endpoint, lecturas, tiempos):
+        """Despacha en lotes de hasta tamano_max; lo que no entra a la cola vuelve a la espera"""
+        paso = max(self.tamano_max, 1)
+        for i in range(0, len(lecturas), paso):
+            if not self._despachar_lote(endpoint, lecturas[i:i + paso], tiempos[i:i + paso]):
+                self._reencolar(endpoint, lecturas[i:], tiempos[i:])
+                return False
+        if endpoint in self._reencolados:
+            with self._lock:
+                self._reencolados.discard(endpoint)
+        return True
+
+    def _reencolar(self, endpoint, lecturas, tiempos):
+        """Devuelve lecturas no despachadas al inicio de la espera del endpoint (acotada)"""
+        with self._lock:
+            self.reencoladas += len(lecturas)
+            self._reencolados.add(endpoint)
+            pendiente = self._pendientes.get(endpoint)
+            if pendiente is not None:
+                lecturas = lecturas + pendiente[1]
+                tiempos = tiempos + pendiente[2]
+            sobrantes = len(lecturas) - self.max_en_espera
+            if sobrantes > 0:
+                self.descartadas += sobrantes
+                lecturas, tiempos = lecturas[sobrantes:], tiempos[sobrantes:]
+            # Vencida: el siguiente vaciado la vuelve a intentar
+            self._pendientes[endpoint] = (time.monotonic() - self.latencia_max, lecturas, tiempos)
+        if sobrantes > 0:
+            log.warning("Cola de despacho llena, se descartan las %d lecturas mas antiguas para %s "
+                        "(LOTES_MAX_EN_ESPERA=%d)", sobrantes, endpoint, self.max_en_espera)
+        else:
+            log.warning("Cola de despacho llena, %d lecturas para %s quedan en espera de reintento",
+                        len(lecturas), endpoint)
+
+    def _despachar_lote(self, endpoint, lecturas, tiempos):
+        id_fila = None
+        if self.outbox is not None:
+            id_fila = self.outbox.guardar('lote', self._clave_lote(endpoint, lecturas, tiempos),
+                                          {'endpoint': endpoint, 'lecturas': lecturas})
+            if id_fila is None:
+                log.info("Lote de %d lecturas para %s ya registrado en el outbox, se omite", len(lecturas), endpoint)
+                return True
+
+        enviar = self._enviar_async if self.despachador.asincrono else self._enviar
+        if self.despachador.enviar(endpoint, enviar, endpoint, lecturas, id_fila, prioridad=PRIORIDAD_BAJA):
+            return True
+        if id_fila is not None:
+            # Queda en disco; el hilo de drenado del outbox lo enviara
+            self.outbox.liberar(id_fila)
+            log.warning("Cola de despacho llena, %d lecturas para %s quedan en el outbox", len(lecturas), endpoint)
+            return True
+        return False
+
+    @staticmethod
+    def _clave_lote(endpoint, lecturas, tiempos):
+        """Clave de deduplicacion: mismo endpoint, mismas lecturas y mismos tiempos"""
+        contenido = json.dumps([endpoint, lecturas, tiempos], sort_keys=True, default=str)
+        return f"lote|{endpoint}|{hashlib.sha1(contenido.encode()).hexdigest()}"
+
+    def _soporta_lote(self, endpoint):
+        with self._lock:
+            detectado = self._sin_lote.get(endpoint)
+            if detectado is None:
+                return True
+            if time.monotonic() - detectado >= self.reintento_lote:
+                del self._sin_lote[endpoint]
+                return True
+            return False
+
+    def _enviar(self, endpoint, lecturas, id_fila=None):
+        """Se ejecuta en el despachador: POST por lote con respaldo a POST individuales"""
+        fallidas, error = self.cliente.ejecutar(self._pasos_lecturas(endpoint, lecturas))
+        self._cerrar_outbox(id_fila, endpoint, fallidas, error)
+
+    async def _enviar_async(self, endpoint, lecturas, id_fila=None):
+        """Igual que _enviar, para el despachador asyncio"""
+        fallidas, error = await self.cliente.ejecutar_async(self._pasos_lecturas(endpoint, lecturas))
+        self._cerrar_outbox(id_fila, endpoint, fallidas, error)
+
+    def _pasos_lecturas(self, endpoint, lecturas):
+        """
+        Envio de las lecturas como generador de pasos (ver ClienteHTTP.ejecutar);
+        retorna (lecturas a reintentar, ultimo error)
+        """
+        url_lote = self._url_lote(endpoint, lecturas)
+        if url_lote:
+            try:
+                res = yield url_lote, {'lecturas': lecturas}, self.timeout
+            except Exception as e:
+                self._error_lote(url_lote, e)
+                return list(lecturas), e
+            if self._resultado_lote(endpoint, url_lote, len(lecturas), res):
+                return (list(lecturas) if reintentable(res.status_code) else []), f"HTTP {res.status_code}"
+
+        fallidas, error = [], None
+        for lectura in lecturas:
+            try:
+                res = yield endpoint, lectura, self.timeout
+            except Exception as e:
+                self._error_individual(e)
+                fallidas.append(lectura)
+                error = e
+                continue
+            self._resultado_individual(endpoint, res)
+            if reintentable(res.status_code):
+                fallidas.append(lectura)
+                error = f"HTTP {res.status_code}"
+        return fallidas, error
+
+    def _cerrar_outbox(self, id_fila, endpoint, fallidas, error):
+        if id_fila is None:
+            return
+        if fallidas:
+            self.outbox.reprogramar(id_fila, error, {'endpoint': endpoint, 'lecturas': fallidas})
+        else:
+            self.outbox.confirmar(id_fila)
+
+    def _entregar(self, datos):
+        """Entregador del outbox: reenvia un lote pendiente (hilo de drenado)"""
+        endpoint, lecturas = datos['endpoint'], datos['lecturas']
+        fallidas, error = self.cliente.ejecutar(self._pasos_lecturas(endpoint, lecturas))
+        if len(fallidas) == len(lecturas):
+            raise RuntimeError(f"Reenvio a {endpoint} fallido: {error}")
+        if fallidas:
+            return {'endpoint': endpoint, 'lecturas': fallidas}
+        return None
+
+    def _url_lote(self, endpoint, lecturas):
+        """URL por lote, o None si se debe enviar lectura por lectura"""
+        if len(lecturas) > 1 and self._soporta_lote(endpoint):
+            return f"{endpoint}{self.sufijo_lote}"
+        return None
+
+    def _resultado_lote(self, endpoint, url_lote, n, res):
+        """Registra la respuesta del lote; False si hay que reenviar individualmente"""
+        if res.status_code in CODIGOS_SIN_LOTE:
+            log.info("Endpoint %s sin ruta por lote (%s), enviando individualmente", endpoint, res.status_code)
+            with self._lock:
+                self._sin_lote[endpoint] = time.monotonic()
+            return False
+        with self._lock:
+            self.lotes_enviados += 1
+            if res.status_code >= 400:
+                self.errores += 1
+        if res.status_code >= 400:
+            log.warning("Lote de %d lecturas a %s rechazado: %s", n, url_lote, res.status_code)
+        elif logs.muestrear('lectura'):
+            log.info("Enviado lote de %d lecturas a %s: %s", n, url_lote, res.status_code)
+        return True
+
+    def _error_lote(self, url_lote, e):
+        with self._lock:
+            self.errores += 1
+        log.error("Error al enviar lote a %s: %s", url_lote, e)
+
+    def _resultado_individual(self, endpoint, res):
+        if res.status_code >= 400:
+            log.warning("Endpoint individual %s rechazo la lectura: %s", endpoint, res.status_code)
+        elif logs.muestrear('lectura'):
+            log.info("Enviado a endpoint individual %s: %s", endpoint, res.status_code)
+        with self._lock:
+            self.envios_individuales += 1
+
+    def _error_individual(self, e):
+        with self._lock:
+            self.errores += 1
+        log.error("Error al enviar a endpoint individual: %s", e)
+
+    def estadisticas(self):
+        with self._lock:
+            return {
+                'habilitado': self.habilitado,
+                'tamano_max': self.tamano_max,
+                'latencia_max': self.latencia_max,
+                'factor_restringido': self.factor_restringido,
+                'lecturas': self.lecturas,
+                'lotes_enviados': self.lotes_enviados,
+                'envios_individuales': self.envios_individuales,
+                'errores': self.errores,
+                'reencoladas': self.reencoladas,
+                'descartadas': self.descartadas,
+                'lecturas_en_espera': sum(len(l) for _, l, _ in self._pendientes.values()),
+                'endpoints_sin_lote': sorted(self._sin_lote),
+            }
@@ -0,0 +1,187 @@
+"""
+Metricas en formato de texto de Prometheus para el endpoint /metrics.
+
+Implementacion minima (contadores, histogramas y medidores calculados al
+momento de la consulta) para no agregar dependencias a las imagenes. Todas
+las metricas viven en REGISTRO; pedir dos veces la misma metrica por nombre
+retorna la misma instancia, asi Bomba A y Bomba B en el listener unificado
+comparten series y se distinguen por etiquetas.
+"""
+
+import logging
+import threading
+
+# Buckets por defecto (segundos), pensados para POST al backend y llamadas al LLM
+BUCKETS_PETICION = (0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120)
+# Buckets para operaciones en memoria (decodificacion de JSON)
+BUCKETS_RAPIDOS = (0.00001, 0.00005, 0.0001, 0.00025, 0.0005, 0.001, 0.005, 0.01)
+# Buckets para el tiempo entre el primer y el ultimo campo de una trama
+BUCKETS_TRAMA = (0.001, 0.01, 0.05, 0.1, 0.5, 1, 2, 5, 10, 30, 60, 120, 300)
+
+TIPO_CONTENIDO = 'text/plain; version=0.0.4; charset=utf-8'
+
+
+def _escapar(valor):
+    return str(valor).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _etiquetas(nombres, valores, extra=''):
+    partes = [f'{n}="{_escapar(v)}"' for n, v in zip(nombres, valores)]
+    if extra:
+        partes.append(extra)
+    return '{' + ','.join(partes) + '}' if partes else ''
+
+
+def _numero(valor):
+    if valor == float('inf'):
+        return '+Inf'
+    return repr(float(valor)) if isinstance(valor, float) else str(valor)
+
+
+class Contador:
+    tipo = 'counter'
+
+    def __init__(self, nombre, ayuda, etiquetas=()):
+        self.nombre = nombre
+        self.ayuda = ayuda
+        self.etiquetas = tuple(etiquetas)
+        self._lock = threading.Lock()
+        self._valores = {}
+
+    def inc(self, *valores, cantidad=1):
+        with self._lock:
+            self._valores[valores] = self._valores.get(valores, 0) + cantidad
+
+    def exponer(self):
+        with self._lock:
+            return [f"{self.nombre}{_etiquetas(self.etiquetas, v)} {_numero(n)}"
+                    for v, n in self._valores.items()]
+
+
+class Histograma:
+    tipo = 'histogram'
+
+    def __init__(self, nombre, ayuda, etiquetas=(), buckets=BUCKETS_PETICION):
+        self.nombre = nombre
+        self.ayuda = ayuda
+        self.etiquetas = tuple(etiquetas)
+        self.buckets = tuple(sorted(buckets))
+        self._lock = threading.Lock()
+        self._series = {}   # valores de etiquetas -> [conteos por bucket..., suma, total]
+
+    def observar(self, valor, *valores):
+        with self._lock:
+            serie = self._series.get(valores)
+            if serie is None:
+                serie = self._series[valores] = [0] * len(self.buckets) + [0.0, 0]
+            for i, limite in enumerate(self.buckets):
+                if valor <= limite:
+                    serie[i] += 1
+                    break
+            serie[-2] += valor
+            serie[-1] += 1
+
+    def resumen(self, *valores):
+        """
+        Conteo, media y percentiles estimados (interpolando dentro de cada bucket)
+        de la serie indicada, o de todas las series juntas si no se indican etiquetas.
+        """
+        with self._lock:
+            series = [self._series[valores]] if valores in self._series else (
+                [] if valores else list(self._series.values()))
+            total = [sum(col) for col in zip(*series)] if series else [0] * (len(self.buckets) + 2)
+        n = total[-1]
+        resultado = {'n': n, 'media': total[-2] / n if n else 0.0}
+        for nombre, q in (('p50', 0.5), ('p95', 0.95), ('p99', 0.99)):
+            resultado[nombre] = self._percentil(total, q) if n else 0.0
+        return resultado
+
+    def _percentil(self, total, q):
+        objetivo = q * total[-1]
+        acumulado = 0
+        inferior = 0.0
+        for i, limite in enumerate(self.buckets):
+            if total[i] and acumulado + total[i] >= objetivo:
+                return inferior + (limite - inferior) * (objetivo - acumulado) / total[i]
+            acumulado += total[i]
+            inferior = limite
+        # Por encima del ultimo bucket
+        return float('inf')
+
+    def exponer(self):
+        lineas = []
+        with self._lock:
+            for valores, serie in self._series.items():
+                acumulado = 0
+                for i, limite in enumerate(self.buckets):
+                    acumulado += serie[i]
+                    le = _etiquetas(self.etiquetas, valores, f'le="{_numero(float(limite))}"')
+                    lineas.append(f"{self.nombre}_bucket{le} {acumulado}")
+                le = _etiquetas(self.etiquetas, valores, 'le="+Inf"')
+                lineas.append(f"{self.nombre}_bucket{le} {serie[-1]}")
+                lineas.append(f"{self.nombre}_sum{_etiquetas(self.etiquetas, valores)} {_numero(serie[-2])}")
+                lineas.append(f"{self.nombre}_count{_etiquetas(self.etiquetas, valores)} {serie[-1]}")
+        return lineas
+
+
+class Medidor:
+    """Valor que se calcula al exponer (por ejemplo, el numero de tramas pendientes)"""
+    tipo = 'gauge'
+
+    def __init__(self, nombre, ayuda, etiquetas=()):
+        self.nombre = nombre
+        self.ayuda = ayuda
+        self.etiquetas = tuple(etiquetas)
+        self._lock = threading.Lock()
+        self._funciones = {}
+
+    def registrar(self, funcion, *valores):
+        with self._lock:
+            self._funciones[valores] = funcion
+
+    def exponer(self):
+        with self._lock:
+            funciones = list(self._funciones.items())
+        lineas = []
+        for valores, funcion in funciones:
+            try:
+                lineas.append(f"{self.nombre}{_etiquetas(self.etiquetas, valores)} {_numero(funcion())}")
+            except Exception as e:
+                logging.getLogger('listener.metricas').error("Error calculando metrica %s: %s", self.nombre, e)
+        return lineas
+
+
+class RegistroMetricas:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._metricas = {}
+
+    def _obtener(self, clase, nombre, *args, **kwargs):
+        with self._lock:
+            metrica = self._metricas.get(nombre)
+            if metrica is None:
+                metrica = self._metricas[nombre] = clase(nombre, *args, **kwargs)
+            return metrica
+
+    def contador(self, nombre, ayuda, etiquetas=()):
+        return self._obtener(Contador, nombre, ayuda, etiquetas)
+
+    def histograma(self, nombre, ayuda, etiquetas=(), buckets=BUCKETS_PETICION):
+        return self._obtener(Histograma, nombre, ayuda, etiquetas, buckets)
+
+    def medidor(self, nombre, ayuda, etiquetas=()):
+        return self._obtener(Medidor, nombre, ayuda, etiquetas)
+
+    def exponer(self):
+        """Texto en formato de exposicion de Prometheus"""
+        with self._lock:
+            metricas = list(self._metricas.values())
+        lineas = []
+        for metrica in metricas:
+            lineas.append(f"# HELP {metrica.nombre} {metrica.ayuda}")
+            lineas.append(f"# TYPE {metrica.nombre} {metrica.tipo}")
+            lineas.extend(metrica.exponer())
+        return '\n'.join(lineas) + '\n'
+
+
+REGISTRO = RegistroMetricas()
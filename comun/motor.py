@@ -0,0 +1,463 @@
+"""
+Motor de escucha PostgreSQL compartido.
+
+Un solo motor mantiene una conexion con LISTEN sobre la union de los canales
+de todos sus consumidores (perfiles de bomba, bitacoras). Cada notificacion
+se decodifica una sola vez (comun/codec.py) y el payload se entrega a todos los consumidores
+suscritos a ese canal, de modo que los canales compartidos entre Bomba A y
+Bomba B (canal_voltaje_barra, canal_mw_brutos_gas, ...) no se escuchan ni se
+decodifican dos veces.
+
+Un consumidor es cualquier objeto con:
+    nombre            -- texto para los logs
+    canales           -- canales que le interesan
+    iniciar()         -- arranca sus hilos (se llama una vez)
+    procesar(canal, payload)
+    esquema           -- opcional: esquema de comun/codec.py con que se decodifican sus
+                         canales (payload = registro tipado); sin esquema, un dict
+    tablas_relleno    -- opcional: {canal: tabla} a rellenar tras una reconexion
+    canal_to_campo    -- opcional: sus lecturas se guardan en el cache de ultimos valores
+    intervalo_revision, revisar()
+                      -- opcional: revisar() se llama desde el hilo del motor al menos
+                         cada intervalo_revision segundos (plazos de las tramas)
+    clave_trama(tiempo_sensor)
+                      -- opcional: trama a la que pertenece una lectura (cubeta de
+                         TRAMA_RESOLUCION); agrupa el coalescido de las rafagas
+    coalescida(canal, payload)
+                      -- opcional: aviso de una lectura suya descartada al coalescer
+
+Las notificaciones llegan de una fuente (comun/fuentes.py): por defecto la
+conexion LISTEN en vivo, o una captura / generador sintetico para pruebas de
+rendimiento. Con una fuente finita ejecutar() retorna al agotarla.
+
+Las notificaciones pendientes se leen de a lotes de hasta DRENAJE_LOTE_MAX.
+Un lote de DRENAJE_RAFAGA_MIN o mas (rafaga tras una reconexion o un burst
+de triggers) se coalesce: de cada (canal, trama) repetido solo se entrega la
+ultima lectura, y las lecturas se entregan agrupadas por trama en el orden en
+que llego cada una, de modo que cada trama se completa antes de abrir la
+siguiente. La trama es la que calcula clave_trama() de los consumidores del
+canal (la cubeta de TRAMA_RESOLUCION), o el texto de tiempo_sensor si no la
+declaran.
+
+Con REPLICAS_MODO varias replicas del mismo listener se reparten los
+consumidores con advisory locks (comun/replicas.py): cada replica escucha
+todos los canales pero solo entrega a los consumidores que le tocan, y al
+tomar uno le reentrega las notificaciones de los ultimos REPLICAS_REPETIR
+segundos para cubrir el traspaso.
+"""
+
+import os
+import time
+from collections import deque
+from itertools import islice
+
+from comun import logs
+from comun.codec import PayloadInvalido, Registro, decodificar
+from comun.fuentes import ConexionPerdida, FuentePostgres
+from comun.metricas import BUCKETS_RAPIDOS, REGISTRO
+from comun.relleno import RellenoHuecos, relleno_habilitado
+from comun.replicas import CoordinadorReplicas
+from comun.ultimos import UltimosValores, ultimos_habilitado
+
+NOTIFICACIONES = REGISTRO.contador(
+    'listener_notificaciones_total', 'Notificaciones recibidas por canal', ['canal'])
+DECODIFICACION = REGISTRO.histograma(
+    'listener_decodificacion_segundos', 'Tiempo de decodificacion del payload', buckets=BUCKETS_RAPIDOS)
+RECHAZADOS = REGISTRO.contador(
+    'listener_payloads_rechazados_total', 'Notificaciones con payload invalido por canal', ['canal'])
+COALESCIDAS = REGISTRO.contador(
+    'listener_notificaciones_coalescidas_total', 'Lecturas reemplazadas por otra del mismo tiempo en una rafaga',
+    ['canal'])
+
+log = logs.obtener('motor')
+
+
+class MotorListener:
+    """Conexion LISTEN unica que reparte cada notificacion a sus consumidores"""
+
+    def __init__(self, nombre, db_config, consumidores, intervalo_heartbeat=10,
+                 max_intentos_inicial=10, max_reconexiones=50, tiempo_espera_base=5, fuente=None):
+        self.nombre = nombre
+        self.db_config = db_config
+        self.fuente = fuente or FuentePostgres(db_config)
+        self.consumidores = list(consumidores)
+        self.intervalo_heartbeat = intervalo_heartbeat
+        self.max_intentos_inicial = max_intentos_inicial
+        self.max_reconexiones = max_reconexiones
+        self.tiempo_espera_base = tiempo_espera_base
+
+        # canal -> consumidores suscritos (en orden de registro)
+        self.rutas = {}
+        for consumidor in self.consumidores:
+            for canal in consumidor.canales:
+                self.rutas.setdefault(canal, []).append(consumidor)
+
+        # canal -> esquema de decodificacion; los consumidores de un canal deben coincidir
+        self.esquemas = {}
+        for consumidor in self.consumidores:
+            esquema = getattr(consumidor, 'esquema', None)
+            if esquema is None:
+                continue
+            for canal in consumidor.canales:
+                if self.esquemas.setdefault(canal, esquema) is not esquema:
+                    raise ValueError(f"Esquemas distintos para el canal '{canal}': "
+                                     f"{self.esquemas[canal].nombre} y {esquema.nombre}")
+
+        # Drenado en rafagas: los canales con tiempo_sensor en su esquema se coalescen
+        self.coalescer = os.environ.get('DRENAJE_COALESCER', '1') == '1'
+        self.rafaga_min = int(os.environ.get('DRENAJE_RAFAGA_MIN', 2))
+        self.lote_max = int(os.environ.get('DRENAJE_LOTE_MAX', 1000))
+        self._coalescibles = {canal for canal, esquema in self.esquemas.items() if 'tiempo_sensor' in esquema.campos}
+        # canal -> clave_trama de sus consumidores, y consumidores avisados de las lecturas coalescidas
+        self._claves_trama = {}
+        self._avisar_coalescidas = {}
+        for canal in self._coalescibles:
+            consumidores = self.rutas.get(canal, ())
+            self._claves_trama[canal] = [c.clave_trama for c in consumidores if hasattr(c, 'clave_trama')]
+            self._avisar_coalescidas[canal] = [c for c in consumidores if hasattr(c, 'coalescida')]
+
+        # Relleno de huecos tras reconectar, para los canales que tienen tabla de origen
+        tablas = {}
+        for consumidor in self.consumidores:
+            tablas.update(getattr(consumidor, 'tablas_relleno', None) or {})
+        self.relleno = RellenoHuecos(tablas) if tablas and relleno_habilitado() else None
+
+        # Ultimo valor de cada canal de las bombas (GET /ultimos)
+        bombas = {c.nombre: c.canal_to_campo for c in self.consumidores if getattr(c, 'canal_to_campo', None)}
+        self.ultimos = UltimosValores(bombas) if bombas and ultimos_habilitado() else None
+
+        # Consumidores con tareas periodicas (revisar) y el intervalo mas corto entre ellos
+        self.revisiones = [c for c in self.consumidores if getattr(c, 'intervalo_revision', None)]
+        self.intervalo_revision = min((c.intervalo_revision for c in self.revisiones), default=None)
+        self._ultima_revision = 0.0
+
+        # Reparto de consumidores entre replicas (solo con la conexion LISTEN real)
+        self.replicas = None
+        modo_replicas = os.environ.get('REPLICAS_MODO', '')
+        if modo_replicas and isinstance(self.fuente, FuentePostgres):
+            self.replicas = CoordinadorReplicas(
+                os.environ.get('REPLICAS_GRUPO', nombre), [c.nombre for c in self.consumidores], modo_replicas,
+                intervalo=float(os.environ.get('REPLICAS_INTERVALO', 1)),
+                max_replicas=int(os.environ.get('REPLICAS_MAX', 16)))
+            self.repeticion = float(os.environ.get('REPLICAS_REPETIR', 5))
+            self._recientes = deque()   # (instante, canal, payload_texto) de los ultimos REPLICAS_REPETIR s
+
+        # Contadores
+        self.notificaciones = {}
+        self.errores_decodificacion = 0
+        self.errores_consumidor = 0
+        self.rafagas = 0
+        self.max_rafaga = 0
+        self.coalescidas = 0
+
+    def conectar(self):
+        """Abre la fuente (conexion LISTEN a la base de datos) sobre los canales de escucha"""
+        try:
+            log.info("Conectando a la base de datos...")
+            self.fuente.conectar(list(self.rutas))
+            for canal in self.rutas:
+                suscritos = ', '.join(c.nombre for c in self.rutas[canal])
+                log.info("Escuchando canal '%s' (%s)", canal, suscritos)
+            if self.replicas is not None:
+                # Los locks de una conexion anterior se liberaron con ella; lo recibido
+                # antes de reconectar ya se entrego (o lo cubre el relleno)
+                self.replicas.reiniciar()
+                self._recientes.clear()
+                self.coordinar()
+
+            log.info("Conexión establecida. %s iniciado y esperando notificaciones...", self.nombre)
+            return True
+        except Exception as e:
+            log.error("Error de conexión: %s", e)
+            time.sleep(5)
+            return False
+
+    def tiempo_espera(self, intentos):
+        """Backoff exponencial con límite máximo de 60 segundos"""
+        return min(self.tiempo_espera_base * (2 ** min(intentos - 1, 4)), 60)
+
+    def limite_alcanzado(self, intentos_conexion, reconexiones_consecutivas):
+        return (intentos_conexion >= self.max_intentos_inicial
+                and reconexiones_consecutivas >= self.max_reconexiones)
+
+    def cerrar(self):
+        """Cierre de conexión"""
+        try:
+            self.fuente.cerrar()
+            log.info("Conexión cerrada. Reconectando...")
+        except Exception as e:
+            log.error("Error al cerrar conexión: %s", e)
+
+    def drenar(self):
+        """Lee y reparte todas las notificaciones pendientes de la fuente"""
+        if not self.coalescer:
+            for canal, payload_texto in self.fuente.leer():
+                self.despachar(canal, payload_texto)
+            return
+        pendientes = self.fuente.leer()
+        while True:
+            lote = list(islice(pendientes, self.lote_max))
+            if len(lote) >= self.rafaga_min:
+                self.despachar_rafaga(lote)
+            else:
+                for canal, payload_texto in lote:
+                    self.despachar(canal, payload_texto)
+            if len(lote) < self.lote_max:
+                return
+
+    def despachar_rafaga(self, lote):
+        """Decodifica un lote de notificaciones, coalesce las lecturas repetidas y lo entrega de una pasada"""
+        self.rafagas += 1
+        self.max_rafaga = max(self.max_rafaga, len(lote))
+        coalescibles = self._coalescibles
+        claves_trama = self._claves_trama
+        # Entregas en orden: (canal, payload) sueltos o (None, {canal: lectura}) de una trama
+        entregas = []
+        grupos = {}
+        for canal, payload_texto in lote:
+            payload = self.recibir(canal, payload_texto)
+            if payload is None:
+                continue
+            if canal not in coalescibles:
+                entregas.append((canal, payload))
+                continue
+            funciones = claves_trama[canal]
+            if not funciones:
+                clave = payload.tiempo_sensor
+            elif len(funciones) == 1:
+                clave = funciones[0](payload.tiempo_sensor)
+            else:
+                clave = tuple(f(payload.tiempo_sensor) for f in funciones)
+            grupo = grupos.get(clave)
+            if grupo is None:
+                grupo = grupos[clave] = {}
+                entregas.append((None, grupo))
+            elif canal in grupo:
+                self._coalescida(canal, grupo[canal])
+            grupo[canal] = payload
+
+        for canal, payload in entregas:
+            if canal is not None:
+                self.entregar(canal, payload)
+                continue
+            for canal_grupo, lectura in payload.items():
+                self.entregar(canal_grupo, lectura)
+
+    def _coalescida(self, canal, payload):
+        """Cuenta una lectura reemplazada al coalescer y avisa a los consumidores del canal"""
+        self.coalescidas += 1
+        COALESCIDAS.inc(canal)
+        replicas = self.replicas
+        for consumidor in self._avisar_coalescidas[canal]:
+            if replicas is not None and consumidor.nombre not in replicas.propios:
+                continue
+            consumidor.coalescida(canal, payload)
+
+    def rellenar(self):
+        """Recupera las filas insertadas mientras no habia LISTEN y las entrega en orden"""
+        if self.relleno is None or self.fuente.cur is None:
+            return
+        for canal, payload in self.relleno.consultar(self.fuente.cur):
+            self.entregar(canal, payload)
+
+    def espera(self):
+        """Tiempo maximo de espera de notificaciones: heartbeat, la proxima revision o coordinacion"""
+        intervalos = [self.intervalo_heartbeat]
+        if self.intervalo_revision is not None:
+            intervalos.append(self.intervalo_revision)
+        if self.replicas is not None:
+            intervalos.append(self.replicas.intervalo)
+        return min(intervalos)
+
+    def coordinar(self):
+        """Toma o cede consumidores entre replicas y reentrega lo reciente a los que toma"""
+        if self.fuente.cur is None:
+            return
+        self.tomar(self.replicas.coordinar(self.fuente.cur))
+
+    def tomar(self, nuevos):
+        """Reentrega lo reciente a los consumidores que esta replica acaba de tomar"""
+        if nuevos:
+            self._repetir(set(nuevos))
+
+    def _repetir(self, nombres):
+        """Entrega a los consumidores recien tomados las notificaciones recientes de sus canales"""
+        limite = time.monotonic() - self.repeticion
+        repetidas = 0
+        for instante, canal, payload_texto in list(self._recientes):
+            if instante < limite:
+                continue
+            destinatarios = [c for c in self.rutas.get(canal, ()) if c.nombre in nombres]
+            if not destinatarios:
+                continue
+            try:
+                payload = self.decodificar(canal, payload_texto)
+            except PayloadInvalido:
+                continue
+            repetidas += 1
+            for consumidor in destinatarios:
+                try:
+                    consumidor.procesar(canal, payload)
+                except Exception as e:
+                    self.errores_consumidor += 1
+                    log.exception("Error en consumidor '%s' procesando %s: %s", consumidor.nombre, canal, e)
+        log.info("Se reentregan %d notificaciones de los ultimos %ss a %s", repetidas, self.repeticion,
+                 ', '.join(sorted(nombres)))
+
+    def revisar(self, coordinar=True):
+        """
+        Tareas periodicas de los consumidores (vencimiento de tramas), a lo sumo una vez por intervalo.
+        Con coordinar=False no se coordinan las replicas (el modo asyncio lo hace fuera del loop).
+        """
+        if coordinar and self.replicas is not None and self.replicas.pendiente():
+            self.coordinar()
+        if not self.revisiones:
+            return
+        ahora = time.monotonic()
+        if ahora - self._ultima_revision < self.intervalo_revision:
+            return
+        self._ultima_revision = ahora
+        for consumidor in self.revisiones:
+            try:
+                consumidor.revisar()
+            except Exception as e:
+                self.errores_consumidor += 1
+                log.exception("Error en consumidor '%s' revisando: %s", consumidor.nombre, e)
+
+    def despachar(self, canal, payload_texto):
+        """Decodifica una notificacion y la entrega a los consumidores del canal"""
+        payload = self.recibir(canal, payload_texto)
+        if payload is not None:
+            self.entregar(canal, payload)
+
+    def recibir(self, canal, payload_texto):
+        """Cuenta y decodifica una notificacion; None si es invalida o ya la entrego el relleno"""
+        self.notificaciones[canal] = self.notificaciones.get(canal, 0) + 1
+        NOTIFICACIONES.inc(canal)
+        if self.replicas is not None:
+            ahora = time.monotonic()
+            recientes = self._recientes
+            recientes.append((ahora, canal, payload_texto))
+            while recientes[0][0] < ahora - self.repeticion:
+                recientes.popleft()
+        inicio = time.perf_counter()
+        try:
+            payload = self.decodificar(canal, payload_texto)
+            DECODIFICACION.observar(time.perf_counter() - inicio)
+        except PayloadInvalido as e:
+            self.errores_decodificacion += 1
+            RECHAZADOS.inc(canal)
+            log.error("Payload rechazado de %s: %s", canal, e)
+            return None
+
+        # Filas que el relleno ya entrego y que tambien llegaron por NOTIFY
+        if self.relleno is not None and self.relleno.repetida(canal, payload):
+            return None
+        return payload
+
+    def decodificar(self, canal, payload_texto):
+        """Registro del esquema del canal (o dict si no tiene); PayloadInvalido si no es valido"""
+        esquema = self.esquemas.get(canal)
+        if esquema is None:
+            return decodificar(payload_texto)
+        return esquema.decodificar(payload_texto)
+
+    def entregar(self, canal, payload):
+        """Entrega un payload ya decodificado a los consumidores del canal"""
+        if self.relleno is not None and isinstance(payload, (dict, Registro)):
+            self.relleno.registrar(canal, payload)
+        if self.ultimos is not None:
+            self.ultimos.registrar(canal, payload)
+
+        replicas = self.replicas
+        for consumidor in self.rutas.get(canal, ()):
+            if replicas is not None and consumidor.nombre not in replicas.propios:
+                continue
+            try:
+                consumidor.procesar(canal, payload)
+            except Exception as e:
+                self.errores_consumidor += 1
+                log.exception("Error en consumidor '%s' procesando %s: %s", consumidor.nombre, canal, e)
+
+    def ejecutar(self):
+        """Loop principal: conexion, LISTEN, reparto de notificaciones y reconexion con backoff"""
+        for consumidor in self.consumidores:
+            consumidor.iniciar()
+
+        intentos_conexion = 0
+        reconexiones_consecutivas = 0
+
+        while True:
+            if not self.conectar():
+                intentos_conexion += 1
+                reconexiones_consecutivas += 1
+
+                tiempo_espera = self.tiempo_espera(intentos_conexion)
+
+                log.warning("Reintento %d (reconexiones consecutivas: %d/%d). Esperando %s segundos antes del próximo intento...",
+                            intentos_conexion, reconexiones_consecutivas, self.max_reconexiones, tiempo_espera)
+
+                # Verificar si hemos excedido los límites
+                if self.limite_alcanzado(intentos_conexion, reconexiones_consecutivas):
+                    log.error("Se alcanzó el límite de %d reconexiones consecutivas fallidas. Deteniendo...",
+                              self.max_reconexiones)
+                    break
+
+                time.sleep(tiempo_espera)
+                continue
+
+            # Reiniciar contadores al conectar exitosamente
+            intentos_conexion = 0
+            reconexiones_consecutivas = 0
+            log.info("Conexión exitosa. Contadores de reintento reiniciados.")
+
+            try:
+                self.rellenar()
+                ultima_actividad = time.monotonic()
+
+                while True:
+                    if not self.fuente.esperar(self.espera()):
+                        self.revisar()
+                        if time.monotonic() - ultima_actividad < self.intervalo_heartbeat:
+                            continue
+                        try:
+                            self.fuente.latido()
+                            ultima_actividad = time.monotonic()
+                            continue
+                        except ConexionPerdida as e:
+                            log.warning("Conexión perdida (heartbeat falló): %s. Reconectando...", e)
+                            reconexiones_consecutivas += 1
+                            break
+
+                    self.drenar()
+                    self.revisar()
+                    ultima_actividad = time.monotonic()
+                    if self.fuente.agotada:
+                        log.info("Fuente de notificaciones agotada, %s detenido", self.nombre)
+                        self.fuente.cerrar()
+                        return
+
+            except Exception as e:
+                log.exception("Error inesperado: %s", e)
+                reconexiones_consecutivas += 1
+
+            self.cerrar()
+
+            # Backoff exponencial antes de reconectar
+            tiempo_espera = self.tiempo_espera(reconexiones_consecutivas)
+            log.info("Esperando %s segundos antes de reconectar...", tiempo_espera)
+            time.sleep(tiempo_espera)
+
+    def estadisticas(self):
+        return {
+            'canales': len(self.rutas),
+            'consumidores': [c.nombre for c in self.consumidores],
+            'notificaciones': dict(self.notificaciones),
+            'errores_decodificacion': self.errores_decodificacion,
+            'errores_consumidor': self.errores_consumidor,
+            'drenaje': {'coalescer': self.coalescer, 'rafagas': self.rafagas, 'max_rafaga': self.max_rafaga,
+                        'coalescidas': self.coalescidas},
+            'relleno': self.relleno.estadisticas() if self.relleno is not None else None,
+            'ultimos': self.ultimos.estadisticas() if self.ultimos is not None else None,
+            'replicas': self.replicas.estadisticas() if self.replicas is not None else None,
+        }
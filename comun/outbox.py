@@ -0,0 +1,215 @@
+"""
+Bandeja de salida persistente (outbox) para los POST al backend.
+
+Cada envio (prediccion unificada, lote de lecturas individuales) se escribe
+en una base SQLite local en modo WAL *antes* de despacharlo. Si el POST
+responde bien la fila se borra; si falla o el proceso se reinicia, un hilo
+de drenado la reenvia mas tarde a una tasa limitada, con backoff exponencial.
+Cada fila tiene una clave unica, de modo que un mismo envio registrado dos
+veces (por ejemplo una notificacion repetida) no se duplica.
+
+El reenvio lo hace un "entregador" registrado por tipo:
+    entregar(datos) -> None si se completo, o los datos que quedan pendientes
+Si lanza una excepcion se reintenta la fila completa.
+"""
+
+import json
+import os
+import sqlite3
+import threading
+import time
+
+from comun import logs
+
+log = logs.obtener('outbox')
+
+
+def reintentable(status_code):
+    """Codigos HTTP que justifican reintentar (errores del servidor, timeout, limite de tasa)"""
+    return status_code >= 500 or status_code in (408, 429)
+
+
+def crear_outbox(nombre):
+    """Outbox del listener, o None si OUTBOX_HABILITADO=0"""
+    if os.environ.get('OUTBOX_HABILITADO', '1') != '1':
+        return None
+    return Outbox(nombre)
+
+
+class Outbox:
+    """Cola persistente en SQLite (WAL) con drenado en segundo plano"""
+
+    def __init__(self, nombre, ruta=None, intervalo=2.0, tasa_max=5.0, max_intentos=20,
+                 espera_base=5.0, espera_max=300.0):
+        self.nombre = nombre
+        directorio = os.environ.get('OUTBOX_DIR', '.')
+        self.ruta = ruta or os.path.join(directorio, f"outbox_{nombre}.db")
+        self.intervalo = float(os.environ.get('OUTBOX_INTERVALO', intervalo))
+        self.tasa_max = float(os.environ.get('OUTBOX_TASA_MAX', tasa_max))
+        self.max_intentos = int(os.environ.get('OUTBOX_MAX_INTENTOS', max_intentos))
+        self.espera_base = espera_base
+        self.espera_max = espera_max
+
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(self.ruta, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS salida (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                tipo TEXT NOT NULL,
+                clave TEXT NOT NULL UNIQUE,
+                datos TEXT NOT NULL,
+                intentos INTEGER NOT NULL DEFAULT 0,
+                proximo_intento REAL NOT NULL,
+                ultimo_error TEXT,
+                muerto INTEGER NOT NULL DEFAULT 0
+            )""")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS salida_pendientes ON salida (muerto, proximo_intento)")
+
+        self._entregadores = {}
+        self._en_vuelo = set()  # ids que esta enviando el despachador; el drenado no los toca
+        self._hilo = None
+
+        # Contadores
+        self.guardados = 0
+        self.duplicados = 0
+        self.confirmados = 0
+        self.reintentos = 0
+        self.reenviados = 0
+        self.descartados = 0
+        self.muertos = 0
+
+    def registrar(self, tipo, entregar):
+        """Asocia el entregador que reenvia las filas de un tipo"""
+        self._entregadores[tipo] = entregar
+
+    def iniciar(self):
+        """Arranca el hilo de drenado (idempotente)"""
+        if self._hilo:
+            return
+        self._hilo = threading.Thread(target=self._drenar_periodicamente, name=f"{self.nombre}-outbox")
+        self._hilo.daemon = True
+        self._hilo.start()
+        pendientes = self.pendientes()
+        log.info("Outbox '%s' iniciado en %s: %d envios pendientes", self.nombre, self.ruta, pendientes)
+
+    def guardar(self, tipo, clave, datos):
+        """
+        Registra un envio antes de despacharlo y lo marca en vuelo.
+        Retorna el id de la fila, o None si la clave ya estaba registrada.
+        """
+        with self._lock:
+            cur = self._conn.execute(
+                "INSERT OR IGNORE INTO salida (tipo, clave, datos, proximo_intento) VALUES (?, ?, ?, ?)",
+                (tipo, clave, json.dumps(datos), time.time()))
+            if cur.rowcount == 0:
+                self.duplicados += 1
+                return None
+            self.guardados += 1
+            self._en_vuelo.add(cur.lastrowid)
+            return cur.lastrowid
+
+    def confirmar(self, id_fila):
+        """El envio se completo (o el backend lo rechazo sin posibilidad de reintento)"""
+        with self._lock:
+            self._conn.execute("DELETE FROM salida WHERE id = ?", (id_fila,))
+            self._en_vuelo.discard(id_fila)
+            self.confirmados += 1
+
+    def liberar(self, id_fila):
+        """Deja la fila para el hilo de drenado (por ejemplo, si la cola de despacho estaba llena)"""
+        with self._lock:
+            self._en_vuelo.discard(id_fila)
+
+    def reprogramar(self, id_fila, error, datos=None):
+        """El envio fallo: se reintenta con backoff exponencial, o se marca muerto tras max_intentos"""
+        with self._lock:
+            self._en_vuelo.discard(id_fila)
+            fila = self._conn.execute("SELECT intentos FROM salida WHERE id = ?", (id_fila,)).fetchone()
+            if fila is None:
+                return
+            intentos = fila[0] + 1
+            muerto = intentos >= self.max_intentos
+            espera = min(self.espera_base * (2 ** min(intentos - 1, 10)), self.espera_max)
+            if datos is None:
+                self._conn.execute(
+                    "UPDATE salida SET intentos = ?, proximo_intento = ?, ultimo_error = ?, muerto = ? WHERE id = ?",
+                    (intentos, time.time() + espera, str(error)[:500], int(muerto), id_fila))
+            else:
+                self._conn.execute(
+                    "UPDATE salida SET intentos = ?, proximo_intento = ?, ultimo_error = ?, muerto = ?, datos = ? WHERE id = ?",
+                    (intentos, time.time() + espera, str(error)[:500], int(muerto), json.dumps(datos), id_fila))
+            self.reintentos += 1
+            if muerto:
+                self.muertos += 1
+        if muerto:
+            log.warning("Outbox '%s' abandona el envio %s tras %d intentos: %s", self.nombre, id_fila, intentos, error)
+
+    def descartar(self, id_fila, motivo):
+        """Elimina una fila que no se puede entregar (tipo sin entregador, datos invalidos)"""
+        with self._lock:
+            self._conn.execute("DELETE FROM salida WHERE id = ?", (id_fila,))
+            self._en_vuelo.discard(id_fila)
+            self.descartados += 1
+        log.warning("Outbox '%s' descarta el envio %s: %s", self.nombre, id_fila, motivo)
+
+    def pendientes(self):
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM salida WHERE muerto = 0").fetchone()[0]
+
+    def _vencidas(self, limite):
+        with self._lock:
+            filas = self._conn.execute(
+                "SELECT id, tipo, datos FROM salida WHERE muerto = 0 AND proximo_intento <= ? "
+                "ORDER BY id LIMIT ?", (time.time(), limite + len(self._en_vuelo))).fetchall()
+            return [f for f in filas if f[0] not in self._en_vuelo][:limite]
+
+    def drenar(self):
+        """Reenvia las filas vencidas, como maximo tasa_max por segundo"""
+        pausa = 1.0 / self.tasa_max if self.tasa_max > 0 else 0.0
+        lote = max(int(self.tasa_max * self.intervalo), 1)
+        for id_fila, tipo, texto in self._vencidas(lote):
+            entregar = self._entregadores.get(tipo)
+            if entregar is None:
+                self.descartar(id_fila, f"tipo '{tipo}' sin entregador")
+                continue
+            try:
+                restantes = entregar(json.loads(texto))
+            except Exception as e:
+                self.reprogramar(id_fila, e)
+            else:
+                if restantes is None:
+                    self.confirmar(id_fila)
+                    with self._lock:
+                        self.reenviados += 1
+                else:
+                    self.reprogramar(id_fila, 'entrega parcial', restantes)
+            if pausa:
+                time.sleep(pausa)
+
+    def _drenar_periodicamente(self):
+        while True:
+            time.sleep(self.intervalo)
+            try:
+                self.drenar()
+            except Exception as e:
+                log.error("Error drenando outbox '%s': %s", self.nombre, e)
+
+    def estadisticas(self):
+        with self._lock:
+            pendientes, muertos = self._conn.execute(
+                "SELECT COALESCE(SUM(muerto = 0), 0), COALESCE(SUM(muerto = 1), 0) FROM salida").fetchone()
+            return {
+                'ruta': self.ruta,
+                'pendientes': pendientes,
+                'en_vuelo': len(self._en_vuelo),
+                'muertos_en_disco': muertos,
+                'guardados': self.guardados,
+                'duplicados': self.duplicados,
+                'confirmados': self.confirmados,
+                'reintentos': self.reintentos,
+                'reenviados': self.reenviados,
+                'descartados': self.descartados,
+                'muertos': self.muertos,
+            }
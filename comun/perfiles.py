@@ -0,0 +1,58 @@
+"""
+Perfiles de listener que se pueden alojar en un mismo proceso.
+
+Cada perfil se define en un modulo sin efectos al importarse, junto a su
+listener (BOMBA_A/perfil_bomba_a.py, ...): canales y endpoints como
+constantes y una fabrica crear_perfil() que arma sus componentes
+(despachador, cliente HTTP, outbox, consumidor) a partir del entorno. Los
+usan los listeners de cada servicio, el listener unificado y las
+herramientas de grabacion y benchmark; importar un perfil no abre
+conexiones, archivos ni hilos.
+"""
+
+import importlib
+import os
+import sys
+
+# Perfil -> modulo que lo define
+MODULOS_PERFIL = {
+    'bomba_a': 'perfil_bomba_a',
+    'bomba_b': 'perfil_bomba_b',
+    'bitacoras': 'perfil_bitacoras',
+}
+
+# Al ejecutar desde el repositorio, los perfiles de cada servicio estan en carpetas hermanas
+RAIZ_REPO = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+CARPETAS_LISTENERS = ('BOMBA_A', 'BOMBA_B', 'bitacoras')
+
+
+class Perfil:
+    """Consumidor del motor de un perfil y los componentes que lo acompanan"""
+
+    def __init__(self, nombre, consumidor, rutas_estadisticas, despachador=None, agrupador=None,
+                 outbox=None, ejecutor=None):
+        self.nombre = nombre
+        self.consumidor = consumidor
+        # Rutas JSON del perfil (sin /motor, que es del motor que lo aloja)
+        self.rutas_estadisticas = rutas_estadisticas
+        # Componentes con envios en curso (el benchmark espera a que se vacien)
+        self.despachador = despachador
+        self.agrupador = agrupador
+        self.outbox = outbox
+        self.ejecutor = ejecutor
+
+
+def modulo_perfil(perfil):
+    """Modulo que define el perfil (importarlo no tiene efectos)"""
+    if perfil not in MODULOS_PERFIL:
+        raise ValueError(f"Perfil desconocido '{perfil}'. Opciones: {', '.join(MODULOS_PERFIL)}")
+    for carpeta in CARPETAS_LISTENERS:
+        ruta = os.path.join(RAIZ_REPO, carpeta)
+        if os.path.isdir(ruta) and ruta not in sys.path:
+            sys.path.append(ruta)
+    return importlib.import_module(MODULOS_PERFIL[perfil])
+
+
+def cargar_perfiles(perfiles):
+    """Crea los perfiles indicados y retorna {perfil: Perfil}"""
+    return {perfil: modulo_perfil(perfil).crear_perfil() for perfil in perfiles}
@@ -0,0 +1,193 @@
+"""
+Relleno de huecos tras una reconexion.
+
+PostgreSQL no guarda los NOTIFY para un listener desconectado: todo lo que
+se inserta mientras el motor reconecta (heartbeat caido, backoff de hasta
+60 s) se pierde y las tramas de ese periodo quedan incompletas.
+
+RellenoHuecos recuerda el ultimo tiempo_sensor visto por canal y, al
+reconectar, lee las filas faltantes de las tablas de sensores con una sola
+consulta (UNION ALL de todas las tablas, cada una con su propio limite
+inferior). El motor entrega esas filas a los consumidores como si fueran
+notificaciones, de modo que las predicciones del hueco tambien se generan.
+
+Cada canal corresponde a la tabla con su mismo nombre sin el prefijo
+'canal_' (canal_sensores_corriente -> sensores_corriente); RELLENO_TABLAS
+(JSON {canal: tabla}) permite cambiarlo. Las tablas deben tener las
+columnas id_sensor, valor y tiempo_sensor, las mismas del payload.
+
+Las filas rellenadas que tambien llegan despues por NOTIFY se descartan. Se
+recuerdan solo mientras pueden llegar: hasta que el canal notifica un tiempo
+posterior al ultimo rellenado o pasan RELLENO_VENTANA_REPETIDAS segundos.
+"""
+
+import json
+import os
+import threading
+import time
+from decimal import Decimal
+
+from psycopg2 import sql
+
+from comun import logs
+from comun.codec import Lectura
+from comun.tramas import parsear_tiempo
+
+log = logs.obtener('relleno')
+
+
+def tablas_de_canales(canales):
+    """Tabla de origen de cada canal (convencion canal_<tabla>, con RELLENO_TABLAS como override)"""
+    override = json.loads(os.environ.get('RELLENO_TABLAS', '{}') or '{}')
+    tablas = {}
+    for canal in canales:
+        if canal in override:
+            tablas[canal] = override[canal]
+        elif canal.startswith('canal_'):
+            tablas[canal] = canal[len('canal_'):]
+    return tablas
+
+
+def relleno_habilitado():
+    return os.environ.get('RELLENO_HABILITADO', '1') == '1'
+
+
+class RellenoHuecos:
+    """Ultimo tiempo_sensor por canal y consulta en bloque de las filas perdidas"""
+
+    def __init__(self, tablas, max_filas=5000, ventana_repetidas=60.0):
+        self.tablas = dict(tablas)
+        self.max_filas = int(os.environ.get('RELLENO_MAX_FILAS', max_filas))
+        self.ventana_repetidas = float(os.environ.get('RELLENO_VENTANA_REPETIDAS', ventana_repetidas))
+
+        self._lock = threading.Lock()
+        self._ultimo = {}       # canal -> (segundos epoch, texto ISO) del ultimo tiempo_sensor visto
+        # canal -> (segundos del ultimo tiempo rellenado, {tiempo_sensor}) entregados por el ultimo relleno
+        self._rellenadas = {}
+        self._rellenadas_vencen = 0.0
+
+        # Contadores
+        self.rellenos = 0
+        self.filas = 0
+        self.repetidas = 0
+        self.errores = 0
+        self.truncados = 0
+        self.ultima_duracion = 0.0
+
+    def registrar(self, canal, payload):
+        """Actualiza el ultimo tiempo_sensor visto del canal"""
+        if canal not in self.tablas:
+            return
+        tiempo = payload.get('tiempo_sensor')
+        if not tiempo:
+            return
+        tiempo = str(tiempo)
+        # Se compara el instante parseado: el texto cambia con la zona horaria o las fracciones
+        parseado = parsear_tiempo(tiempo)
+        if parseado is None:
+            return
+        ultimo = self._ultimo.get(canal)
+        if ultimo is None or parseado[1] > ultimo[0]:
+            self._ultimo[canal] = (parseado[1], tiempo)
+
+    def repetida(self, canal, payload):
+        """True si la notificacion ya fue entregada por el ultimo relleno"""
+        if not self._rellenadas:
+            return False
+        if time.monotonic() > self._rellenadas_vencen:
+            self._rellenadas = {}
+            return False
+        rellenadas = self._rellenadas.get(canal)
+        if rellenadas is None:
+            return False
+        fin, tiempos = rellenadas
+        tiempo = str(payload.get('tiempo_sensor'))
+        if tiempo in tiempos:
+            tiempos.discard(tiempo)
+            if not tiempos:
+                del self._rellenadas[canal]
+            with self._lock:
+                self.repetidas += 1
+            return True
+        parseado = parsear_tiempo(tiempo)
+        if parseado is not None and parseado[1] > fin:
+            # El canal ya notifica despues del relleno: no quedan repeticiones por llegar
+            del self._rellenadas[canal]
+        return False
+
+    def consulta(self):
+        """Consulta UNION ALL con un limite inferior por canal; None si no hay nada que rellenar"""
+        ultimo = dict(self._ultimo)
+        if not ultimo:
+            return None, []
+        # Un canal aun no visto se rellena desde el tiempo visto mas antiguo
+        piso = min(ultimo.values())[1]
+        ultimo = {canal: texto for canal, (_, texto) in ultimo.items()}
+
+        partes = []
+        parametros = []
+        for canal, tabla in self.tablas.items():
+            partes.append(sql.SQL(
+                "SELECT {canal} AS canal, id_sensor, valor, "
+                "to_json(tiempo_sensor) #>> '{{}}' AS tiempo_sensor, tiempo_sensor AS orden "
+                "FROM {tabla} WHERE tiempo_sensor > %s"
+            ).format(canal=sql.Literal(canal), tabla=sql.Identifier(*tabla.split('.'))))
+            parametros.append(ultimo.get(canal, piso))
+        consulta = sql.SQL(" UNION ALL ").join(partes) + sql.SQL(" ORDER BY orden LIMIT %s")
+        parametros.append(self.max_filas)
+        return consulta, parametros
+
+    def consultar(self, cur):
+        """Ejecuta el relleno y retorna [(canal, payload)] en orden de tiempo_sensor"""
+        consulta, parametros = self.consulta()
+        if consulta is None:
+            return []
+
+        inicio = time.monotonic()
+        try:
+            cur.execute(consulta, parametros)
+            filas = cur.fetchall()
+        except Exception as e:
+            with self._lock:
+                self.errores += 1
+            log.error("Error en relleno de huecos: %s", e)
+            return []
+
+        resultado = []
+        for canal, id_sensor, valor, tiempo_sensor, _ in filas:
+            if isinstance(valor, Decimal):
+                valor = float(valor)
+            resultado.append((canal, Lectura(tiempo_sensor, valor, id_sensor)))
+        # Las filas vienen en orden: la ultima de cada canal marca el fin de su relleno
+        rellenadas = {}
+        for canal, payload in resultado:
+            rellenadas.setdefault(canal, set()).add(payload.tiempo_sensor)
+        fines = {canal: payload.tiempo_sensor for canal, payload in resultado}
+        self._rellenadas = {canal: ((parsear_tiempo(fines[canal]) or (None, float('inf')))[1], tiempos)
+                            for canal, tiempos in rellenadas.items()}
+        self._rellenadas_vencen = time.monotonic() + self.ventana_repetidas
+
+        with self._lock:
+            self.rellenos += 1
+            self.filas += len(resultado)
+            if len(resultado) >= self.max_filas:
+                self.truncados += 1
+            self.ultima_duracion = time.monotonic() - inicio
+        if len(resultado) >= self.max_filas:
+            log.warning("Relleno truncado a %d filas (RELLENO_MAX_FILAS)", self.max_filas)
+        log.info("Relleno de huecos: %d filas recuperadas en %.2fs", len(resultado), self.ultima_duracion)
+        return resultado
+
+    def estadisticas(self):
+        with self._lock:
+            return {
+                'canales': len(self.tablas),
+                'max_filas': self.max_filas,
+                'rellenos': self.rellenos,
+                'filas': self.filas,
+                'repetidas': self.repetidas,
+                'errores': self.errores,
+                'truncados': self.truncados,
+                'ultima_duracion': self.ultima_duracion,
+                'ultimo_tiempo': {canal: texto for canal, (_, texto) in self._ultimo.items()},
+            }
@@ -0,0 +1,165 @@
+"""
+Coordinacion de replicas con advisory locks de PostgreSQL.
+
+Con mas de una replica del mismo listener (Code Engine --max-scale 2) cada
+una haria LISTEN sobre todos los canales y cada lectura se enviaria dos
+veces. Con REPLICAS_MODO las replicas se reparten el trabajo usando locks
+de sesion sobre la misma conexion LISTEN; si una replica muere o pierde la
+conexion, PostgreSQL libera sus locks y las demas los toman en el siguiente
+ciclo (cada REPLICAS_INTERVALO segundos):
+
+    lider      un solo lock para todos los consumidores: la replica que lo
+               tiene procesa, las demas quedan en espera y lo intentan tomar
+    particion  cada replica ocupa un puesto (lock en REPLICAS_MAX puestos) y
+               los consumidores (Bomba A, Bomba B, bitacoras) se reparten en
+               partes iguales entre los puestos vivos, en orden; al entrar o
+               salir una replica se recalcula el reparto. Cada consumidor
+               tiene ademas su propio lock, de modo que el nuevo dueno no
+               empieza hasta que el anterior lo suelta
+
+La unidad de reparto es el consumidor y no el canal: las tramas de una bomba
+necesitan todos sus canales en el mismo proceso. En un listener de una sola
+bomba el modo particion se comporta como lider/espera.
+"""
+
+import threading
+import time
+import zlib
+
+from comun import logs
+
+log = logs.obtener('replicas')
+
+MODOS = ('lider', 'particion')
+# Nombre de la unidad que agrupa a todos los consumidores en modo lider
+UNIDAD_LIDER = 'lider'
+
+
+def clave_lock(texto):
+    """Clave int4 no negativa y estable entre procesos (hash() cambia en cada proceso)"""
+    return zlib.crc32(texto.encode()) & 0x7fffffff
+
+
+class CoordinadorReplicas:
+    """Decide que consumidores procesa esta replica a partir de los locks que tiene"""
+
+    def __init__(self, grupo, consumidores, modo='lider', intervalo=1.0, max_replicas=16):
+        if modo not in MODOS:
+            raise ValueError(f"REPLICAS_MODO desconocido '{modo}' (opciones: {', '.join(MODOS)})")
+        self.grupo = grupo
+        self.modo = modo
+        self.intervalo = float(intervalo)
+        self.max_replicas = int(max_replicas)
+        # unidad -> nombres de consumidores
+        if modo == 'lider':
+            self.unidades = {UNIDAD_LIDER: list(consumidores)}
+        else:
+            self.unidades = {nombre: [nombre] for nombre in consumidores}
+        # Locks de dos claves int4: (grupo de puestos, puesto) y (grupo de unidades, unidad)
+        self._clave_puestos = clave_lock(f"{grupo}|puestos")
+        self._clave_unidades = clave_lock(f"{grupo}|unidades")
+
+        self._lock = threading.Lock()
+        self.puesto = None
+        self.vivos = []
+        self.unidades_propias = set()
+        self.propios = frozenset()
+        self._ultima = 0.0
+
+        # Contadores
+        self.tomas = 0
+        self.cesiones = 0
+        self.errores = 0
+
+    def reiniciar(self):
+        """La conexion se perdio: los locks de sesion ya no son nuestros"""
+        with self._lock:
+            if self.unidades_propias:
+                log.warning("Conexion perdida: se dejan de procesar %s", sorted(self.unidades_propias))
+            self.puesto = None
+            self.vivos = []
+            self.unidades_propias = set()
+            self.propios = frozenset()
+            self._ultima = 0.0
+
+    def propio(self, nombre):
+        return nombre in self.propios
+
+    def pendiente(self):
+        """True si ya toca otro ciclo de coordinacion"""
+        return time.monotonic() - self._ultima >= self.intervalo
+
+    def coordinar(self, cur):
+        """
+        Toma y suelta locks segun el modo. Retorna los nombres de los consumidores
+        que esta replica acaba de empezar a procesar (para reentregarles lo reciente).
+        """
+        with self._lock:
+            self._ultima = time.monotonic()
+        nuevas = []
+        try:
+            if self.modo == 'particion':
+                asignadas = self._asignadas(cur)
+            else:
+                asignadas = set(self.unidades)
+            for unidad in sorted(set(self.unidades_propias) - asignadas):
+                cur.execute("SELECT pg_advisory_unlock(%s, %s)", (self._clave_unidades, clave_lock(unidad)))
+                cur.fetchone()
+                self.unidades_propias.discard(unidad)
+                self.cesiones += 1
+                log.info("[%s] Replica cede '%s'", self.grupo, unidad)
+            for unidad in sorted(asignadas - self.unidades_propias):
+                cur.execute("SELECT pg_try_advisory_lock(%s, %s)", (self._clave_unidades, clave_lock(unidad)))
+                if cur.fetchone()[0]:
+                    self.unidades_propias.add(unidad)
+                    nuevas.append(unidad)
+                    self.tomas += 1
+                    log.info("[%s] Replica toma '%s' (%s)", self.grupo, unidad, ', '.join(self.unidades[unidad]))
+        except Exception as e:
+            self.errores += 1
+            log.error("[%s] Error coordinando replicas: %s", self.grupo, e)
+        finally:
+            # Un error a mitad del ciclo deja unidades ya tomadas o cedidas: propios debe reflejarlas
+            with self._lock:
+                self.propios = frozenset(n for u in self.unidades_propias for n in self.unidades[u])
+        return [n for u in nuevas for n in self.unidades[u]]
+
+    def _asignadas(self, cur):
+        """Unidades que corresponden a nuestro puesto entre los puestos vivos"""
+        if self.puesto is None:
+            for puesto in range(self.max_replicas):
+                cur.execute("SELECT pg_try_advisory_lock(%s, %s)", (self._clave_puestos, puesto))
+                if cur.fetchone()[0]:
+                    self.puesto = puesto
+                    log.info("[%s] Replica en el puesto %d", self.grupo, puesto)
+                    break
+            else:
+                log.warning("[%s] Los %d puestos de replica estan ocupados; esta replica queda en espera",
+                            self.grupo, self.max_replicas)
+                return set()
+        # Locks de dos claves int4: classid = primera clave, objid = segunda, objsubid = 2
+        cur.execute(
+            "SELECT objid::int FROM pg_locks WHERE locktype = 'advisory' AND granted AND objsubid = 2 "
+            "AND classid = %s AND database = (SELECT oid FROM pg_database WHERE datname = current_database())",
+            (self._clave_puestos,))
+        vivos = sorted({fila[0] for fila in cur.fetchall()} | {self.puesto})
+        if vivos != self.vivos:
+            log.info("[%s] Replicas vivas en los puestos %s", self.grupo, vivos)
+            self.vivos = vivos
+        # Mismo calculo en todas las replicas: unidades ordenadas, una por puesto vivo en turno
+        indice = vivos.index(self.puesto)
+        return {unidad for i, unidad in enumerate(sorted(self.unidades)) if i % len(vivos) == indice}
+
+    def estadisticas(self):
+        with self._lock:
+            return {
+                'modo': self.modo,
+                'grupo': self.grupo,
+                'puesto': self.puesto,
+                'puestos_vivos': list(self.vivos),
+                'unidades_propias': sorted(self.unidades_propias),
+                'consumidores_propios': sorted(self.propios),
+                'tomas': self.tomas,
+                'cesiones': self.cesiones,
+                'errores': self.errores,
+            }
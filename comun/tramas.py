@@ -0,0 +1,323 @@
+"""
+Almacen compacto de conjuntos de datos por tiempo_sensor ("tramas").
+
+Cada trama guarda los valores en un arreglo de floats de ancho fijo y una
+mascara de bits con los campos presentes. Los indices de cada campo se
+calculan una sola vez a partir de CANAL_TO_CAMPO, de modo que verificar si
+una trama esta completa es una comparacion de enteros. El orden temporal se
+mantiene con un heap indexado por el tiempo_sensor parseado, sin ordenar
+todas las claves en cada notificacion.
+
+Con `resolucion` > 0 las tramas no se indexan por el texto exacto del
+tiempo_sensor sino por su cubeta: el tiempo se parsea una vez por
+notificacion a milisegundos epoch y se alinea al multiplo de `resolucion`
+mas cercano si esta a no mas de `tolerancia`. Asi las lecturas de un mismo
+instante con milisegundos de diferencia o con otro formato ('T' / espacio,
+fracciones, zona horaria) completan la misma trama.
+
+El almacen tambien recuerda el ultimo valor recibido de cada campo, para
+completar con el las tramas que vencen su plazo sin recibir todos sus campos
+(imputar), y los tiempo_sensor ya enviados, para no volver a abrir una trama
+con una lectura tardia. Las tramas completas que no se pudieron despachar
+(cola llena) se apartan de las incompletas, en una lista acotada que se
+reintenta en orden, para que limpiar() no tenga que recorrerlas.
+"""
+
+import heapq
+import math
+import time
+from array import array
+from datetime import datetime
+from functools import lru_cache
+
+
+@lru_cache(maxsize=1024)
+def parsear_tiempo(texto):
+    """
+    (fecha, segundos epoch) de un tiempo_sensor, o None si no es ISO 8601.
+    Las lecturas de un mismo instante llegan juntas y con el mismo texto, asi
+    que el cache deja un solo parseo por tiempo aunque lo pidan los dos
+    perfiles de bomba y el cache de ultimos valores.
+    """
+    try:
+        fecha = datetime.fromisoformat(texto)
+    except ValueError:
+        return None
+    return fecha, fecha.timestamp()
+
+
+def clave_orden(tiempo_sensor):
+    """Clave de orden cronologico; los tiempos no parseables quedan primero"""
+    parseado = parsear_tiempo(str(tiempo_sensor))
+    if parseado is None:
+        return (float('-inf'), str(tiempo_sensor))
+    return (parseado[1], str(tiempo_sensor))
+
+
+class Trama:
+    """Valores de un tiempo_sensor: arreglo de floats + mascara de campos presentes"""
+
+    __slots__ = ('clave', 'tiempo_sensor', 'orden', 'valores', 'mascara', 'imputados', 'creada',
+                 'caracteristicas', 'aprobada')
+
+    def __init__(self, clave, tiempo_sensor, orden, ancho):
+        self.clave = clave                  # tiempo_sensor, o su cubeta en ms con resolucion
+        self.tiempo_sensor = tiempo_sensor  # texto de la trama (el tiempo de la cubeta con resolucion)
+        self.orden = orden
+        self.creada = time.monotonic()  # llegada del primer campo
+        self.valores = array('d', bytes(8 * ancho))
+        self.mascara = 0
+        self.imputados = 0  # mascara de campos completados con su ultimo valor conocido
+        self.caracteristicas = None  # estadisticas de ventana movil, calculadas al enviarla
+        self.aprobada = None  # decision de la compuerta de cambios (None = sin evaluar)
+
+
+class AlmacenTramas:
+    """Tramas por tiempo_sensor con verificacion de completitud O(1)"""
+
+    def __init__(self, campos_requeridos, canal_to_campo, max_tramas=10, resolucion=0.0, tolerancia=None,
+                 max_aplazadas=None):
+        # Primero los campos requeridos (en su orden), luego los campos extra
+        self.campos = list(campos_requeridos)
+        for campo in canal_to_campo.values():
+            if campo not in self.campos:
+                self.campos.append(campo)
+        self.indice_campo = {campo: i for i, campo in enumerate(self.campos)}
+        self.indice_canal = {canal: self.indice_campo[campo] for canal, campo in canal_to_campo.items()}
+
+        self.num_requeridos = len(campos_requeridos)
+        self.mascara_requerida = (1 << self.num_requeridos) - 1
+        self.max_tramas = max_tramas
+
+        # Cubetas de tiempo (0 = clave exacta por texto); tolerancia por defecto: media cubeta
+        self.resolucion_ms = round(resolucion * 1000)
+        self.tolerancia_ms = self.resolucion_ms // 2 if tolerancia is None else round(tolerancia * 1000)
+        self.fuera_de_tolerancia = 0
+        self.no_parseables = 0
+
+        self._tramas = {}   # en orden de creacion: las primeras son las mas antiguas
+        self._heap = []
+
+        # Tramas completas pendientes de envio (orden de llegada, acotado); no estan en _tramas
+        self._aplazadas = {}
+        self.max_aplazadas = max(64, 8 * max_tramas) if max_aplazadas is None else max_aplazadas
+        self.aplazadas_descartadas = 0
+
+        # Ultimo valor conocido de cada campo y el instante (tiempo_sensor) en que se recibio
+        self._ultimo_valor = array('d', bytes(8 * len(self.campos)))
+        self._ultimo_tiempo = [None] * len(self.campos)
+
+        # Claves ya enviadas (orden de insercion, acotado)
+        self._cerradas = {}
+        self.max_cerradas = max(64, 8 * max_tramas)
+
+    def __len__(self):
+        return len(self._tramas)
+
+    def __contains__(self, clave):
+        return clave in self._tramas or clave in self._aplazadas
+
+    def ubicar(self, tiempo_sensor):
+        """
+        (clave, fecha) de la trama a la que pertenece el tiempo_sensor. Sin
+        resolucion la clave es el mismo texto y no se parsea; con resolucion es
+        la cubeta en milisegundos epoch (o el instante exacto si esta fuera de
+        la tolerancia de toda cubeta). Los textos no parseables usan su texto.
+        """
+        if not self.resolucion_ms:
+            return tiempo_sensor, None
+        parseado = parsear_tiempo(str(tiempo_sensor))
+        if parseado is None:
+            self.no_parseables += 1
+            return tiempo_sensor, None
+        fecha, segundos = parseado
+        ms = round(segundos * 1000)
+        cubeta = self._cubeta(ms)
+        if cubeta == ms and ms % self.resolucion_ms:
+            self.fuera_de_tolerancia += 1
+        return cubeta, fecha
+
+    def clave(self, tiempo_sensor):
+        """Clave de ubicar() sin la fecha ni los contadores (para agrupar lecturas antes de procesarlas)"""
+        if not self.resolucion_ms:
+            return tiempo_sensor
+        parseado = parsear_tiempo(str(tiempo_sensor))
+        if parseado is None:
+            return tiempo_sensor
+        return self._cubeta(round(parseado[1] * 1000))
+
+    def _cubeta(self, ms):
+        """Multiplo de resolucion mas cercano, o el mismo instante si esta fuera de la tolerancia"""
+        cubeta = (ms + self.resolucion_ms // 2) // self.resolucion_ms * self.resolucion_ms
+        return cubeta if abs(ms - cubeta) <= self.tolerancia_ms else ms
+
+    def cerrada(self, clave):
+        """True si la trama ya se envio (una lectura tardia no debe reabrirla)"""
+        return clave in self._cerradas
+
+    def obtener(self, clave, tiempo_sensor=None, fecha=None):
+        """Retorna la trama de la clave (ver ubicar), creandola si no existe"""
+        trama = self._tramas.get(clave)
+        if trama is None:
+            trama = self._aplazadas.get(clave)
+        if trama is None:
+            if fecha is not None:
+                # Texto de la cubeta, en la zona horaria y con el separador de la lectura
+                texto = datetime.fromtimestamp(clave / 1000, fecha.tzinfo).isoformat(
+                    'T' if 'T' in str(tiempo_sensor) else ' ')
+                orden = (clave / 1000, texto)
+            else:
+                texto = clave if tiempo_sensor is None else tiempo_sensor
+                orden = clave_orden(texto)
+            trama = Trama(clave, texto, orden, len(self.campos))
+            self._tramas[clave] = trama
+            heapq.heappush(self._heap, (trama.orden, clave))
+        return trama
+
+    def guardar(self, trama, canal, valor):
+        """Guarda el valor del canal en la trama"""
+        i = self.indice_canal[canal]
+        trama.valores[i] = float(valor)
+        trama.mascara |= 1 << i
+        trama.imputados &= ~(1 << i)
+
+        # Ultimo valor conocido del campo (solo con tiempo_sensor parseable)
+        t = trama.orden[0]
+        if t != -math.inf and (self._ultimo_tiempo[i] is None or t >= self._ultimo_tiempo[i]):
+            self._ultimo_valor[i] = trama.valores[i]
+            self._ultimo_tiempo[i] = t
+
+    def presentes(self, trama):
+        """Numero de campos requeridos presentes"""
+        return (trama.mascara & self.mascara_requerida).bit_count()
+
+    def completa(self, trama):
+        return trama.mascara & self.mascara_requerida == self.mascara_requerida
+
+    def faltantes(self, trama):
+        """Campos requeridos que aun no llegan (solo para logs)"""
+        return [campo for i, campo in enumerate(self.campos[:self.num_requeridos])
+                if not trama.mascara >> i & 1]
+
+    def datos(self, trama):
+        """Diccionario campo -> valor con los campos requeridos presentes"""
+        return {campo: trama.valores[i] for i, campo in enumerate(self.campos[:self.num_requeridos])
+                if trama.mascara >> i & 1}
+
+    def extras(self, trama):
+        """Diccionario campo -> valor con los campos extra presentes"""
+        return {campo: trama.valores[i] for i, campo in enumerate(self.campos)
+                if i >= self.num_requeridos and trama.mascara >> i & 1}
+
+    def campos_imputados(self, trama):
+        """Nombres de los campos de la trama completados con su ultimo valor conocido"""
+        return [campo for i, campo in enumerate(self.campos[:self.num_requeridos])
+                if trama.imputados >> i & 1]
+
+    def vencidas(self, plazo, ahora=None):
+        """Tramas cuyo primer campo llego hace mas de plazo segundos (las mas antiguas primero)"""
+        limite = (time.monotonic() if ahora is None else ahora) - plazo
+        vencidas = []
+        for trama in self._tramas.values():
+            if trama.creada > limite:
+                break
+            vencidas.append(trama)
+        return vencidas
+
+    def imputar(self, trama, antiguedad_maxima):
+        """
+        Completa los campos requeridos que faltan con su ultimo valor conocido.
+        Solo imputa si todos los faltantes tienen un valor a no mas de
+        antiguedad_maxima segundos (de tiempo_sensor) de la trama; si no, no
+        modifica la trama y retorna False.
+        """
+        faltantes = self.mascara_requerida & ~trama.mascara
+        t = trama.orden[0]
+        if faltantes and t == -math.inf:
+            return False
+        indices = [i for i in range(self.num_requeridos) if faltantes >> i & 1]
+        for i in indices:
+            ultimo = self._ultimo_tiempo[i]
+            if ultimo is None or abs(t - ultimo) > antiguedad_maxima:
+                return False
+        for i in indices:
+            trama.valores[i] = self._ultimo_valor[i]
+        trama.mascara |= faltantes
+        trama.imputados |= faltantes
+        return True
+
+    def aplazar(self, trama):
+        """
+        Aparta una trama completa que no se pudo despachar. Si se supera
+        max_aplazadas se quita la mas antigua, que se retorna (o None).
+        """
+        if trama.clave in self._aplazadas:
+            return None
+        self._tramas.pop(trama.clave, None)
+        self._aplazadas[trama.clave] = trama
+        if len(self._aplazadas) > self.max_aplazadas:
+            # Se abandona: una lectura tardia ya no la vuelve a abrir
+            self.aplazadas_descartadas += 1
+            descartada = self._aplazadas.pop(next(iter(self._aplazadas)))
+            self._cerrar(descartada.clave)
+            return descartada
+        return None
+
+    def aplazada(self, clave):
+        return clave in self._aplazadas
+
+    def aplazadas(self):
+        """Tramas completas pendientes de envio, las mas antiguas primero"""
+        return list(self._aplazadas.values())
+
+    def eliminar(self, clave):
+        """Quita una trama ya enviada y recuerda su clave"""
+        # La entrada del heap se descarta de forma perezosa en limpiar()
+        self._tramas.pop(clave, None)
+        self._aplazadas.pop(clave, None)
+        self._cerrar(clave)
+        self._compactar()
+
+    def descartar(self, clave):
+        """Quita una trama que no se envio"""
+        self._tramas.pop(clave, None)
+        self._aplazadas.pop(clave, None)
+        self._compactar()
+
+    def _cerrar(self, clave):
+        self._cerradas[clave] = None
+        if len(self._cerradas) > self.max_cerradas:
+            del self._cerradas[next(iter(self._cerradas))]
+
+    def _compactar(self):
+        # Reconstruir el heap si acumula demasiadas entradas obsoletas
+        if len(self._heap) > 4 * (len(self._tramas) + self.max_tramas):
+            self._heap = [(t.orden, t.clave) for t in self._tramas.values()]
+            heapq.heapify(self._heap)
+
+    def limpiar(self, clave_actual=None):
+        """
+        Elimina las tramas incompletas mas antiguas hasta quedar en max_tramas.
+        Nunca elimina la trama que se esta procesando ni las completas.
+        Retorna una lista de (tiempo_sensor, campos presentes) eliminados.
+
+        Las completas pendientes de envio estan apartadas (aplazar), asi que
+        en el heap solo se conservan, y se vuelven a insertar, la trama actual
+        y alguna completa que aun no se haya despachado.
+        """
+        eliminadas = []
+        conservadas = []
+        while len(self._tramas) > self.max_tramas and self._heap:
+            orden, clave = heapq.heappop(self._heap)
+            trama = self._tramas.get(clave)
+            if trama is None or trama.orden != orden:
+                continue  # entrada obsoleta (enviada, descartada o aplazada)
+            if clave == clave_actual or self.completa(trama):
+                conservadas.append((orden, clave))
+                continue
+            del self._tramas[clave]
+            eliminadas.append((trama.tiempo_sensor, self.presentes(trama)))
+        for entrada in conservadas:
+            heapq.heappush(self._heap, entrada)
+        self._compactar()
+        return eliminadas
@@ -0,0 +1,139 @@
+"""
+Ultimo valor conocido de cada canal de sensores, servido por HTTP.
+
+El motor registra aqui cada lectura de los canales de las bombas (las que
+llegan por NOTIFY y las del relleno), de modo que GET /ultimos responde el
+valor "actual" de cada sensor sin consultar PostgreSQL:
+
+    GET /ultimos                  todos los canales y los campos de cada bomba
+    GET /ultimos?bomba=bomba_a    solo los campos de una bomba (y sus canales)
+
+La respuesta lleva un ETag que cambia con cada lectura nueva; con
+If-None-Match igual al ultimo ETag se responde 304 sin cuerpo. El JSON de
+cada version se serializa una sola vez, aunque lo consulten muchos clientes.
+"""
+
+import json
+import os
+import threading
+import time
+from urllib.parse import parse_qs, urlsplit
+
+from comun.codec import Registro
+from comun.tramas import clave_orden
+
+def ultimos_habilitado():
+    return os.environ.get('ULTIMOS_HABILITADO', '1') == '1'
+
+
+def clave_bomba(nombre):
+    """'Bomba A' -> 'bomba_a' (valor del parametro ?bomba=)"""
+    return nombre.strip().lower().replace(' ', '_')
+
+
+class UltimosValores:
+    """Ultima lectura por canal y su vista por campo de cada bomba"""
+
+    def __init__(self, bombas):
+        # bomba -> {canal: campo}
+        self.bombas = {clave_bomba(nombre): dict(canal_to_campo) for nombre, canal_to_campo in bombas.items()}
+        self.canales = {canal for canal_to_campo in self.bombas.values() for canal in canal_to_campo}
+
+        self._lock = threading.Lock()
+        self._lecturas = {}    # canal -> (orden, tiempo_sensor, valor, id_sensor, recibido)
+        self._version = 0
+        self._respuestas = {}  # bomba (o None) -> (version, etag, cuerpo)
+        # Distingue las versiones de un proceso de las de un reinicio anterior
+        self._arranque = format(int(time.time()), 'x')
+
+        # Contadores
+        self.actualizaciones = 0
+        self.antiguas = 0
+        self.consultas = 0
+        self.no_modificadas = 0
+
+    def registrar(self, canal, payload):
+        """Guarda la lectura si es la mas reciente (por tiempo_sensor) del canal"""
+        if canal not in self.canales or not isinstance(payload, (dict, Registro)):
+            return
+        tiempo_sensor = payload.get('tiempo_sensor')
+        if not tiempo_sensor:
+            return
+        orden = clave_orden(tiempo_sensor)
+        with self._lock:
+            actual = self._lecturas.get(canal)
+            if actual is not None and orden < actual[0]:
+                self.antiguas += 1
+                return
+            self._lecturas[canal] = (orden, tiempo_sensor, payload.get('valor'), payload.get('id_sensor'),
+                                     time.time())
+            self._version += 1
+            self.actualizaciones += 1
+
+    def instantanea(self, bomba=None):
+        """Diccionario con los canales y los campos por bomba (de una sola bomba si se indica)"""
+        with self._lock:
+            lecturas = dict(self._lecturas)
+            version = self._version
+        bombas = self.bombas if bomba is None else {bomba: self.bombas[bomba]}
+
+        def lectura(canal):
+            _, tiempo_sensor, valor, id_sensor, recibido = lecturas[canal]
+            return {'canal': canal, 'valor': valor, 'tiempo_sensor': tiempo_sensor, 'id_sensor': id_sensor,
+                    'recibido': round(recibido, 3)}
+
+        canales = sorted({c for canal_to_campo in bombas.values() for c in canal_to_campo if c in lecturas})
+        return {
+            'version': version,
+            'generado': round(time.time(), 3),
+            'canales': {canal: lectura(canal) for canal in canales},
+            'bombas': {nombre: {campo: lectura(canal) for canal, campo in canal_to_campo.items() if canal in lecturas}
+                       for nombre, canal_to_campo in bombas.items()},
+        }
+
+    def _etag(self, version, bomba):
+        return f'"{self._arranque}-{version}-{bomba or "todas"}"'
+
+    def responder(self, ruta, etag_cliente=None):
+        """(status, encabezados, cuerpo) de GET /ultimos[?bomba=...] con soporte de If-None-Match"""
+        parametros = parse_qs(urlsplit(ruta).query)
+        bomba = parametros.get('bomba', [None])[0]
+        if bomba is not None:
+            bomba = clave_bomba(bomba)
+            if bomba not in self.bombas:
+                cuerpo = json.dumps({'error': f"Bomba desconocida '{bomba}'",
+                                     'bombas': sorted(self.bombas)}).encode()
+                return 404, {'Content-Type': 'application/json'}, cuerpo
+
+        with self._lock:
+            self.consultas += 1
+            version = self._version
+        etag = self._etag(version, bomba)
+        encabezados = {'ETag': etag, 'Cache-Control': 'no-cache'}
+        if etag_cliente and etag in [e.strip() for e in etag_cliente.split(',')]:
+            with self._lock:
+                self.no_modificadas += 1
+            return 304, encabezados, b''
+
+        # Una serializacion por version: las consultas siguientes reutilizan el cuerpo
+        guardada = self._respuestas.get(bomba)
+        if guardada is None or guardada[0] != version:
+            instantanea = self.instantanea(bomba)
+            # La instantanea puede incluir lecturas posteriores a la version leida arriba
+            version = instantanea['version']
+            guardada = (version, self._etag(version, bomba), json.dumps(instantanea).encode())
+            self._respuestas[bomba] = guardada
+        encabezados['ETag'] = guardada[1]
+        encabezados['Content-Type'] = 'application/json'
+        return 200, encabezados, guardada[2]
+
+    def estadisticas(self):
+        with self._lock:
+            return {
+                'canales': len(self._lecturas),
+                'version': self._version,
+                'actualizaciones': self.actualizaciones,
+                'lecturas_antiguas': self.antiguas,
+                'consultas': self.consultas,
+                'no_modificadas': self.no_modificadas,
+            }
@@ -0,0 +1,114 @@
+"""
+Caracteristicas de ventana movil de los campos de una bomba.
+
+Cada trama enviada a la prediccion unificada se agrega a un buffer circular
+de las ultimas N tramas (una fila por trama, una columna por campo
+requerido). Con cada trama nueva se calculan de una vez, para todos los
+campos, la media, la desviacion estandar (poblacional), el minimo, el maximo
+y la pendiente por segundo (minimos cuadrados sobre el tiempo_sensor de cada
+trama). Con NumPy (opcional) el buffer es un ndarray y el calculo es una sola
+pasada vectorizada; sin NumPy se usa una implementacion en Python puro con
+el mismo resultado.
+"""
+
+import math
+import threading
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+ESTADISTICAS = ('media', 'desv', 'min', 'max', 'pendiente')
+
+
+class VentanaMovil:
+    """Buffer circular de las ultimas `tamano` tramas de `campos` y sus estadisticas"""
+
+    def __init__(self, campos, tamano):
+        self.campos = list(campos)
+        self.tamano = int(tamano)
+        self.numpy = np is not None
+        self._lock = threading.Lock()
+        self._pos = 0
+        self.n = 0
+        if self.numpy:
+            self._valores = np.zeros((self.tamano, len(self.campos)))
+            self._tiempos = np.zeros(self.tamano)
+        else:
+            self._valores = [None] * self.tamano
+            self._tiempos = [0.0] * self.tamano
+        self._ultimas = None
+
+        # Contadores
+        self.tramas = 0
+
+    def agregar(self, tiempo, valores):
+        """
+        Agrega una trama (tiempo en segundos epoch y un array('d') con los valores
+        de los campos en su orden) y retorna las estadisticas de la ventana que la incluye.
+        """
+        with self._lock:
+            i = self._pos
+            self._tiempos[i] = tiempo
+            if self.numpy:
+                # Copia directa desde el arreglo de la trama, sin pasar por objetos float
+                self._valores[i] = np.frombuffer(valores, count=len(self.campos))
+            else:
+                self._valores[i] = list(valores[:len(self.campos)])
+            self._pos = (i + 1) % self.tamano
+            self.n = min(self.n + 1, self.tamano)
+            self.tramas += 1
+            estadisticas = self._calcular_numpy() if self.numpy else self._calcular_python()
+            self._ultimas = estadisticas
+            return estadisticas
+
+    def _calcular_numpy(self):
+        n = self.n
+        valores = self._valores[:n]
+        tiempos = self._tiempos[:n]
+        media = valores.mean(axis=0)
+        centrados = valores - media
+        desv = np.sqrt((centrados * centrados).mean(axis=0))
+        dt = tiempos - tiempos.mean()
+        denominador = float(dt @ dt)
+        pendiente = (dt @ centrados) / denominador if denominador > 0 else np.zeros(len(self.campos))
+        return self._como_dict(n, media.tolist(), desv.tolist(), valores.min(axis=0).tolist(),
+                               valores.max(axis=0).tolist(), pendiente.tolist())
+
+    def _calcular_python(self):
+        n = self.n
+        filas = self._valores[:n]
+        tiempos = self._tiempos[:n]
+        t_media = sum(tiempos) / n
+        dt = [t - t_media for t in tiempos]
+        denominador = sum(d * d for d in dt)
+        media, desv, minimo, maximo, pendiente = [], [], [], [], []
+        for columna in zip(*filas):
+            m = sum(columna) / n
+            media.append(m)
+            desv.append(math.sqrt(sum((v - m) ** 2 for v in columna) / n))
+            minimo.append(min(columna))
+            maximo.append(max(columna))
+            pendiente.append(sum(d * (v - m) for d, v in zip(dt, columna)) / denominador
+                             if denominador > 0 else 0.0)
+        return self._como_dict(n, media, desv, minimo, maximo, pendiente)
+
+    def _como_dict(self, n, *columnas):
+        resultado = {'n': n}
+        for nombre, valores in zip(ESTADISTICAS, columnas):
+            resultado[nombre] = dict(zip(self.campos, valores))
+        return resultado
+
+    def ultimas(self):
+        """Estadisticas de la ultima trama agregada (None si aun no hay)"""
+        with self._lock:
+            return self._ultimas
+
+    def estadisticas(self):
+        return {
+            'tamano': self.tamano,
+            'ocupadas': self.n,
+            'tramas': self.tramas,
+            'numpy': self.numpy,
+        }
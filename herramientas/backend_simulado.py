@@ -0,0 +1,176 @@
+"""
+Backend simulado para pruebas locales y benchmarks.
+
+Emula las rutas que usan los listeners:
+    POST /sensores/..., /sensores_b/...      endpoints individuales, /lote y predecir-bomba(-b)
+    POST /gm-bitacoras/clasificar[/lote]     clasificacion de bitacoras
+    POST /gm-bitacoras/guardar-clasificacion clasificaciones reutilizadas del cache
+    GET  /estadisticas                       peticiones y latencia por ruta
+
+Cada respuesta se demora segun una distribucion configurable por prefijo de ruta:
+    fija:S  uniforme:A,B  normal:MEDIA,DESV  lognormal:MEDIANA,SIGMA  exponencial:MEDIA
+
+Uso:
+    python herramientas/backend_simulado.py --puerto 9000 \\
+        --latencia /sensores=lognormal:0.03,0.5 --latencia /gm-bitacoras=normal:1.5,0.5
+    BASE_URL=http://localhost:9000 python BOMBA_A/listener.py
+"""
+
+import argparse
+import json
+import math
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+PREFIJOS = ('/sensores', '/sensores_b', '/gm-bitacoras')
+
+
+def distribucion(texto):
+    """Funcion sin argumentos que retorna una latencia en segundos, a partir de 'tipo:p1,p2'"""
+    tipo, _, parametros = texto.partition(':')
+    p = [float(x) for x in parametros.split(',') if x]
+    if tipo == 'fija':
+        return lambda: p[0]
+    if tipo == 'uniforme':
+        return lambda: random.uniform(p[0], p[1])
+    if tipo == 'normal':
+        return lambda: max(random.gauss(p[0], p[1]), 0.0)
+    if tipo == 'lognormal':
+        return lambda: random.lognormvariate(math.log(p[0]), p[1])
+    if tipo == 'exponencial':
+        return lambda: random.expovariate(1.0 / p[0])
+    raise ValueError(f"Distribucion desconocida '{texto}'")
+
+
+class BackendSimulado:
+    """Servidor HTTP con latencias simuladas; se puede usar desde otro script (benchmark)"""
+
+    def __init__(self, puerto=0, latencias=None, latencia_defecto='fija:0.02', errores=0.0, sin_lote=False):
+        self.latencias = sorted(((prefijo, distribucion(d)) for prefijo, d in (latencias or {}).items()),
+                                key=lambda x: -len(x[0]))
+        self.latencia_defecto = distribucion(latencia_defecto)
+        self.errores = errores
+        self.sin_lote = sin_lote
+
+        self._lock = threading.Lock()
+        self._rutas = {}   # ruta -> [peticiones, errores, latencia total]
+
+        backend = self
+
+        class Manejador(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'   # keep-alive, como el backend real
+
+            def do_POST(self):
+                largo = int(self.headers.get('Content-Length', 0))
+                datos = json.loads(self.rfile.read(largo) or b'null')
+                status, cuerpo = backend.atender(self.path, datos)
+                self._responder(status, cuerpo)
+
+            def do_GET(self):
+                if self.path == '/estadisticas':
+                    self._responder(200, backend.estadisticas())
+                else:
+                    self._responder(200, {'estado': 'ok'})
+
+            def _responder(self, status, cuerpo):
+                texto = json.dumps(cuerpo).encode()
+                self.send_response(status)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(texto)))
+                self.end_headers()
+                self.wfile.write(texto)
+
+            def log_message(self, format, *args):
+                return
+
+        self.servidor = ThreadingHTTPServer(('127.0.0.1', puerto), Manejador)
+        self.servidor.daemon_threads = True
+        self.url = f"http://127.0.0.1:{self.servidor.server_address[1]}"
+
+    def _latencia(self, ruta):
+        for prefijo, funcion in self.latencias:
+            if ruta.startswith(prefijo):
+                return funcion()
+        return self.latencia_defecto()
+
+    def atender(self, ruta, datos):
+        """(status, cuerpo) de un POST; duerme la latencia simulada de la ruta"""
+        latencia = self._latencia(ruta)
+        time.sleep(latencia)
+        status, cuerpo = self._respuesta(ruta, datos)
+        with self._lock:
+            contadores = self._rutas.setdefault(ruta, [0, 0, 0.0])
+            contadores[0] += 1
+            contadores[1] += status >= 400
+            contadores[2] += latencia
+        return status, cuerpo
+
+    def _respuesta(self, ruta, datos):
+        if not ruta.startswith(PREFIJOS):
+            return 404, {'error': 'ruta no encontrada'}
+        if ruta.endswith('/lote') and self.sin_lote:
+            return 404, {'error': 'ruta por lote no disponible'}
+        if self.errores and random.random() < self.errores:
+            return 503, {'error': 'error simulado'}
+
+        if ruta.endswith('/gm-bitacoras/clasificar/lote'):
+            return 200, {'resultados': [{'id': b.get('id'), 'tabla': b.get('tabla'), 'clasificacion': 'C',
+                                         'alerta_aviso': ''} for b in datos.get('bitacoras', [])]}
+        if ruta.endswith('/gm-bitacoras/clasificar'):
+            return 200, {'id': datos.get('id'), 'clasificacion': 'C', 'alerta_aviso': ''}
+        if ruta.endswith('/gm-bitacoras/guardar-clasificacion'):
+            return 200, {'guardada': True}
+        if ruta.endswith('/lote'):
+            return 200, {'recibidas': len(datos.get('lecturas', [])) if isinstance(datos, dict) else 0}
+        if 'predecir-bomba' in ruta:
+            return 200, {'prediccion': round(random.random(), 4), 'campos': len(datos or {})}
+        return 200, {'prediccion': (datos or {}).get('valor')}
+
+    def estadisticas(self):
+        with self._lock:
+            return {ruta: {'peticiones': n, 'errores': e, 'latencia_media': total / n if n else 0.0}
+                    for ruta, (n, e, total) in self._rutas.items()}
+
+    def iniciar(self):
+        hilo = threading.Thread(target=self.servidor.serve_forever, name='backend-simulado')
+        hilo.daemon = True
+        hilo.start()
+        return self
+
+    def detener(self):
+        self.servidor.shutdown()
+        self.servidor.server_close()
+
+
+def latencias_de(valores):
+    """['/prefijo=dist', ...] -> {prefijo: dist}"""
+    latencias = {}
+    for valor in valores or ():
+        prefijo, _, dist = valor.partition('=')
+        latencias[prefijo] = dist
+    return latencias
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--puerto', type=int, default=9000)
+    parser.add_argument('--latencia', action='append', metavar='PREFIJO=DIST',
+                        help='distribucion de latencia para las rutas con ese prefijo (repetible)')
+    parser.add_argument('--latencia-defecto', default='fija:0.02')
+    parser.add_argument('--errores', type=float, default=0.0, help='fraccion de respuestas 503')
+    parser.add_argument('--sin-lote', action='store_true', help='responder 404 en las rutas /lote')
+    args = parser.parse_args()
+
+    backend = BackendSimulado(args.puerto, latencias_de(args.latencia), args.latencia_defecto,
+                              args.errores, args.sin_lote)
+    print(f"Backend simulado escuchando en {backend.url}")
+    try:
+        backend.servidor.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == '__main__':
+    main()
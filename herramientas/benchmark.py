@@ -0,0 +1,360 @@
+"""
+Benchmark del listener sin base de datos ni backend reales.
+
+Cada escenario alimenta un MotorListener con una fuente finita (captura
+grabada con grabar_notificaciones.py o generador sintetico), reproducida a
+N veces su velocidad original (0 = tan rapido como se pueda), contra el
+backend simulado en un puerto local. Cada escenario corre en su propio
+proceso para que la memoria y las metricas no se mezclen, y reporta:
+
+    notif/s      notificaciones repartidas por segundo (lectura + procesar)
+    total s      duracion incluyendo los envios pendientes al backend
+    trama p50/95 tiempo entre el primer campo de cada trama y su envio a prediccion
+    POST         peticiones recibidas por el backend simulado
+    envio p95    duracion de los POST al backend simulado
+    RSS          memoria maxima del proceso (y pico de tracemalloc con --tracemalloc)
+
+Con --codec mide en cambio el codec de payloads (comun/codec.py) contra el
+camino anterior (json.loads a dict + get(), json.dumps de requests), con el
+backend JSON rapido si esta instalado y con el json estandar.
+
+Uso:
+    python herramientas/benchmark.py                                  # suite sintetica
+    python herramientas/benchmark.py --captura captura.jsonl --velocidades 1,10,0
+    python herramientas/benchmark.py --perfiles bomba_a --tramas 5000 --json resultados.json
+    python herramientas/benchmark.py --codec
+"""
+
+import argparse
+import json
+import os
+import resource
+import subprocess
+import sys
+import time
+import tracemalloc
+
+RAIZ_REPO = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if RAIZ_REPO not in sys.path:
+    sys.path.append(RAIZ_REPO)
+CARPETA = os.path.dirname(os.path.abspath(__file__))
+if CARPETA not in sys.path:
+    sys.path.append(CARPETA)
+
+from backend_simulado import BackendSimulado, latencias_de
+
+# Latencias del backend simulado por defecto (segundos)
+LATENCIAS_DEFECTO = ['/sensores=lognormal:0.02,0.5', '/gm-bitacoras=lognormal:0.5,0.4']
+
+# Suite por defecto: (nombre, parametros del escenario)
+SUITE_SINTETICA = [
+    ('bomba_a max', {'perfiles': ['bomba_a'], 'tramas': 2000, 'velocidad': 0}),
+    ('bomba_a max json', {'perfiles': ['bomba_a'], 'tramas': 2000, 'velocidad': 0,
+                          'entorno': {'CODEC_JSON': 'json'}}),
+    ('bomba_a+b max', {'perfiles': ['bomba_a', 'bomba_b'], 'tramas': 2000, 'velocidad': 0}),
+    ('bomba_a desorden', {'perfiles': ['bomba_a'], 'tramas': 2000, 'velocidad': 0, 'desorden': 0.5,
+                          'perdida': 0.01}),
+    ('bomba_a 20x', {'perfiles': ['bomba_a'], 'tramas': 200, 'velocidad': 20}),
+    ('bomba_a 20x plazo', {'perfiles': ['bomba_a'], 'tramas': 200, 'velocidad': 20, 'perdida': 0.02,
+                           'entorno': {'TRAMA_PLAZO': '0.5', 'TRAMA_MAX_PENDIENTES': '50'}}),
+    ('bomba_a desfase', {'perfiles': ['bomba_a'], 'tramas': 2000, 'velocidad': 0, 'desfase': 0.2}),
+    ('bomba_a desfase cubetas', {'perfiles': ['bomba_a'], 'tramas': 2000, 'velocidad': 0, 'desfase': 0.2,
+                                 'entorno': {'TRAMA_RESOLUCION': '1'}}),
+    ('bomba_a 10x presupuesto', {'perfiles': ['bomba_a'], 'tramas': 200, 'velocidad': 10,
+                                 'entorno': {'DESPACHO_TASA_MAX': '15'}}),
+    ('bomba_a duplicados', {'perfiles': ['bomba_a'], 'tramas': 2000, 'velocidad': 0, 'duplicados': 0.2,
+                            'desorden': 0.5}),
+    ('bomba_a duplicados sin coalescer', {'perfiles': ['bomba_a'], 'tramas': 2000, 'velocidad': 0,
+                                          'duplicados': 0.2, 'desorden': 0.5,
+                                          'entorno': {'DRENAJE_COALESCER': '0'}}),
+    ('bitacoras max', {'perfiles': ['bitacoras'], 'tramas': 100, 'velocidad': 0}),
+]
+
+
+def _preparar_entorno(backend_url):
+    """Variables para importar los listeners contra el backend simulado y sin base de datos"""
+    os.environ['BASE_URL'] = backend_url
+    os.environ['BASE_URL_B'] = backend_url
+    os.environ['OUTBOX_HABILITADO'] = '0'
+    os.environ['RELLENO_HABILITADO'] = '0'
+    os.environ['MODO_EJECUCION'] = 'hilos'
+    for var, valor in (('DB_NAME', 'benchmark'), ('DB_USER', 'benchmark'), ('DB_PASSWORD', 'benchmark'),
+                       ('DB_HOST', 'localhost'), ('DB_PORT', '5432'), ('LOG_NIVEL', 'WARNING')):
+        os.environ.setdefault(var, valor)
+
+
+def _esperar_vaciado(motor, perfiles, timeout):
+    """
+    Espera a que los despachadores y el ejecutor de bitacoras terminen sus envios,
+    con las revisiones periodicas del motor (reintentos de tramas) como en un listener
+    """
+    limite = time.monotonic() + timeout
+    while time.monotonic() < limite:
+        if motor.intervalo_revision is not None:
+            motor.revisar()
+        ocupados = 0
+        for perfil in perfiles.values():
+            # Lotes en espera, incluidos los que no entraron a la cola llena
+            if perfil.agrupador is not None:
+                perfil.agrupador.vaciar(forzar=True)
+                ocupados += perfil.agrupador.estadisticas()['lecturas_en_espera']
+            if perfil.despachador is not None:
+                ocupados += perfil.despachador.profundidad()
+            if perfil.ejecutor is not None:
+                ocupados += perfil.ejecutor.profundidad() + perfil.ejecutor.en_curso
+            tramas = getattr(perfil.consumidor, 'tramas', None)
+            if tramas is not None:
+                ocupados += len(tramas.aplazadas())
+        if not ocupados:
+            return True
+        time.sleep(0.05)
+    return False
+
+
+def ejecutar_escenario(params):
+    """Corre un escenario en este proceso y retorna sus resultados"""
+    backend = BackendSimulado(latencias=latencias_de(params.get('latencias', LATENCIAS_DEFECTO)),
+                              sin_lote=params.get('sin_lote', False)).iniciar()
+    _preparar_entorno(backend.url)
+    os.environ.update(params.get('entorno', {}))
+
+    from comun import logs
+    from comun.bomba import LATENCIA_TRAMA
+    from comun.fuentes import FuenteGrabacion, FuenteSintetica
+    from comun.http_cliente import LATENCIA_BACKEND
+    from comun.motor import MotorListener
+    from comun.perfiles import cargar_perfiles
+
+    logs.configurar()
+    if params.get('tracemalloc'):
+        tracemalloc.start()
+
+    perfiles = cargar_perfiles(params['perfiles'])
+    if params.get('captura'):
+        fuente = FuenteGrabacion(params['captura'], params['velocidad'])
+    else:
+        fuente = FuenteSintetica(tramas=params.get('tramas', 1000), periodo=params.get('periodo', 1.0),
+                                 velocidad=params['velocidad'], desorden=params.get('desorden', 0.0),
+                                 perdida=params.get('perdida', 0.0), desfase=params.get('desfase', 0.0),
+                                 duplicados=params.get('duplicados', 0.0))
+    motor = MotorListener('benchmark', {}, [p.consumidor for p in perfiles.values()],
+                          intervalo_heartbeat=1, fuente=fuente)
+
+    inicio = time.perf_counter()
+    motor.ejecutar()
+    duracion = time.perf_counter() - inicio
+    vaciado = _esperar_vaciado(motor, perfiles, params.get('timeout_vaciado', 120))
+    duracion_total = time.perf_counter() - inicio
+
+    notificaciones = sum(motor.notificaciones.values())
+    resultado = {
+        'notificaciones': notificaciones,
+        'duracion': duracion,
+        'duracion_con_envios': duracion_total,
+        'vaciado_completo': vaciado,
+        'notificaciones_por_segundo': notificaciones / duracion if duracion else 0.0,
+        'errores_consumidor': motor.errores_consumidor,
+        'trama': LATENCIA_TRAMA.resumen(),
+        'envio': LATENCIA_BACKEND.resumen(),
+        'tramas_pendientes': sum(len(p.consumidor.tramas) for p in perfiles.values()
+                                 if hasattr(p.consumidor, 'tramas')),
+        'backend': backend.estadisticas(),
+        'rss_max_mb': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+    }
+    if params.get('tracemalloc'):
+        resultado['tracemalloc_pico_mb'] = tracemalloc.get_traced_memory()[1] / 2 ** 20
+    backend.detener()
+    return resultado
+
+
+def _mejor_ns(funcion, entradas, repeticiones=3):
+    """Nanosegundos por entrada de la mejor de `repeticiones` pasadas"""
+    mejor = None
+    for _ in range(repeticiones):
+        inicio = time.perf_counter_ns()
+        funcion(entradas)
+        transcurrido = time.perf_counter_ns() - inicio
+        mejor = transcurrido if mejor is None else min(mejor, transcurrido)
+    return mejor / len(entradas)
+
+
+def medir_codec(params):
+    """Microbenchmark del codec contra el camino anterior; ns por payload de cada caso"""
+    os.environ.update(params.get('entorno', {}))
+    from comun import codec
+    from comun.fuentes import FuenteSintetica
+
+    n = params.get('payloads', 20000)
+    canales = [f"canal_sensor_{i}" for i in range(20)] + ['canal_bitacora_a']
+    lecturas, bitacoras = [], []
+    for _, canal, texto in FuenteSintetica(tramas=n // len(canales) + 1, velocidad=0).eventos(canales):
+        (bitacoras if 'bitacora' in canal else lecturas).append(texto)
+    invalidos = ['null', '[1, 2]', '{"valor": 1.5}', '{"tiempo_sensor": 5}', 'no es json'] * (n // 5)
+    trama = {f"campo_{i}": 12.345 + i for i in range(20)}
+    trama['tiempo_sensor'] = '2024-01-01T00:00:00'
+    tramas = [trama] * (n // 10)
+    posts = [{'id_sensor': i % 20 + 1, 'valor': 12.5 + i} for i in range(n)]
+    lotes = [{'lecturas': posts[i:i + 8]} for i in range(0, n, 8)]
+
+    # Camino anterior: json.loads a dict y get() por campo como en procesar/_enviar_individual
+    def antes_lecturas(textos):
+        for texto in textos:
+            payload = json.loads(texto)
+            payload.get('tiempo_sensor'), payload.get('valor'), payload.get('id_sensor')
+
+    def codec_lecturas(textos):
+        decodificar = codec.LECTURA.decodificar
+        for texto in textos:
+            payload = decodificar(texto)
+            payload.tiempo_sensor, payload.valor, payload.id_sensor
+
+    def antes_bitacoras(textos):
+        for texto in textos:
+            payload = json.loads(texto)
+            payload.get('id'), payload.get('bitacora')
+
+    def codec_bitacoras(textos):
+        decodificar = codec.BITACORA.decodificar
+        for texto in textos:
+            payload = decodificar(texto)
+            payload.id, payload.bitacora
+
+    def antes_invalidos(textos):
+        for texto in textos:
+            try:
+                payload = json.loads(texto)
+                payload.get('tiempo_sensor')
+            except (ValueError, AttributeError):
+                pass
+
+    def codec_invalidos(textos):
+        decodificar = codec.LECTURA.decodificar
+        for texto in textos:
+            try:
+                decodificar(texto)
+            except codec.PayloadInvalido:
+                pass
+
+    # Salida: requests y aiohttp serializan json= con json.dumps
+    def antes_cuerpos(cuerpos):
+        for cuerpo in cuerpos:
+            json.dumps(cuerpo).encode()
+
+    def codec_cuerpos(cuerpos):
+        codificar = codec.codificar
+        for cuerpo in cuerpos:
+            codificar(cuerpo)
+
+    casos = [
+        ('lectura', antes_lecturas, codec_lecturas, lecturas),
+        ('bitacora', antes_bitacoras, codec_bitacoras, bitacoras),
+        ('invalido', antes_invalidos, codec_invalidos, invalidos),
+        ('trama unificada', antes_cuerpos, codec_cuerpos, tramas),
+        ('post por sensor', antes_cuerpos, codec_cuerpos, posts),
+        ('lote de 8', antes_cuerpos, codec_cuerpos, lotes),
+    ]
+    return {
+        'backend': codec.BACKEND,
+        'casos': {nombre: {'antes_ns': _mejor_ns(antes, entradas), 'codec_ns': _mejor_ns(nuevo, entradas)}
+                  for nombre, antes, nuevo, entradas in casos},
+    }
+
+
+def imprimir_codec(resultados):
+    columnas = ('caso', 'backend', 'antes ns', 'codec ns', 'mejora')
+    filas = []
+    for r in resultados:
+        for caso, m in r['casos'].items():
+            filas.append((caso, r['backend'], f"{m['antes_ns']:.0f}", f"{m['codec_ns']:.0f}",
+                          f"{m['antes_ns'] / m['codec_ns']:.2f}x"))
+    anchos = [max(len(str(f[i])) for f in filas + [columnas]) for i in range(len(columnas))]
+    for fila in [columnas] + filas:
+        print('  '.join(str(v).rjust(a) for v, a in zip(fila, anchos)))
+
+
+def correr_en_proceso(params):
+    """Ejecuta el escenario en un proceso nuevo y retorna sus resultados"""
+    salida = subprocess.run([sys.executable, os.path.abspath(__file__), '--escenario', json.dumps(params)],
+                            capture_output=True, text=True)
+    if salida.returncode != 0:
+        raise RuntimeError(f"El escenario fallo:\n{salida.stderr[-2000:]}")
+    return json.loads(salida.stdout.strip().splitlines()[-1])
+
+
+def imprimir_tabla(resultados):
+    columnas = ('escenario', 'notif', 'dur s', 'total s', 'notif/s', 'tramas', 'trama p50', 'trama p95',
+                'POST', 'envio p95', 'RSS MB')
+    filas = []
+    for nombre, r in resultados:
+        filas.append((nombre, r['notificaciones'], f"{r['duracion']:.2f}", f"{r['duracion_con_envios']:.2f}",
+                      f"{r['notificaciones_por_segundo']:.0f}",
+                      r['trama']['n'], f"{r['trama']['p50'] * 1000:.1f}ms", f"{r['trama']['p95'] * 1000:.1f}ms",
+                      sum(ruta['peticiones'] for ruta in r['backend'].values()),
+                      f"{r['envio']['p95'] * 1000:.1f}ms", f"{r['rss_max_mb']:.1f}"))
+    anchos = [max(len(str(f[i])) for f in filas + [columnas]) for i in range(len(columnas))]
+    for fila in [columnas] + filas:
+        print('  '.join(str(v).rjust(a) for v, a in zip(fila, anchos)))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--captura', help='captura JSON lines (si no, suite sintetica)')
+    parser.add_argument('--velocidades', default='1,10,0', help='velocidades de reproduccion de la captura')
+    parser.add_argument('--perfiles', help='perfiles a cargar (por defecto los de cada escenario, o todos)')
+    parser.add_argument('--tramas', type=int, help='tramas sinteticas por escenario')
+    parser.add_argument('--latencia', action='append', metavar='PREFIJO=DIST',
+                        help='latencia del backend simulado (ver backend_simulado.py)')
+    parser.add_argument('--sin-lote', action='store_true', help='el backend simulado no expone rutas /lote')
+    parser.add_argument('--tracemalloc', action='store_true', help='medir el pico de memoria de Python')
+    parser.add_argument('--json', help='guardar los resultados en este archivo')
+    parser.add_argument('--codec', action='store_true', help='medir el codec de payloads en vez del listener')
+    parser.add_argument('--escenario', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.escenario:
+        params = json.loads(args.escenario)
+        print(json.dumps(medir_codec(params) if params.get('codec') else ejecutar_escenario(params)))
+        return
+
+    if args.codec:
+        # Cada backend en su propio proceso: se elige al importar comun.codec
+        resultados = [correr_en_proceso({'codec': True}),
+                      correr_en_proceso({'codec': True, 'entorno': {'CODEC_JSON': 'json'}})]
+        imprimir_codec(resultados)
+        if args.json:
+            with open(args.json, 'w', encoding='utf-8') as archivo:
+                json.dump(resultados, archivo, indent=2)
+        return
+
+    comunes = {'tracemalloc': args.tracemalloc, 'sin_lote': args.sin_lote}
+    if args.latencia:
+        comunes['latencias'] = args.latencia
+    perfiles = [p.strip() for p in args.perfiles.split(',')] if args.perfiles else None
+
+    if args.captura:
+        escenarios = [(f"captura {v}x" if float(v) else "captura max",
+                       {'captura': os.path.abspath(args.captura), 'velocidad': float(v),
+                        'perfiles': perfiles or ['bomba_a', 'bomba_b', 'bitacoras']})
+                      for v in args.velocidades.split(',')]
+    else:
+        escenarios = []
+        for nombre, params in SUITE_SINTETICA:
+            params = dict(params)
+            if perfiles:
+                params['perfiles'] = perfiles
+            if args.tramas:
+                params['tramas'] = args.tramas
+            escenarios.append((nombre, params))
+
+    resultados = []
+    for nombre, params in escenarios:
+        print(f"Ejecutando '{nombre}'...", file=sys.stderr)
+        resultados.append((nombre, correr_en_proceso({**comunes, **params})))
+    imprimir_tabla(resultados)
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as archivo:
+            json.dump(dict(resultados), archivo, indent=2)
+
+
+if __name__ == '__main__':
+    main()
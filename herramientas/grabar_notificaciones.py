@@ -0,0 +1,102 @@
+"""
+Graba el trafico NOTIFY real de los canales de los listeners en una captura
+JSON lines, para reproducirla despues con FuenteGrabacion (benchmark.py).
+
+Uso:
+    python herramientas/grabar_notificaciones.py captura.jsonl --duracion 600
+    python herramientas/grabar_notificaciones.py captura.jsonl --perfiles bomba_a
+
+Los canales son los CANALES de los listeners de cada perfil. Usa las mismas
+variables DB_* (y DB_SSLMODE / DB_SSLROOTCERT) que los listeners.
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+
+from dotenv import load_dotenv
+
+RAIZ_REPO = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if RAIZ_REPO not in sys.path:
+    sys.path.append(RAIZ_REPO)
+
+from comun import logs
+from comun.fuentes import FuentePostgres
+from comun.perfiles import MODULOS_PERFIL, modulo_perfil
+
+load_dotenv()
+# Sin relleno: solo se graba lo que llega por NOTIFY
+os.environ['RELLENO_HABILITADO'] = '0'
+logs.configurar()
+log = logs.obtener('grabador')
+
+
+def db_config():
+    config = {
+        'dbname': os.environ.get('DB_NAME'),
+        'user': os.environ.get('DB_USER'),
+        'password': os.environ.get('DB_PASSWORD'),
+        'host': os.environ.get('DB_HOST'),
+        'port': int(os.environ.get('DB_PORT', '5432'))
+    }
+    if os.environ.get('DB_SSLMODE'):
+        config['sslmode'] = os.environ['DB_SSLMODE']
+        if os.environ.get('DB_SSLROOTCERT'):
+            config['sslrootcert'] = os.environ['DB_SSLROOTCERT']
+    return config
+
+
+def canales_de(perfiles):
+    canales = []
+    # Solo las constantes de cada perfil: no se crean despachadores, outbox ni clientes HTTP
+    for perfil in perfiles:
+        for canal in modulo_perfil(perfil).CANALES:
+            if canal not in canales:
+                canales.append(canal)
+    return canales
+
+
+def grabar(salida, canales, duracion=None, maximo=None):
+    """Escribe cada notificacion como {"t", "canal", "payload"} hasta agotar duracion o maximo"""
+    fuente = FuentePostgres(db_config())
+    fuente.conectar(canales)
+    log.info("Grabando %d canales en %s", len(canales), salida)
+
+    inicio = time.monotonic()
+    grabadas = 0
+    try:
+        with open(salida, 'w', encoding='utf-8') as archivo:
+            while duracion is None or time.monotonic() - inicio < duracion:
+                if not fuente.esperar(1.0):
+                    continue
+                for canal, payload in fuente.leer():
+                    t = round(time.monotonic() - inicio, 6)
+                    archivo.write(json.dumps({'t': t, 'canal': canal, 'payload': payload}) + '\n')
+                    grabadas += 1
+                if maximo and grabadas >= maximo:
+                    break
+    except KeyboardInterrupt:
+        pass
+    finally:
+        fuente.cerrar()
+    log.info("%d notificaciones grabadas en %.1fs", grabadas, time.monotonic() - inicio)
+    return grabadas
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('salida', help='archivo de captura (JSON lines)')
+    parser.add_argument('--perfiles', default=','.join(MODULOS_PERFIL),
+                        help='perfiles cuyos canales se graban (por defecto todos)')
+    parser.add_argument('--duracion', type=float, help='segundos a grabar (por defecto hasta Ctrl+C)')
+    parser.add_argument('--maximo', type=int, help='detenerse tras este numero de notificaciones')
+    args = parser.parse_args()
+
+    perfiles = [p.strip() for p in args.perfiles.split(',') if p.strip()]
+    grabar(args.salida, canales_de(perfiles), args.duracion, args.maximo)
+
+
+if __name__ == '__main__':
+    main()
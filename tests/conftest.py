@@ -0,0 +1,7 @@
+import os
+import sys
+
+# Los modulos se importan como en los listeners: `from comun import ...` desde la raiz del repo
+RAIZ_REPO = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if RAIZ_REPO not in sys.path:
+    sys.path.insert(0, RAIZ_REPO)
@@ -0,0 +1,82 @@
+"""Pruebas del modo asyncio (comun/asincrono.py)"""
+
+import asyncio
+import time
+
+import pytest
+
+pytest.importorskip('psycopg2')
+
+from comun import asincrono  # noqa: E402
+from comun.fuentes import ConexionPerdida  # noqa: E402
+
+
+class FuenteLenta:
+    """Fuente sin socket cuyo heartbeat tarda y luego falla, como una conexion medio caida"""
+
+    cur = None
+    agotada = False
+
+    def __init__(self, demora):
+        self.demora = demora
+
+    def esperar(self, espera):
+        return False
+
+    def latido(self):
+        time.sleep(self.demora)
+        raise ConexionPerdida('sin respuesta')
+
+    def cerrar(self):
+        pass
+
+
+class MotorFalso:
+    nombre = 'prueba'
+    consumidores = []
+    replicas = None
+    relleno = None
+    intervalo_heartbeat = 0
+    max_reconexiones = 1
+
+    def __init__(self, fuente):
+        self.fuente = fuente
+        self.conexiones = 0
+
+    def conectar(self):
+        self.conexiones += 1
+        return self.conexiones == 1
+
+    def espera(self):
+        return 0.01
+
+    def tiempo_espera(self, intentos):
+        return 0
+
+    def limite_alcanzado(self, intentos, reconexiones):
+        return True
+
+    def revisar(self, coordinar=True):
+        pass
+
+    def cerrar(self):
+        pass
+
+
+def test_heartbeat_no_congela_el_loop():
+    async def escenario():
+        vueltas = 0
+
+        async def latir():
+            nonlocal vueltas
+            while True:
+                vueltas += 1
+                await asyncio.sleep(0.01)
+
+        tarea = asyncio.create_task(latir())
+        await asincrono.escuchar(MotorFalso(FuenteLenta(0.3)))
+        tarea.cancel()
+        return vueltas
+
+    # Con el SELECT 1 en el loop las vueltas se detendrian durante los 0.3 s del heartbeat
+    assert asyncio.run(escenario()) >= 10
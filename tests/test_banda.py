@@ -0,0 +1,52 @@
+"""Pruebas de la banda muerta de las lecturas individuales (comun/banda.py)"""
+
+from comun.banda import BandaMuerta
+
+
+def tiempo(i):
+    return f"2024-01-01T00:{i // 60:02d}:{i % 60:02d}"
+
+
+def test_banda_absoluta_compara_con_el_ultimo_enviado():
+    banda = BandaMuerta(['c'], absoluta=0.5, silencio_max=0)
+    assert [banda.admitir('c', v, tiempo(i)) for i, v in enumerate([10.0, 10.3, 10.6, 10.9, 11.2])] == \
+        [True, False, True, False, True]
+    estadisticas = banda.estadisticas()
+    assert estadisticas['enviadas'] == 3 and estadisticas['suprimidas'] == 2
+    assert estadisticas['fraccion_suprimida'] == 2 / 5
+
+
+def test_banda_relativa_escala_con_el_valor():
+    banda = BandaMuerta(['c'], relativa=0.01, silencio_max=0)
+    assert banda.admitir('c', 1000, tiempo(0))
+    assert not banda.admitir('c', 1009, tiempo(1))
+    assert banda.admitir('c', 1011, tiempo(2))
+
+
+def test_silencio_envia_aunque_el_valor_no_cambie():
+    banda = BandaMuerta(['c'], absoluta=1.0, silencio_max=30)
+    enviadas = [i for i in range(0, 100, 5) if banda.admitir('c', 5.0, tiempo(i))]
+    # Segundos de tiempo_sensor desde el ultimo envio, no desde la ultima lectura
+    assert enviadas == [0, 30, 60, 90]
+    assert banda.estadisticas()['enviadas_por_silencio'] == 3
+
+
+def test_sin_bandas_solo_se_omiten_los_repetidos():
+    banda = BandaMuerta(['c'], silencio_max=0)
+    assert [banda.admitir('c', v, tiempo(i)) for i, v in enumerate([1, 1, 1.0, 1.0001])] == \
+        [True, False, False, True]
+
+
+def test_valores_no_numericos_se_envian_si_cambian():
+    banda = BandaMuerta(['c'], absoluta=100, silencio_max=0)
+    assert [banda.admitir('c', v, tiempo(i)) for i, v in enumerate(['ON', 'ON', 'OFF', None, None, 3])] == \
+        [True, False, True, True, False, True]
+
+
+def test_bandas_por_canal_y_canales_sin_banda():
+    banda = BandaMuerta(['c1', 'c2'], absoluta=1.0, silencio_max=0, por_canal={'c2': {'absoluta': 0}})
+    assert banda.admitir('c1', 1.0, tiempo(0)) and not banda.admitir('c1', 1.5, tiempo(1))
+    assert banda.admitir('c2', 1.0, tiempo(0)) and banda.admitir('c2', 1.5, tiempo(1))
+    # Un canal sin endpoint individual no tiene banda: siempre se admite
+    assert banda.admitir('otro', 1.0, tiempo(0)) and banda.admitir('otro', 1.0, tiempo(0))
+    assert banda.estadisticas()['canales']['c2']['absoluta'] == 0.0
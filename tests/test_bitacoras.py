@@ -0,0 +1,82 @@
+"""Pruebas del clasificador de bitacoras (bitacoras/perfil_bitacoras.py)"""
+
+import threading
+
+import pytest
+
+pytest.importorskip('requests')
+
+from comun.perfiles import modulo_perfil  # noqa: E402
+
+perfil_bitacoras = modulo_perfil('bitacoras')
+
+
+class Respuesta:
+    def __init__(self, status_code, cuerpo=None):
+        self.status_code = status_code
+        self.cuerpo = cuerpo or {}
+        self.text = ''
+
+    def json(self):
+        return self.cuerpo
+
+
+class ClienteFalso:
+    """Backend sin ruta por lote: clasifica una a una"""
+
+    def __init__(self, lote=False):
+        self.lote = lote
+        self.urls = []
+        self._lock = threading.Lock()
+
+    def post(self, url, data, timeout):
+        with self._lock:
+            self.urls.append(url)
+        if url.endswith('/lote'):
+            if not self.lote:
+                return Respuesta(404)
+            return Respuesta(200, {'resultados': [{'id': b['id'], 'tabla': b['tabla'], 'clasificacion': 'ok'}
+                                                  for b in data['bitacoras'][:-1]]})
+        return Respuesta(200, {'clasificacion': 'ok'})
+
+
+def clasificador(cliente):
+    return perfil_bitacoras.ClasificadorBitacoras('http://backend', cliente, 1)
+
+
+def test_sin_ruta_por_lote_se_envia_una_a_una_y_no_se_reintenta():
+    cliente = ClienteFalso()
+    c = clasificador(cliente)
+    c.clasificar_lote([(1, 'x', 'a'), (2, 'y', 'b')])
+    c.clasificar_lote([(3, 'z', 'a'), (4, 'w', 'a')])
+    # Solo el primer lote se intenta; el 404 desactiva la ruta durante reintento_lote
+    assert sum(url.endswith('/lote') for url in cliente.urls) == 1
+    estadisticas = c.estadisticas()
+    assert estadisticas['peticiones_lote'] == 1
+    assert estadisticas['peticiones_individuales'] == 4
+    assert estadisticas['clasificadas'] == 4
+    assert estadisticas['ruta_lote'] is False
+
+
+def test_lote_incompleto_envia_las_faltantes_una_a_una():
+    cliente = ClienteFalso(lote=True)
+    c = clasificador(cliente)
+    c.clasificar_lote([(1, 'x', 'a'), (2, 'y', 'b'), (3, 'z', 'a')])
+    estadisticas = c.estadisticas()
+    assert estadisticas['clasificadas'] == 3
+    assert estadisticas['peticiones_lote'] == 1
+    assert estadisticas['peticiones_individuales'] == 1
+    assert estadisticas['ruta_lote'] is True
+
+
+def test_contadores_con_trabajadores_concurrentes():
+    c = clasificador(ClienteFalso())
+    hilos = [threading.Thread(target=lambda: [c.clasificar_bitacora(i, 't', 'a') for i in range(200)])
+             for _ in range(8)]
+    for hilo in hilos:
+        hilo.start()
+    for hilo in hilos:
+        hilo.join()
+    estadisticas = c.estadisticas()
+    assert estadisticas['clasificadas'] == estadisticas['peticiones_individuales'] == 1600
+    assert estadisticas['errores'] == 0
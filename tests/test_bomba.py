@@ -0,0 +1,160 @@
+"""Pruebas del agregador de lecturas de una bomba (comun/bomba.py)"""
+
+import pytest
+
+pytest.importorskip('requests')
+
+from comun.bomba import AgregadorBomba  # noqa: E402
+from comun.codec import Lectura  # noqa: E402
+
+CANAL_TO_CAMPO = {'c1': 'a', 'c2': 'b'}
+
+
+class DespachadorFalso:
+    asincrono = False
+
+    def __init__(self):
+        self.llena = False
+        self.predicciones = []
+
+    def enviar(self, clave, funcion, tiempo_sensor, datos, id_fila):
+        if self.llena:
+            return False
+        self.predicciones.append((tiempo_sensor, datos))
+        return True
+
+
+class AgrupadorFalso:
+    def __init__(self):
+        self.lecturas = []
+
+    def agregar(self, endpoint, data, tiempo_sensor):
+        self.lecturas.append((endpoint, data['valor']))
+
+
+def agregador(**kwargs):
+    return AgregadorBomba('Bomba Prueba', CANAL_TO_CAMPO, {'c1': '/e1', 'c2': '/e2'}, ['a', 'b'],
+                          'http://backend', 'http://backend/prediccion', cliente=None,
+                          despachador=DespachadorFalso(), agrupador=AgrupadorFalso(), **kwargs)
+
+
+def tiempo(i):
+    return f"2024-01-01T00:{i // 60:02d}:{i % 60:02d}"
+
+
+def vencer(bomba, plazo):
+    """Simula que las tramas abiertas llevan mas de plazo segundos esperando"""
+    for trama in bomba.tramas.vencidas(0, ahora=float('inf')):
+        trama.creada -= plazo + 1
+
+
+def test_trama_vencida_se_envia_con_el_ultimo_valor_conocido():
+    bomba = agregador(plazo_trama=5, antiguedad_maxima=30)
+    bomba.procesar('c1', Lectura(tiempo(0), 1.0, 1))
+    bomba.procesar('c2', Lectura(tiempo(0), 7.0, 2))
+    bomba.procesar('c1', Lectura(tiempo(10), 3.0, 1))
+    bomba.revisar()
+    assert len(bomba.despachador.predicciones) == 1
+
+    vencer(bomba, 5)
+    bomba.revisar()
+    tiempo_sensor, datos = bomba.despachador.predicciones[-1]
+    assert tiempo_sensor == tiempo(10)
+    assert datos == {'a': 3.0, 'b': 7.0, 'campos_imputados': ['b']}
+    assert bomba.estadisticas_tramas()['imputadas'] == 1
+
+
+def test_trama_vencida_sin_valor_reciente_se_descarta():
+    bomba = agregador(plazo_trama=5, antiguedad_maxima=30)
+    bomba.procesar('c1', Lectura(tiempo(0), 1.0, 1))
+    bomba.procesar('c2', Lectura(tiempo(0), 7.0, 2))
+    bomba.procesar('c1', Lectura(tiempo(100), 3.0, 1))
+    vencer(bomba, 5)
+    bomba.revisar()
+    assert len(bomba.despachador.predicciones) == 1
+    assert bomba.estadisticas_tramas()['vencidas_descartadas'] == 1
+    assert len(bomba.tramas) == 0
+
+
+def test_lectura_tardia_no_reabre_la_trama_imputada():
+    bomba = agregador(plazo_trama=5, antiguedad_maxima=30)
+    bomba.procesar('c1', Lectura(tiempo(0), 1.0, 1))
+    bomba.procesar('c2', Lectura(tiempo(0), 7.0, 2))
+    bomba.procesar('c1', Lectura(tiempo(5), 3.0, 1))
+    vencer(bomba, 5)
+    bomba.revisar()
+    assert [t for t, _ in bomba.despachador.predicciones] == [tiempo(0), tiempo(5)]
+    bomba.procesar('c2', Lectura(tiempo(5), 8.0, 2))
+    assert len(bomba.tramas) == 0 and len(bomba.despachador.predicciones) == 2
+    # La lectura tardia igual llega a su endpoint individual
+    assert bomba.agrupador.lecturas[-1] == ('/e2', 8.0)
+    assert bomba.estadisticas_tramas()['lecturas_tardias'] == 1
+
+
+def test_sin_plazo_las_incompletas_esperan_todos_los_campos():
+    bomba = agregador()
+    bomba.procesar('c1', Lectura(tiempo(0), 1.0, 1))
+    vencer(bomba, 3600)
+    bomba.revisar()
+    assert bomba.despachador.predicciones == [] and len(bomba.tramas) == 1
+
+
+def test_lecturas_con_desfase_completan_la_misma_trama_con_resolucion():
+    bomba = agregador(resolucion=1.0)
+    bomba.procesar('c1', Lectura('2024-01-01T00:00:00.150+00:00', 1.0, 1))
+    bomba.procesar('c2', Lectura('2024-01-01 00:00:59.9+00:00', 9.0, 2))
+    bomba.procesar('c2', Lectura('2023-12-31T23:59:59.820+00:00', 2.0, 2))
+    assert bomba.despachador.predicciones == [('2024-01-01T00:00:00+00:00', {'a': 1.0, 'b': 2.0})]
+    # Cada lectura individual conserva su propio tiempo: el agrupador recibe las tres
+    assert len(bomba.agrupador.lecturas) == 3
+
+
+def test_sin_resolucion_la_clave_es_el_texto_exacto():
+    bomba = agregador()
+    bomba.procesar('c1', Lectura('2024-01-01T00:00:00.150', 1.0, 1))
+    bomba.procesar('c2', Lectura('2024-01-01T00:00:00.100', 2.0, 2))
+    assert bomba.despachador.predicciones == [] and len(bomba.tramas) == 2
+
+
+def test_ventana_se_calcula_una_vez_aunque_se_reintente_el_envio():
+    bomba = agregador(tamano_ventana=5)
+    bomba.despachador.llena = True
+    bomba.procesar('c1', Lectura(tiempo(0), 1.0, 1))
+    bomba.procesar('c2', Lectura(tiempo(0), 2.0, 2))
+    bomba.revisar()
+    assert bomba.ventana.tramas == 1
+    bomba.despachador.llena = False
+    bomba.revisar()
+    (_, datos), = bomba.despachador.predicciones
+    assert datos['ventana']['n'] == 1 and datos['ventana']['media'] == {'a': 1.0, 'b': 2.0}
+    assert bomba.ventana.tramas == 1
+    assert bomba.caracteristicas()['tiempo_sensor'] == tiempo(0)
+
+
+def test_compuerta_omite_tramas_sin_cambios_y_no_reevalua_los_reintentos(monkeypatch):
+    monkeypatch.setenv('COMPUERTA_CALENTAMIENTO', '1')
+    bomba = agregador(compuerta=True, latido_cambio=0)
+    for i in range(3):
+        bomba.procesar('c1', Lectura(tiempo(i), 1.0, 1))
+        bomba.procesar('c2', Lectura(tiempo(i), 2.0, 2))
+    # Solo la de calentamiento; las iguales se omiten y no quedan pendientes
+    assert [t for t, _ in bomba.despachador.predicciones] == [tiempo(0)]
+    assert len(bomba.tramas) == 0 and bomba.tramas.aplazadas() == []
+
+    bomba.despachador.llena = True
+    bomba.procesar('c1', Lectura(tiempo(3), 50.0, 1))
+    bomba.procesar('c2', Lectura(tiempo(3), 2.0, 2))
+    bomba.despachador.llena = False
+    bomba.revisar()
+    assert [t for t, _ in bomba.despachador.predicciones] == [tiempo(0), tiempo(3)]
+    assert bomba.compuerta.estadisticas()['observadas'] == 4
+
+
+def test_banda_suprime_el_envio_individual_pero_no_la_trama():
+    bomba = agregador(banda=True, banda_absoluta=0.5)
+    for i, valor in enumerate([1.0, 1.2, 2.0]):
+        bomba.procesar('c1', Lectura(tiempo(i), valor, 1))
+        bomba.procesar('c2', Lectura(tiempo(i), 5.0, 2))
+    assert bomba.agrupador.lecturas == [('/e1', 1.0), ('/e2', 5.0), ('/e1', 2.0)]
+    assert [datos['a'] for _, datos in bomba.despachador.predicciones] == [1.0, 1.2, 2.0]
+    assert bomba.banda.estadisticas()['suprimidas'] == 3
@@ -0,0 +1,34 @@
+"""Pruebas del cache de clasificaciones (comun/cache.py)"""
+
+import time
+
+from comun.cache import CacheClasificaciones
+
+
+def test_texto_normalizado_comparte_resultado():
+    cache = CacheClasificaciones()
+    cache.guardar('Cambio  de TURNO', {'clasificacion': 'rutina', 'alerta_aviso': None, 'otro': 1})
+    assert cache.obtener('cambio de turno') == {'clasificacion': 'rutina', 'alerta_aviso': None}
+
+
+def test_acierto_solo_cuando_se_aprovecha():
+    cache = CacheClasificaciones()
+    cache.guardar('texto', {'clasificacion': 'rutina'})
+    assert cache.obtener('otro texto') is None
+    assert cache.obtener('texto') is not None
+    assert cache.estadisticas()['aciertos'] == 0
+    cache.contar(False)
+    cache.obtener('texto')
+    cache.contar(True)
+    estadisticas = cache.estadisticas()
+    assert (estadisticas['aciertos'], estadisticas['fallos']) == (1, 2)
+
+
+def test_lru_y_ttl(monkeypatch):
+    cache = CacheClasificaciones(max_entradas=2, ttl=10)
+    for texto in ('a', 'b', 'c'):
+        cache.guardar(texto, {'clasificacion': texto})
+    assert cache.obtener('a') is None and cache.estadisticas()['descartados'] == 1
+    despues = time.time() + 11
+    monkeypatch.setattr('comun.cache.time.time', lambda: despues)
+    assert cache.obtener('b') is None and cache.estadisticas()['expirados'] == 1
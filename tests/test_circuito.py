@@ -0,0 +1,104 @@
+"""Pruebas de las transiciones del circuit breaker (comun/circuito.py)"""
+
+import pytest
+
+pytest.importorskip('requests')
+
+from comun import circuito as modulo  # noqa: E402
+from comun.circuito import ABIERTO, CERRADO, SEMIABIERTO, CircuitoAbierto, Circuitos  # noqa: E402
+
+URL = 'http://backend/prediccion'
+
+
+def circuito(**kwargs):
+    config = dict(limite_max=10, ventana=4, min_peticiones=4, espera=10.0, espera_max=300.0)
+    config.update(kwargs)
+    return Circuitos(**config).de(URL)
+
+
+@pytest.fixture
+def reloj(monkeypatch):
+    """Reloj monotonic controlado por la prueba"""
+    ahora = [1000.0]
+    monkeypatch.setattr(modulo.time, 'monotonic', lambda: ahora[0])
+    return ahora
+
+
+def fallar(c, n):
+    for _ in range(n):
+        sonda = c.adquirir()
+        c.registrar(0.01, 30, 500, sonda=sonda)
+
+
+def test_se_abre_al_superar_la_tasa_de_errores(reloj):
+    c = circuito()
+    fallar(c, 3)
+    assert c.estado == CERRADO
+    fallar(c, 1)
+    assert c.estado == ABIERTO
+    with pytest.raises(CircuitoAbierto):
+        c.adquirir()
+
+
+def test_sonda_exitosa_cierra_y_fallida_reabre_con_espera_doble(reloj):
+    c = circuito()
+    fallar(c, 4)
+    reloj[0] += 10
+    assert c.adquirir() is True
+    assert c.estado == SEMIABIERTO
+    with pytest.raises(CircuitoAbierto):
+        c.adquirir()  # una sola sonda a la vez
+    c.registrar(0.01, 30, None, sonda=True)
+    assert c.estado == ABIERTO
+    reloj[0] += 10
+    with pytest.raises(CircuitoAbierto):
+        c.adquirir()  # la segunda apertura seguida espera el doble
+    reloj[0] += 10
+    assert c.adquirir() is True
+    c.registrar(0.01, 30, 200, sonda=True)
+    assert c.estado == CERRADO
+    assert c.adquirir() is False
+
+
+def test_respuesta_tardia_no_decide_el_semiabierto(reloj):
+    c = circuito(limite_max=100)
+    tardia = c.adquirir()
+    assert tardia is False
+    fallar(c, 4)
+    reloj[0] += 10
+    sonda = c.adquirir()
+    # La peticion que salio con el circuito cerrado responde bien durante la sonda
+    c.registrar(0.01, 30, 200, sonda=tardia)
+    assert c.estado == SEMIABIERTO
+    c.registrar(0.01, 30, 503, sonda=sonda)
+    assert c.estado == ABIERTO
+    assert c.en_vuelo == 0 and c.sondas_en_vuelo == 0
+
+
+def test_sonda_liberada_sin_enviarse_permite_otra(reloj):
+    c = circuito()
+    fallar(c, 4)
+    reloj[0] += 10
+    c.liberar(c.adquirir())
+    assert c.estado == SEMIABIERTO
+    assert c.adquirir() is True
+
+
+def test_retry_after_abre_por_ese_tiempo(reloj):
+    c = circuito()
+    c.registrar(0.01, 30, 429, '120', sonda=c.adquirir())
+    assert c.estado == ABIERTO
+    reloj[0] += 60
+    with pytest.raises(CircuitoAbierto):
+        c.adquirir()
+    reloj[0] += 60
+    assert c.adquirir() is True
+
+
+def test_limite_de_concurrencia(reloj):
+    c = circuito(limite_max=2)
+    c.adquirir()
+    c.adquirir()
+    with pytest.raises(CircuitoAbierto):
+        c.adquirir()
+    assert c.estado == CERRADO
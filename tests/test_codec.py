@@ -0,0 +1,80 @@
+"""Pruebas del codec de payloads (comun/codec.py), con cada backend JSON disponible"""
+
+import importlib.util
+import json
+
+import pytest
+
+import comun.codec
+
+BACKENDS = ['json'] + (['auto'] if comun.codec.orjson is not None else [])
+
+
+@pytest.fixture(params=BACKENDS)
+def codec(request, monkeypatch):
+    """Copia aparte del modulo con CODEC_JSON fijado; comun.codec y sus clases no se tocan"""
+    monkeypatch.setenv('CODEC_JSON', request.param)
+    spec = importlib.util.spec_from_file_location('codec_prueba', comun.codec.__file__)
+    modulo = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(modulo)
+    assert modulo.BACKEND == ('json' if request.param == 'json' else 'orjson')
+    return modulo
+
+
+def test_lectura_valida_descarta_campos_extra(codec):
+    lectura = codec.LECTURA.decodificar(
+        '{"tiempo_sensor": "2024-01-01T00:00:00", "valor": 1.5, "id_sensor": 3, "extra": 1}')
+    assert lectura == codec.Lectura('2024-01-01T00:00:00', 1.5, 3)
+    assert lectura.valor == 1.5
+    assert lectura.get('id_sensor') == 3
+    assert lectura.get('extra') is None
+    assert lectura.get('extra', 'x') == 'x'
+    assert lectura.como_dict() == {'tiempo_sensor': '2024-01-01T00:00:00', 'valor': 1.5, 'id_sensor': 3}
+
+
+def test_opcionales_ausentes_quedan_en_none(codec):
+    lectura = codec.LECTURA.decodificar('{"tiempo_sensor": "t"}')
+    assert (lectura.valor, lectura.id_sensor) == (None, None)
+
+
+@pytest.mark.parametrize('texto', [
+    '[1, 2]',                                   # no es un objeto
+    '"texto"',
+    '{"valor": 1}',                             # falta el campo obligatorio
+    '{"tiempo_sensor": 5}',                     # tipo equivocado
+    '{"tiempo_sensor": "t", "valor": [1]}',
+    '{"tiempo_sensor": "t", "id_sensor": true}',  # bool no cuenta como int
+    '{"tiempo_sensor": "t", "valor": false}',
+    '{"tiempo_sensor": "t",',                   # JSON invalido
+])
+def test_lectura_invalida(codec, texto):
+    with pytest.raises(codec.PayloadInvalido):
+        codec.LECTURA.decodificar(texto)
+
+
+def test_bitacora_requiere_id_y_texto(codec):
+    assert codec.BITACORA.decodificar('{"id": 7, "bitacora": "cambio de turno"}').id == 7
+    with pytest.raises(codec.PayloadInvalido, match="falta 'bitacora'"):
+        codec.BITACORA.decodificar('{"id": 7}')
+
+
+def test_decodificar_generico(codec):
+    assert codec.decodificar('{"a": 1}') == {'a': 1}
+    with pytest.raises(codec.PayloadInvalido):
+        codec.decodificar('{')
+
+
+def test_codificar_igual_en_ambos_backends(codec):
+    cuerpo = {
+        'lectura': codec.Lectura('t', 1, None),
+        'lecturas': [codec.Lectura('t', 2.5, 4)],
+        'valores': (1, float('nan'), float('inf')),
+        'anidado': {'x': float('-inf')},
+    }
+    assert json.loads(codec.codificar(cuerpo)) == {
+        'lectura': {'tiempo_sensor': 't', 'valor': 1, 'id_sensor': None},
+        'lecturas': [{'tiempo_sensor': 't', 'valor': 2.5, 'id_sensor': 4}],
+        'valores': [1, None, None],
+        'anidado': {'x': None},
+    }
+    assert b'NaN' not in codec.codificar({'v': float('nan')})
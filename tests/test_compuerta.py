@@ -0,0 +1,59 @@
+"""Pruebas de la compuerta de cambios de la prediccion unificada (comun/compuerta.py)"""
+
+from array import array
+
+from comun.compuerta import CompuertaCambios
+
+
+def estable(compuerta, desde, hasta, base=(10.0, 20.0)):
+    """Tramas de una por segundo que oscilan 0.1 alrededor de base; retorna los motivos"""
+    motivos = []
+    for t in range(desde, hasta):
+        oscilacion = 0.1 * (t % 2)
+        motivos.append(compuerta.evaluar(float(t), array('d', [base[0] + oscilacion, base[1] + oscilacion]))[1])
+    return motivos
+
+
+def test_calentamiento_envia_las_primeras_tramas():
+    compuerta = CompuertaCambios(['a', 'b'], calentamiento=5, latido=0)
+    motivos = estable(compuerta, 0, 20)
+    assert motivos[:5] == ['calentamiento'] * 5
+    assert set(motivos[5:]) == {'omitida'}
+    assert compuerta.estadisticas()['enviadas_calentamiento'] == 5
+
+
+def test_cambio_de_un_campo_envia_la_trama():
+    compuerta = CompuertaCambios(['a', 'b'], calentamiento=5, latido=0)
+    estable(compuerta, 0, 30)
+    enviar, motivo, distancia = compuerta.evaluar(30.0, array('d', [10.0, 25.0]))
+    assert enviar and motivo == 'cambio' and distancia >= 1.0
+    # La comparacion siguiente es contra la trama recien enviada
+    assert compuerta.evaluar(31.0, array('d', [10.0, 25.0]))[1] == 'omitida'
+
+
+def test_latido_envia_aunque_no_haya_cambios():
+    compuerta = CompuertaCambios(['a', 'b'], calentamiento=5, latido=10)
+    motivos = estable(compuerta, 0, 40)
+    enviadas = [t for t, motivo in enumerate(motivos) if motivo == 'latido']
+    # Cada 10 s de tiempo_sensor desde el ultimo envio (el ultimo de calentamiento fue en t=4)
+    assert enviadas == [14, 24, 34]
+    estadisticas = compuerta.estadisticas()
+    assert estadisticas['enviadas_por_latido'] == 3
+    assert estadisticas['omitidas'] == 40 - 5 - 3
+    assert estadisticas['fraccion_omitida'] == estadisticas['omitidas'] / 40
+
+
+def test_umbral_por_campo():
+    compuerta = CompuertaCambios(['a', 'b'], calentamiento=5, latido=0, umbrales={'b': 1000})
+    estable(compuerta, 0, 30)
+    # El mismo salto que en 'a' dispara un envio, en 'b' queda bajo su umbral propio
+    assert compuerta.evaluar(30.0, array('d', [10.0, 21.0]))[1] == 'omitida'
+    assert compuerta.evaluar(31.0, array('d', [11.0, 20.0]))[1] == 'cambio'
+
+
+def test_campo_constante_no_divide_por_cero():
+    compuerta = CompuertaCambios(['a'], calentamiento=1, latido=0)
+    for t in range(10):
+        compuerta.evaluar(float(t), array('d', [0.0]))
+    assert compuerta.evaluar(10.0, array('d', [0.0]))[1] == 'omitida'
+    assert compuerta.evaluar(11.0, array('d', [1e-6]))[1] == 'cambio'
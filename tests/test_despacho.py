@@ -0,0 +1,56 @@
+import threading
+
+from comun.despacho import PRIORIDAD_ALTA, PRIORIDAD_BAJA, CuboTokens, Despachador
+
+
+def _nada():
+    pass
+
+
+def test_alta_admitida_con_la_cola_llena_de_baja():
+    # Sin iniciar: las tareas quedan pendientes
+    despachador = Despachador('prueba', num_trabajadores=2, max_pendientes=8)
+    admitidas_baja = sum(despachador.enviar(f"lote-{i}", _nada, prioridad=PRIORIDAD_BAJA) for i in range(20))
+
+    assert admitidas_baja == despachador.max_pendientes_baja
+    assert not despachador.enviar('lote-extra', _nada, prioridad=PRIORIDAD_BAJA)
+    assert despachador.enviar('prediccion', _nada, prioridad=PRIORIDAD_ALTA)
+
+
+def test_cupo_de_alta_no_depende_de_la_baja():
+    despachador = Despachador('prueba', num_trabajadores=2, max_pendientes=4)
+    for i in range(10):
+        despachador.enviar(f"lote-{i}", _nada, prioridad=PRIORIDAD_BAJA)
+
+    admitidas_alta = sum(despachador.enviar(f"prediccion-{i}", _nada) for i in range(10))
+
+    assert admitidas_alta == 4
+    estadisticas = despachador.estadisticas()['prioridades']
+    assert estadisticas['alta'] == {'pendientes': 4, 'rechazados': 6}
+    assert estadisticas['baja']['pendientes'] == despachador.max_pendientes_baja
+
+
+def test_alta_se_ejecuta_antes_que_la_baja_encolada():
+    despachador = Despachador('prueba', num_trabajadores=1, max_pendientes=50)
+    orden = []
+    listo = threading.Event()
+    for i in range(5):
+        despachador.enviar('clave', orden.append, f"baja-{i}", prioridad=PRIORIDAD_BAJA)
+    despachador.enviar('clave', orden.append, 'alta')
+    despachador.enviar('clave', listo.set, prioridad=PRIORIDAD_BAJA)
+
+    despachador.iniciar()
+
+    assert listo.wait(5)
+    assert orden[0] == 'alta'
+    assert orden[1:] == [f"baja-{i}" for i in range(5)]
+
+
+def test_cubo_reserva_tokens_para_la_alta():
+    cubo = CuboTokens(tasa=1, rafaga=4, reserva=2)
+
+    assert cubo.tomar(PRIORIDAD_BAJA) == 0.0
+    assert cubo.tomar(PRIORIDAD_BAJA) == 0.0
+    assert cubo.tomar(PRIORIDAD_BAJA) > 0
+    assert cubo.tomar(PRIORIDAD_ALTA) == 0.0
+    assert cubo.tomar(PRIORIDAD_ALTA) == 0.0
@@ -0,0 +1,26 @@
+"""Pruebas del logging en segundo plano (comun/logs.py)"""
+
+import logging
+import queue
+
+from comun import logs
+
+
+def test_mensaje_se_resuelve_al_encolar():
+    cola = queue.Queue()
+    manejador = logs._ManejadorCola(cola)
+    payload = {'valor': 1}
+    registro = logging.LogRecord('listener.prueba', logging.INFO, __file__, 1, "Payload: %s", (payload,), None)
+    manejador.emit(registro)
+    payload['valor'] = 2
+    encolado = cola.get_nowait()
+    assert encolado.getMessage() == "Payload: {'valor': 1}"
+
+
+def test_cola_llena_descarta_sin_bloquear():
+    manejador = logs._ManejadorCola(queue.Queue(1))
+    antes = logs.DESCARTADOS._valores.get((), 0)
+    for _ in range(3):
+        manejador.emit(logging.LogRecord('listener.prueba', logging.INFO, __file__, 1, "m", None, None))
+    assert logs.DESCARTADOS._valores.get((), 0) - antes == 2
+
@@ -0,0 +1,64 @@
+"""Pruebas del agrupador de lecturas por lote (comun/lotes.py) con la cola de despacho llena"""
+
+from comun.lotes import AgrupadorLecturas
+
+
+class DespachadorFalso:
+    asincrono = False
+
+    def __init__(self):
+        self.llena = False
+        self.enviados = []
+
+    def enviar(self, clave, funcion, endpoint, lecturas, id_fila, prioridad=None):
+        if self.llena:
+            return False
+        self.enviados.append(list(lecturas))
+        return True
+
+    def restringido(self):
+        return False
+
+
+def agrupador(despachador, **kwargs):
+    return AgrupadorLecturas('prueba', despachador, cliente=None, timeout=1, tamano_max=2, **kwargs)
+
+
+def test_lote_con_la_cola_llena_se_reintenta_en_el_siguiente_vaciado():
+    despachador = DespachadorFalso()
+    lotes = agrupador(despachador)
+    despachador.llena = True
+    lotes.agregar('/e', {'valor': 1})
+    assert lotes.agregar('/e', {'valor': 2}) is False
+    assert lotes.descartadas == 0 and lotes.reencoladas == 2
+
+    despachador.llena = False
+    lotes.vaciar()
+    assert despachador.enviados == [[{'valor': 1}, {'valor': 2}]]
+    assert lotes.estadisticas()['lecturas_en_espera'] == 0
+
+
+def test_reintento_respeta_el_orden_y_el_tamano_maximo():
+    despachador = DespachadorFalso()
+    lotes = agrupador(despachador)
+    despachador.llena = True
+    for valor in range(4):
+        lotes.agregar('/e', {'valor': valor})
+    despachador.llena = False
+    # Mientras hay lecturas reencoladas, las nuevas esperan al vaciado para no adelantarse
+    lotes.agregar('/e', {'valor': 4})
+    assert despachador.enviados == []
+    lotes.vaciar()
+    assert despachador.enviados == [[{'valor': 0}, {'valor': 1}], [{'valor': 2}, {'valor': 3}], [{'valor': 4}]]
+
+
+def test_espera_acotada_descarta_las_lecturas_mas_antiguas():
+    despachador = DespachadorFalso()
+    lotes = agrupador(despachador, max_en_espera=3)
+    despachador.llena = True
+    for valor in range(6):
+        lotes.agregar('/e', {'valor': valor})
+    assert lotes.descartadas == 3
+    despachador.llena = False
+    lotes.vaciar(forzar=True)
+    assert [l['valor'] for lote in despachador.enviados for l in lote] == [3, 4, 5]
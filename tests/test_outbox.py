@@ -0,0 +1,62 @@
+"""Pruebas de la bandeja de salida persistente (comun/outbox.py)"""
+
+from comun.outbox import Outbox
+
+
+def _outbox(tmp_path, **opciones):
+    return Outbox('prueba', ruta=str(tmp_path / 'outbox.db'), **opciones)
+
+
+def test_clave_repetida_no_se_duplica(tmp_path):
+    outbox = _outbox(tmp_path)
+    assert outbox.guardar('prediccion', 'bomba_a|t1', {'valor': 1}) is not None
+    assert outbox.guardar('prediccion', 'bomba_a|t1', {'valor': 2}) is None
+    estadisticas = outbox.estadisticas()
+    assert (estadisticas['guardados'], estadisticas['duplicados'], estadisticas['pendientes']) == (1, 1, 1)
+
+
+def test_confirmar_borra_la_fila(tmp_path):
+    outbox = _outbox(tmp_path)
+    id_fila = outbox.guardar('prediccion', 'c', {})
+    outbox.confirmar(id_fila)
+    assert outbox.pendientes() == 0
+    assert outbox.estadisticas()['en_vuelo'] == 0
+    # Confirmada la fila, la misma clave puede volver a registrarse
+    assert outbox.guardar('prediccion', 'c', {}) is not None
+
+
+def test_en_vuelo_no_se_drena_hasta_liberar(tmp_path):
+    outbox = _outbox(tmp_path, tasa_max=0)
+    entregados = []
+    outbox.registrar('prediccion', lambda datos: entregados.append(datos))
+    id_fila = outbox.guardar('prediccion', 'c', {'valor': 1})
+    outbox.drenar()
+    assert entregados == []
+    outbox.liberar(id_fila)
+    outbox.drenar()
+    assert entregados == [{'valor': 1}]
+    assert outbox.pendientes() == 0
+    assert outbox.estadisticas()['reenviados'] == 1
+
+
+def test_reprogramar_con_backoff_y_muerte(tmp_path):
+    outbox = _outbox(tmp_path, tasa_max=0, max_intentos=2)
+    id_fila = outbox.guardar('lote', 'c', {'lecturas': [1, 2]})
+    outbox.reprogramar(id_fila, 'HTTP 503', datos={'lecturas': [2]})
+    # La espera del backoff deja la fila fuera del drenado
+    assert outbox._vencidas(10) == []
+    assert outbox.pendientes() == 1
+    outbox.reprogramar(id_fila, 'HTTP 503')
+    estadisticas = outbox.estadisticas()
+    assert (estadisticas['pendientes'], estadisticas['muertos_en_disco'], estadisticas['muertos']) == (0, 1, 1)
+
+
+def test_entrega_parcial_guarda_lo_que_queda(tmp_path):
+    outbox = _outbox(tmp_path, tasa_max=0, espera_base=0)
+    # Entrega la primera lectura de cada intento
+    outbox.registrar('lote', lambda datos: {'lecturas': datos['lecturas'][1:]} if datos['lecturas'][1:] else None)
+    outbox.liberar(outbox.guardar('lote', 'c', {'lecturas': [1, 2]}))
+    outbox.drenar()
+    assert outbox._vencidas(10)[0][2] == '{"lecturas": [2]}'
+    outbox.drenar()
+    assert outbox.pendientes() == 0
@@ -0,0 +1,41 @@
+"""Pruebas de la carga de perfiles (comun/perfiles.py y los modulos perfil_*.py)"""
+
+import threading
+
+import pytest
+
+pytest.importorskip('requests')
+
+from comun.perfiles import MODULOS_PERFIL, Perfil, cargar_perfiles, modulo_perfil  # noqa: E402
+
+
+def test_importar_los_perfiles_no_crea_nada(tmp_path, monkeypatch):
+    monkeypatch.setenv('OUTBOX_DIR', str(tmp_path))
+    hilos = threading.active_count()
+    for perfil in MODULOS_PERFIL:
+        assert modulo_perfil(perfil).CANALES
+    assert list(tmp_path.iterdir()) == []
+    assert threading.active_count() == hilos
+
+
+@pytest.mark.parametrize('perfil', ['bomba_a', 'bomba_b'])
+def test_endpoints_y_campos_cubren_los_mismos_canales(perfil):
+    modulo = modulo_perfil(perfil)
+    assert set(modulo.canal_endpoints('http://backend')) == set(modulo.CANAL_TO_CAMPO) == set(modulo.CANALES)
+
+
+def test_perfil_desconocido():
+    with pytest.raises(ValueError, match='Perfil desconocido'):
+        cargar_perfiles(['bomba_z'])
+
+
+def test_crear_solo_los_perfiles_pedidos(tmp_path, monkeypatch):
+    monkeypatch.setenv('OUTBOX_DIR', str(tmp_path))
+    monkeypatch.setenv('BASE_URL', 'http://backend')
+    perfiles = cargar_perfiles(['bomba_a'])
+    perfil = perfiles['bomba_a']
+    assert isinstance(perfil, Perfil)
+    assert perfil.consumidor.canales == modulo_perfil('bomba_a').CANALES
+    assert '/despacho' in perfil.rutas_estadisticas and '/motor' not in perfil.rutas_estadisticas
+    # Solo el outbox de la bomba A
+    assert sorted(p.name for p in tmp_path.iterdir() if p.suffix == '.db') == ['outbox_bomba-a.db']
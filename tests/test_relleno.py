@@ -0,0 +1,57 @@
+"""Pruebas del relleno de huecos (comun/relleno.py)"""
+
+import pytest
+
+pytest.importorskip('psycopg2')
+
+from comun import relleno as modulo  # noqa: E402
+from comun.codec import Lectura  # noqa: E402
+from comun.relleno import RellenoHuecos  # noqa: E402
+
+CANAL = 'canal_sensores_corriente'
+
+
+class CursorFalso:
+    def __init__(self, filas):
+        self.filas = filas
+
+    def execute(self, consulta, parametros):
+        self.parametros = parametros
+
+    def fetchall(self):
+        return self.filas
+
+
+def lectura(tiempo, valor=1.0):
+    return Lectura(tiempo, valor, 1)
+
+
+def test_ultimo_tiempo_compara_instantes_y_no_texto():
+    relleno = RellenoHuecos({CANAL: 'sensores_corriente'})
+    relleno.registrar(CANAL, lectura('2024-01-01T10:00:00+00:00'))
+    # Como texto '2024-01-01T09:30:00-02:00' < '2024-01-01T10:00:00+00:00', pero es posterior
+    relleno.registrar(CANAL, lectura('2024-01-01T09:30:00-02:00'))
+    relleno.registrar(CANAL, lectura('2024-01-01T10:00:00.5+00:00'))
+    assert relleno.estadisticas()['ultimo_tiempo'] == {CANAL: '2024-01-01T09:30:00-02:00'}
+
+
+def test_repetidas_se_olvidan_al_pasar_el_fin_del_relleno():
+    relleno = RellenoHuecos({CANAL: 'sensores_corriente'})
+    relleno.registrar(CANAL, lectura('2024-01-01T10:00:00'))
+    filas = [(CANAL, 1, 1.0, '2024-01-01T10:00:01', None), (CANAL, 1, 2.0, '2024-01-01T10:00:02', None)]
+    assert len(relleno.consultar(CursorFalso(filas))) == 2
+
+    assert relleno.repetida(CANAL, lectura('2024-01-01T10:00:01'))
+    assert not relleno.repetida(CANAL, lectura('2024-01-01T10:00:03'))
+    # El canal ya paso el fin del relleno: una fila con el mismo tiempo ya no se descarta
+    assert not relleno.repetida(CANAL, lectura('2024-01-01T10:00:02'))
+    assert relleno.estadisticas()['repetidas'] == 1
+
+
+def test_repetidas_vencen_tras_la_ventana(monkeypatch):
+    relleno = RellenoHuecos({CANAL: 'sensores_corriente'}, ventana_repetidas=30)
+    relleno.registrar(CANAL, lectura('2024-01-01T10:00:00'))
+    relleno.consultar(CursorFalso([(CANAL, 1, 1.0, '2024-01-01T10:00:01', None)]))
+    ahora = modulo.time.monotonic() + 31
+    monkeypatch.setattr(modulo.time, 'monotonic', lambda: ahora)
+    assert not relleno.repetida(CANAL, lectura('2024-01-01T10:00:01'))
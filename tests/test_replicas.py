@@ -0,0 +1,36 @@
+"""Pruebas de la coordinacion de replicas (comun/replicas.py)"""
+
+from comun.replicas import CoordinadorReplicas
+
+
+class CursorFalso:
+    """Concede los try_lock hasta que falla la consulta numero `falla`"""
+
+    def __init__(self, falla=None):
+        self.consultas = 0
+        self.falla = falla
+
+    def execute(self, consulta, parametros=None):
+        self.consultas += 1
+        if self.consultas == self.falla:
+            raise RuntimeError('conexion perdida')
+
+    def fetchone(self):
+        return (True,)
+
+
+def test_lider_toma_todos_los_consumidores():
+    coordinador = CoordinadorReplicas('g', ['bomba_a', 'bomba_b'])
+    assert coordinador.coordinar(CursorFalso()) == ['bomba_a', 'bomba_b']
+    assert coordinador.propio('bomba_a') and coordinador.propio('bomba_b')
+    assert not coordinador.pendiente()
+
+
+def test_error_a_mitad_del_ciclo_conserva_lo_tomado():
+    coordinador = CoordinadorReplicas('g', ['bomba_a', 'bomba_b'], modo='particion')
+    coordinador._asignadas = lambda cur: {'bomba_a', 'bomba_b'}
+    # bomba_a se toma en la consulta 1 y la consulta 2 (bomba_b) falla
+    nuevos = coordinador.coordinar(CursorFalso(falla=2))
+    assert nuevos == ['bomba_a']
+    assert coordinador.propio('bomba_a') and not coordinador.propio('bomba_b')
+    assert coordinador.estadisticas()['errores'] == 1
@@ -0,0 +1,153 @@
+"""Pruebas del almacen de tramas (comun/tramas.py)"""
+
+from comun.tramas import AlmacenTramas
+
+CANALES = {'c1': 'a', 'c2': 'b'}
+
+
+def almacen(**kwargs):
+    return AlmacenTramas(['a', 'b'], CANALES, **kwargs)
+
+
+def tiempo(i):
+    return f"2024-01-01T00:{i // 60:02d}:{i % 60:02d}"
+
+
+def test_completa_con_todos_los_campos_requeridos():
+    tramas = almacen()
+    clave, fecha = tramas.ubicar(tiempo(0))
+    trama = tramas.obtener(clave, tiempo(0), fecha)
+    tramas.guardar(trama, 'c1', 1)
+    assert not tramas.completa(trama)
+    assert tramas.faltantes(trama) == ['b']
+    tramas.guardar(trama, 'c2', 2)
+    assert tramas.completa(trama)
+    assert tramas.datos(trama) == {'a': 1.0, 'b': 2.0}
+
+
+def test_resolucion_agrupa_tiempos_cercanos_en_una_trama():
+    tramas = almacen(resolucion=1.0)
+    a = tramas.ubicar('2024-01-01T00:00:00.040')
+    b = tramas.ubicar('2024-01-01 00:00:00.010')
+    assert a[0] == b[0]
+
+
+def test_limpiar_elimina_las_incompletas_mas_antiguas_y_conserva_la_actual():
+    tramas = almacen(max_tramas=3)
+    for i in range(5):
+        trama = tramas.obtener(tiempo(i))
+        tramas.guardar(trama, 'c1', i)
+    eliminadas = tramas.limpiar(clave_actual=tiempo(0))
+    assert [t for t, _ in eliminadas] == [tiempo(1), tiempo(2)]
+    assert tiempo(0) in tramas and len(tramas) == 3
+
+
+def test_limpiar_no_recorre_las_completas_aplazadas():
+    tramas = almacen(max_tramas=2, max_aplazadas=1000)
+    for i in range(300):
+        trama = tramas.obtener(tiempo(i))
+        tramas.guardar(trama, 'c1', i)
+        tramas.guardar(trama, 'c2', i)
+        assert tramas.aplazar(trama) is None
+    trama = tramas.obtener(tiempo(400))
+    tramas.guardar(trama, 'c1', 0)
+    assert tramas.limpiar(tiempo(400)) == []
+    assert len(tramas) == 1
+    assert len(tramas.aplazadas()) == 300
+    # Las completas no vuelven al heap: limpiar no las saca y reinserta en cada llamada
+    assert len(tramas._heap) <= 4 * (len(tramas) + tramas.max_tramas)
+
+
+def test_aplazadas_en_orden_y_acotadas():
+    tramas = almacen(max_aplazadas=2)
+    aplazadas = []
+    for i in range(3):
+        trama = tramas.obtener(tiempo(i))
+        tramas.guardar(trama, 'c1', i)
+        tramas.guardar(trama, 'c2', i)
+        aplazadas.append(tramas.aplazar(trama))
+    assert aplazadas[:2] == [None, None]
+    assert aplazadas[2].tiempo_sensor == tiempo(0)
+    assert [t.tiempo_sensor for t in tramas.aplazadas()] == [tiempo(1), tiempo(2)]
+    assert tramas.aplazadas_descartadas == 1
+    # La abandonada queda cerrada: una lectura tardia no la reabre
+    assert tramas.cerrada(tiempo(0))
+
+
+def test_lectura_de_una_aplazada_actualiza_la_misma_trama():
+    tramas = almacen()
+    trama = tramas.obtener(tiempo(0))
+    tramas.guardar(trama, 'c1', 1)
+    tramas.guardar(trama, 'c2', 2)
+    tramas.aplazar(trama)
+    assert tramas.obtener(tiempo(0)) is trama
+    tramas.eliminar(tiempo(0))
+    assert tramas.aplazadas() == [] and tramas.cerrada(tiempo(0))
+
+
+def test_imputar_completa_con_el_ultimo_valor_reciente():
+    tramas = almacen()
+    anterior = tramas.obtener(tiempo(0))
+    tramas.guardar(anterior, 'c1', 1)
+    tramas.guardar(anterior, 'c2', 7)
+    tramas.eliminar(tiempo(0))
+    trama = tramas.obtener(tiempo(5))
+    tramas.guardar(trama, 'c1', 3)
+    assert not tramas.imputar(trama, antiguedad_maxima=2)
+    assert tramas.imputar(trama, antiguedad_maxima=10)
+    assert tramas.completa(trama)
+    assert tramas.campos_imputados(trama) == ['b']
+    assert tramas.datos(trama) == {'a': 3.0, 'b': 7.0}
+
+
+def test_clave_coincide_con_ubicar_sin_contar():
+    tramas = almacen(resolucion=1.0, tolerancia=0.1)
+    for texto in ('2024-01-01T00:00:00.040', '2024-01-01T00:00:00.500', 'sin fecha'):
+        assert tramas.clave(texto) == tramas.ubicar(texto)[0]
+    assert tramas.fuera_de_tolerancia == 1 and tramas.no_parseables == 1
+    tramas.clave('2024-01-01T00:00:00.500')
+    assert tramas.fuera_de_tolerancia == 1
+
+
+def test_vencidas_en_orden_de_llegada_del_primer_campo():
+    tramas = almacen()
+    for i in range(3):
+        tramas.guardar(tramas.obtener(tiempo(i)), 'c1', i)
+    primera = tramas.obtener(tiempo(0))
+    assert tramas.vencidas(10, ahora=primera.creada) == []
+    assert [t.tiempo_sensor for t in tramas.vencidas(0, ahora=primera.creada + 3600)] == [tiempo(i) for i in range(3)]
+
+
+def test_imputar_no_usa_valores_de_tiempos_no_parseables():
+    tramas = almacen()
+    tramas.guardar(tramas.obtener('sin fecha'), 'c2', 7)
+    trama = tramas.obtener(tiempo(0))
+    tramas.guardar(trama, 'c1', 1)
+    assert not tramas.imputar(trama, antiguedad_maxima=3600)
+    assert not tramas.completa(trama)
+
+
+def test_cubeta_une_formatos_y_zonas_horarias_del_mismo_instante():
+    tramas = almacen(resolucion=1.0)
+    claves = {tramas.ubicar(texto)[0] for texto in ('2024-01-01T00:00:00.040+00:00', '2024-01-01 00:00:00Z',
+                                                     '2024-01-01T02:00:00.2+02:00', '2023-12-31T23:59:59.8+00:00')}
+    assert len(claves) == 1
+    assert tramas.fuera_de_tolerancia == 0
+
+
+def test_fuera_de_tolerancia_la_lectura_tiene_su_propia_trama():
+    tramas = almacen(resolucion=1.0, tolerancia=0.1)
+    a, _ = tramas.ubicar('2024-01-01T00:00:00.050')
+    b, _ = tramas.ubicar('2024-01-01T00:00:00.300')
+    assert a % 1000 == 0 and b == a + 300
+    assert tramas.fuera_de_tolerancia == 1
+
+
+def test_texto_de_la_trama_es_el_tiempo_de_la_cubeta():
+    tramas = almacen(resolucion=1.0)
+    texto = '2024-01-01 00:00:00.2+02:00'
+    clave, fecha = tramas.ubicar(texto)
+    trama = tramas.obtener(clave, texto, fecha)
+    # Con la zona horaria y el separador de la lectura que abrio la trama
+    assert trama.tiempo_sensor == '2024-01-01 00:00:00+02:00'
+    assert tramas.obtener(*tramas.ubicar('2023-12-31T22:00:00.1+00:00')) is trama
@@ -0,0 +1,66 @@
+"""Pruebas del ultimo valor por canal servido en GET /ultimos (comun/ultimos.py)"""
+
+import json
+
+from comun.codec import Lectura
+from comun.ultimos import UltimosValores
+
+
+def ultimos():
+    return UltimosValores({'Bomba A': {'a1': 'corriente'}, 'Bomba B': {'b1': 'presion', 'b2': 'caudal'}})
+
+
+def test_lectura_fuera_de_orden_no_reemplaza_la_mas_reciente():
+    valores = ultimos()
+    valores.registrar('a1', Lectura('2024-01-01T00:00:05', 2.0, 1))
+    valores.registrar('a1', Lectura('2024-01-01 00:00:01', 1.0, 1))
+    status, _, cuerpo = valores.responder('/ultimos')
+    assert status == 200
+    assert json.loads(cuerpo)['bombas']['bomba_a']['corriente']['valor'] == 2.0
+    assert valores.estadisticas()['lecturas_antiguas'] == 1
+
+
+def test_canales_ajenos_y_sin_tiempo_se_ignoran():
+    valores = ultimos()
+    valores.registrar('otro', {'tiempo_sensor': '2024-01-01T00:00:00', 'valor': 1})
+    valores.registrar('a1', {'valor': 1})
+    assert valores.estadisticas()['canales'] == 0
+
+
+def test_304_con_el_etag_vigente_y_200_tras_una_lectura_nueva():
+    valores = ultimos()
+    valores.registrar('a1', Lectura('2024-01-01T00:00:00', 1.0, 1))
+    _, encabezados, cuerpo = valores.responder('/ultimos')
+    etag = encabezados['ETag']
+
+    status, encabezados_304, cuerpo_304 = valores.responder('/ultimos', etag)
+    assert status == 304 and cuerpo_304 == b'' and encabezados_304['ETag'] == etag
+    assert valores.responder('/ultimos', f'"otro", {etag}')[0] == 304
+
+    valores.registrar('a1', Lectura('2024-01-01T00:00:01', 2.0, 1))
+    status, encabezados, _ = valores.responder('/ultimos', etag)
+    assert status == 200 and encabezados['ETag'] != etag
+    assert valores.estadisticas()['no_modificadas'] == 2
+
+
+def test_el_cuerpo_se_serializa_una_vez_por_version():
+    valores = ultimos()
+    valores.registrar('a1', Lectura('2024-01-01T00:00:00', 1.0, 1))
+    assert valores.responder('/ultimos')[2] is valores.responder('/ultimos')[2]
+
+
+def test_filtro_por_bomba():
+    valores = ultimos()
+    valores.registrar('a1', Lectura('2024-01-01T00:00:00', 1.0, 1))
+    valores.registrar('b1', Lectura('2024-01-01T00:00:00', 5.0, 2))
+    status, encabezados, cuerpo = valores.responder('/ultimos?bomba=Bomba%20B')
+    instantanea = json.loads(cuerpo)
+    assert status == 200
+    assert list(instantanea['bombas']) == ['bomba_b'] and list(instantanea['canales']) == ['b1']
+    assert encabezados['ETag'] != valores.responder('/ultimos')[1]['ETag']
+
+
+def test_bomba_desconocida_responde_404():
+    status, encabezados, cuerpo = ultimos().responder('/ultimos?bomba=bomba_z')
+    assert status == 404 and 'ETag' not in encabezados
+    assert json.loads(cuerpo)['bombas'] == ['bomba_a', 'bomba_b']
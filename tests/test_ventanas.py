@@ -0,0 +1,67 @@
+"""Pruebas de la ventana movil de los campos de una bomba (comun/ventanas.py)"""
+
+import random
+from array import array
+
+import pytest
+
+from comun import ventanas
+from comun.ventanas import ESTADISTICAS, VentanaMovil
+
+CAMPOS = ['a', 'b', 'c']
+
+
+def ventana(monkeypatch, tamano, con_numpy):
+    """Ventana con NumPy o, como si no estuviera instalado, en Python puro"""
+    with monkeypatch.context() as parche:
+        if not con_numpy:
+            parche.setattr(ventanas, 'np', None)
+        return VentanaMovil(CAMPOS, tamano)
+
+
+def test_python_puro_sobre_las_ultimas_tramas(monkeypatch):
+    movil = ventana(monkeypatch, 3, con_numpy=False)
+    assert not movil.numpy
+    for t, valores in enumerate([(100, 0, 5), (1, 0, 5), (2, 0, 5), (3, 0, 5)]):
+        resultado = movil.agregar(float(t), array('d', valores))
+    # La primera trama ya salio del buffer circular
+    assert resultado['n'] == 3
+    assert resultado['media'] == {'a': 2.0, 'b': 0.0, 'c': 5.0}
+    assert resultado['desv']['a'] == pytest.approx((2 / 3) ** 0.5)
+    assert resultado['min'] == {'a': 1.0, 'b': 0.0, 'c': 5.0}
+    assert resultado['max'] == {'a': 3.0, 'b': 0.0, 'c': 5.0}
+    assert resultado['pendiente'] == {'a': 1.0, 'b': 0.0, 'c': 0.0}
+    assert movil.ultimas() is resultado
+    assert movil.estadisticas() == {'tamano': 3, 'ocupadas': 3, 'tramas': 4, 'numpy': False}
+
+
+@pytest.mark.parametrize('con_numpy', [False, True])
+def test_pendiente_cero_con_un_solo_tiempo(monkeypatch, con_numpy):
+    if con_numpy:
+        pytest.importorskip('numpy')
+    movil = ventana(monkeypatch, 4, con_numpy)
+    movil.agregar(10.0, array('d', [1, 2, 3]))
+    resultado = movil.agregar(10.0, array('d', [3, 2, 1]))
+    assert resultado['pendiente'] == {'a': 0.0, 'b': 0.0, 'c': 0.0}
+    assert resultado['media'] == {'a': 2.0, 'b': 2.0, 'c': 2.0}
+
+
+def test_numpy_y_python_puro_dan_el_mismo_resultado(monkeypatch):
+    pytest.importorskip('numpy')
+    con_numpy = VentanaMovil(CAMPOS, 7)
+    assert con_numpy.numpy
+    sin_numpy = ventana(monkeypatch, 7, con_numpy=False)
+    generador = random.Random(1)
+    t = 1.7e9
+    for _ in range(30):
+        t += generador.uniform(0.5, 2.0)
+        # La trama trae mas valores que campos (los extra no entran a la ventana)
+        valores = array('d', [generador.gauss(50, 10) for _ in range(len(CAMPOS) + 2)])
+        esperado = sin_numpy.agregar(t, valores)
+        obtenido = con_numpy.agregar(t, valores)
+        assert obtenido['n'] == esperado['n']
+        for estadistica in ESTADISTICAS:
+            for campo in CAMPOS:
+                assert obtenido[estadistica][campo] == pytest.approx(esperado[estadistica][campo], rel=1e-9,
+                                                                      abs=1e-9)
+                assert type(obtenido[estadistica][campo]) is float
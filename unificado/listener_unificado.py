@@ -0,0 +1,136 @@
+"""
+Listener unificado: Bomba A, Bomba B y bitacoras en un solo proceso.
+
+Usa un unico MotorListener (una conexion PostgreSQL) que hace LISTEN sobre
+la union de los canales de los perfiles habilitados. Cada notificacion se
+decodifica una vez y se entrega a todos los perfiles suscritos al canal.
+
+Perfiles disponibles (variable PERFILES, separados por coma):
+    bomba_a, bomba_b, bitacoras
+"""
+
+import asyncio
+import json
+import os
+import sys
+import threading
+from http.server import HTTPServer, BaseHTTPRequestHandler
+from dotenv import load_dotenv
+
+# Permite importar el paquete compartido 'comun' al ejecutar desde la carpeta unificado
+RAIZ_REPO = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if RAIZ_REPO not in sys.path:
+    sys.path.append(RAIZ_REPO)
+
+from comun import logs
+from comun.asincrono import ejecutar_asincrono
+from comun.despacho import modo_asincrono
+from comun.metricas import REGISTRO, TIPO_CONTENIDO
+from comun.motor import MotorListener
+from comun.perfiles import cargar_perfiles
+
+log = logs.obtener('unificado')
+
+# Los perfiles, el motor y las rutas se arman al ejecutar el listener (ver __main__)
+PERFILES = {}
+MOTOR = None
+RUTAS_ESTADISTICAS = {}
+PAGINA_SALUD = b""
+
+
+def configuracion_db():
+    """Configuracion de la base de datos (incluye SSL opcional, igual que bitacoras)"""
+    db_config = {
+        'dbname': os.environ.get('DB_NAME'),
+        'user': os.environ.get('DB_USER'),
+        'password': os.environ.get('DB_PASSWORD'),
+        'host': os.environ.get('DB_HOST'),
+        'port': int(os.environ.get('DB_PORT', '5432'))
+    }
+    if os.environ.get('DB_SSLMODE'):
+        db_config['sslmode'] = os.environ['DB_SSLMODE']
+        if os.environ.get('DB_SSLROOTCERT'):
+            db_config['sslrootcert'] = os.environ['DB_SSLROOTCERT']
+    return db_config
+
+
+def rutas_estadisticas(motor, perfiles):
+    """/motor y las estadisticas de cada perfil con prefijo (/bomba_a/despacho, ...)"""
+    rutas = {'/motor': motor.estadisticas}
+    for nombre, perfil in perfiles.items():
+        for ruta, funcion in perfil.rutas_estadisticas.items():
+            rutas[f"/{nombre}{ruta}"] = funcion
+    return rutas
+
+
+def main():
+    log.info("Perfiles habilitados: %s", ', '.join(PERFILES))
+    MOTOR.ejecutar()
+
+
+class HealthHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path == '/metrics':
+            cuerpo = REGISTRO.exponer().encode()
+            self.send_response(200)
+            self.send_header('Content-type', TIPO_CONTENIDO)
+            self.end_headers()
+            self.wfile.write(cuerpo)
+            return
+        if self.path.split('?')[0] == '/ultimos' and MOTOR.ultimos is not None:
+            status, encabezados, cuerpo = MOTOR.ultimos.responder(self.path, self.headers.get('If-None-Match'))
+            self.send_response(status)
+            for nombre, valor in encabezados.items():
+                self.send_header(nombre, valor)
+            self.end_headers()
+            self.wfile.write(cuerpo)
+            return
+        if self.path in RUTAS_ESTADISTICAS:
+            cuerpo = json.dumps(RUTAS_ESTADISTICAS[self.path]()).encode()
+            self.send_response(200)
+            self.send_header('Content-type', 'application/json')
+            self.end_headers()
+            self.wfile.write(cuerpo)
+            return
+        self.send_response(200)
+        self.send_header('Content-type', 'text/html')
+        self.end_headers()
+        self.wfile.write(PAGINA_SALUD)
+
+    def log_message(self, format, *args):
+        return  # Silenciar logs HTTP
+
+
+def run_http_server():
+    """Ejecuta servidor HTTP para health checks"""
+    port = int(os.environ.get('PORT', 8080))
+    server = HTTPServer(('', port), HealthHandler)
+    log.info("Servidor HTTP iniciado en el puerto %s", port)
+    server.serve_forever()
+
+
+if __name__ == '__main__':
+    # Cargar variables de entorno desde .env
+    load_dotenv()
+    logs.configurar()
+
+    # Solo se crean los componentes de los perfiles habilitados (variable PERFILES)
+    PERFILES = cargar_perfiles([p.strip() for p in os.environ.get('PERFILES', 'bomba_a,bomba_b,bitacoras').split(',')
+                                if p.strip()])
+    MOTOR = MotorListener('Listener unificado', configuracion_db(), [p.consumidor for p in PERFILES.values()])
+    RUTAS_ESTADISTICAS = rutas_estadisticas(MOTOR, PERFILES)
+    PAGINA_SALUD = (f"<html><body><h1>Listener unificado funcionando</h1>"
+                    f"<p>Perfiles: {', '.join(PERFILES)}</p></body></html>").encode()
+
+    if modo_asincrono():
+        # Servidor de salud, motor y envios al backend en un solo event loop
+        log.info("Perfiles habilitados: %s", ', '.join(PERFILES))
+        asyncio.run(ejecutar_asincrono(MOTOR, RUTAS_ESTADISTICAS, PAGINA_SALUD, int(os.environ.get('PORT', 8080))))
+    else:
+        # Iniciar servidor HTTP en hilo separado
+        http_thread = threading.Thread(target=run_http_server)
+        http_thread.daemon = True
+        http_thread.start()
+
+        # Ejecutar listener en hilo principal
+        main()